@@ -0,0 +1,155 @@
+"""
+Accessibility-tree page view for Miki Miki
+
+A pruned accessibility tree (Chrome's own view of the page through CDP
+Accessibility.getFullAXTree) is a much smaller input for the planner than a
+full screenshot. Each interactive element gets a numbered id, the model
+answers with targets like "#12", and the id resolves straight to its DOM node
+instead of searching the page for a matching description.
+"""
+
+import itertools
+
+from selenium.webdriver.common.by import By
+
+# Roles the model can act on
+INTERACTIVE_ROLES = {
+    "button", "link", "textbox", "searchbox", "combobox", "checkbox", "radio", "switch", "slider",
+    "spinbutton", "tab", "menuitem", "menuitemcheckbox", "menuitemradio", "option", "listbox",
+    "treeitem", "gridcell",
+}
+# Roles kept for orientation (section titles, dialogs) but not as targets
+CONTEXT_ROLES = {"heading", "dialog", "alertdialog", "alert"}
+# Interactive roles that are useful even without an accessible name
+UNNAMED_ROLES = {"textbox", "searchbox", "combobox", "checkbox", "radio", "switch", "slider", "spinbutton"}
+# Boolean states worth showing to the model
+STATE_PROPERTIES = ("focused", "checked", "selected", "expanded", "disabled", "required")
+
+# Distinguishes the element markers of different captures
+capture_ids = itertools.count(1)
+
+
+def property_value(ax_node, name):
+    """Value of a named AX property, or None"""
+    for prop in ax_node.get("properties", []):
+        if prop.get("name") == name:
+            return prop.get("value", {}).get("value")
+    return None
+
+
+def clip(text, length):
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= length else text[:length - 1] + "…"
+
+
+class AXNode:
+    """One numbered element of the pruned tree"""
+
+    def __init__(self, ax_id, role, name, backend_id, value="", states=None, capture_id=0):
+        self.ax_id = ax_id
+        self.role = role
+        self.name = name
+        self.backend_id = backend_id
+        self.value = value
+        self.states = states or []
+        self.capture_id = capture_id
+
+    @property
+    def ref(self):
+        return f"#{self.ax_id}"
+
+    @property
+    def label(self):
+        """Free-text description of the element (for logs, learning and fallback resolution)"""
+        return f"{self.name} {self.role}".strip() if self.name else self.role
+
+    def line(self):
+        """The element as the model sees it: [12] button "Search" (focused)"""
+        text = f'[{self.ax_id}] {self.role}'
+        if self.name:
+            text += f' "{self.name}"'
+        if self.value:
+            text += f' value="{self.value}"'
+        if self.states:
+            text += f" ({', '.join(self.states)})"
+        return text
+
+    def resolve(self, driver):
+        """
+        The WebElement for this node: a constant three round trips (resolve the
+        backend node, mark it, find the mark) regardless of page size. Returns
+        None when the node is gone (e.g. the page navigated since the capture).
+        """
+        token = f"{self.capture_id}-{self.ax_id}"
+        try:
+            remote = driver.execute_cdp_cmd("DOM.resolveNode", {"backendNodeId": self.backend_id})
+            driver.execute_cdp_cmd("Runtime.callFunctionOn", {
+                "objectId": remote["object"]["objectId"],
+                "functionDeclaration": "function(token) { this.setAttribute('data-miki-ax', token); }",
+                "arguments": [{"value": token}],
+            })
+            return driver.find_element(By.CSS_SELECTOR, f'[data-miki-ax="{token}"]')
+        except Exception:
+            return None
+
+
+class AccessibilityTree:
+    """Pruned, numbered accessibility tree of the current page"""
+
+    def __init__(self, url="", title="", nodes=None, lines=None, total_nodes=0):
+        self.url = url
+        self.title = title
+        self.nodes = nodes or {}            # ax_id -> AXNode (interactive elements only)
+        self.lines = lines or []
+        self.total_nodes = total_nodes
+
+    @classmethod
+    def capture(cls, driver, max_nodes=300, max_name_length=80):
+        """Fetch the full AX tree with one CDP call and prune it to named, actionable nodes"""
+        ax_nodes = driver.execute_cdp_cmd("Accessibility.getFullAXTree", {}).get("nodes", [])
+        capture_id = next(capture_ids)
+        nodes, lines = {}, []
+        title = ""
+        previous_name = None
+        for ax_node in ax_nodes:
+            if ax_node.get("ignored"):
+                continue
+            role = (ax_node.get("role") or {}).get("value", "")
+            name = clip((ax_node.get("name") or {}).get("value", ""), max_name_length)
+            if role == "RootWebArea":
+                title = name
+                continue
+            if role in CONTEXT_ROLES:
+                # A heading inside a link repeats the link's name
+                if name and name != previous_name:
+                    lines.append(f"{role} \"{name}\"")
+                    previous_name = name
+                continue
+            if role not in INTERACTIVE_ROLES or ax_node.get("backendDOMNodeId") is None:
+                continue
+            if not name and role not in UNNAMED_ROLES:
+                continue
+            if len(nodes) >= max_nodes:
+                break
+            states = [state for state in STATE_PROPERTIES if property_value(ax_node, state) in (True, "true", "mixed")]
+            value = clip((ax_node.get("value") or {}).get("value", ""), max_name_length)
+            node = AXNode(len(nodes) + 1, role, name, ax_node["backendDOMNodeId"], value, states, capture_id)
+            nodes[node.ax_id] = node
+            lines.append(node.line())
+            previous_name = name
+        return cls(url=driver.current_url, title=title, nodes=nodes, lines=lines, total_nodes=len(ax_nodes))
+
+    @property
+    def text(self):
+        """The tree as prompt text, one element per line"""
+        return "\n".join(self.lines)
+
+    def node(self, target):
+        """The node referenced by a target like "#12", or None"""
+        target = str(target).strip()
+        if not target.startswith("#") or not target[1:].isdigit():
+            return None
+        return self.nodes.get(int(target[1:]))
+
+    def __repr__(self):
+        return f"AccessibilityTree({len(self.nodes)} elements of {self.total_nodes} nodes, {self.url})"
@@ -0,0 +1,338 @@
+"""
+Typed browser actions and structured model output for Miki Miki
+
+Planner responses used to be "ACTION_1: CLICK:description" lines split on
+colons; lines that did not parse were dropped silently. Now the model is
+asked for JSON matching a response schema, every action is validated into an
+Action, and a malformed response raises ActionParseError (carrying whatever
+could be salvaged) so the caller can re-ask. ActionStream picks complete
+actions out of a response while it is still arriving.
+"""
+
+import json
+import re
+
+# Model-facing action names -> executor action types
+ACTION_TYPES = {
+    'CLICK': 'ai_click',
+    'TYPE': 'ai_type',
+    'NAVIGATE': 'ai_navigate',
+    'SCROLL': 'ai_scroll',
+    'WAIT': 'ai_wait',
+    'PRESS': 'ai_press',
+    'HOVER': 'ai_hover',
+    'SELECT': 'ai_select',
+}
+ACTION_NAMES = {action_type: name for name, action_type in ACTION_TYPES.items()}
+
+SCROLL_DIRECTIONS = ("UP", "DOWN", "LEFT", "RIGHT")
+
+# Response schemas in the OpenAPI subset accepted by Gemini's response_schema
+ACTION_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "type": {"type": "STRING", "enum": list(ACTION_TYPES)},
+        "target": {"type": "STRING"},
+    },
+    "required": ["type", "target"],
+}
+
+PLAN_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "thought": {"type": "STRING"},
+        "actions": {"type": "ARRAY", "items": ACTION_SCHEMA},
+    },
+    "required": ["thought", "actions"],
+}
+
+STEP_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "page_summary": {"type": "STRING"},
+        "task_completed": {"type": "BOOLEAN"},
+        "completion_reason": {"type": "STRING"},
+        "thought": {"type": "STRING"},
+        "actions": {"type": "ARRAY", "items": ACTION_SCHEMA},
+    },
+    "required": ["page_summary", "task_completed", "completion_reason", "actions"],
+}
+
+
+class ActionParseError(ValueError):
+    """A model response that does not match the expected structure"""
+
+    def __init__(self, message, partial=None):
+        super().__init__(message)
+        # Best-effort result (e.g. the valid actions) to use when re-asking is not an option
+        self.partial = partial
+
+
+class Action:
+    """
+    One validated action. Unpacks and indexes like the (action_type, target)
+    tuples used throughout the agent, so it can go anywhere a tuple went.
+    """
+
+    __slots__ = ("type", "target")
+
+    def __init__(self, action_type, target):
+        self.type = action_type
+        self.target = target
+
+    @property
+    def name(self):
+        """Model-facing name, e.g. CLICK"""
+        return ACTION_NAMES.get(self.type, self.type)
+
+    def __iter__(self):
+        yield self.type
+        yield self.target
+
+    def __getitem__(self, index):
+        return (self.type, self.target)[index]
+
+    def __len__(self):
+        return 2
+
+    def __eq__(self, other):
+        return tuple(self) == tuple(other) if isinstance(other, (Action, tuple, list)) else NotImplemented
+
+    def __hash__(self):
+        return hash((self.type, self.target))
+
+    def __repr__(self):
+        return f"Action({self.name}: {self.target!r})"
+
+    def to_dict(self):
+        return {"type": self.name, "target": self.target}
+
+    @classmethod
+    def create(cls, name, target):
+        """Validate a model-facing action name and target; raises ActionParseError"""
+        name = str(name or "").strip().upper()
+        target = str(target if target is not None else "").strip()
+        if name not in ACTION_TYPES:
+            raise ActionParseError(f"unknown action type {name!r}")
+
+        if name == 'NAVIGATE':
+            if not re.match(r"^[a-z][a-z0-9+.-]*://", target, re.IGNORECASE):
+                if "." not in target or " " in target:
+                    raise ActionParseError(f"NAVIGATE needs a URL, got {target!r}")
+                target = "https://" + target
+        elif name == 'SCROLL':
+            direction = next((d for d in SCROLL_DIRECTIONS if d in target.upper()), None)
+            if direction is None:
+                raise ActionParseError(f"SCROLL needs UP, DOWN, LEFT or RIGHT, got {target!r}")
+            target = direction.lower()
+        elif name == 'WAIT':
+            target = target or "2 seconds"
+        elif not target:
+            raise ActionParseError(f"{name} needs a target")
+        return cls(ACTION_TYPES[name], target)
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict):
+            raise ActionParseError(f"action must be an object, got {type(data).__name__}")
+        return cls.create(data.get("type"), data.get("target"))
+
+
+def load_json_object(text):
+    """
+    Decode the JSON object in a model response, tolerating code fences,
+    surrounding prose and trailing commas; raises ActionParseError
+    """
+    text = (text or "").strip()
+    fence = re.search(r"```(?:json)?\s*(.*?)```", text, re.DOTALL)
+    if fence:
+        text = fence.group(1).strip()
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end == -1:
+        raise ActionParseError("no JSON object in the response")
+    text = text[start:end + 1]
+    try:
+        data = json.loads(text)
+    except ValueError:
+        try:
+            data = json.loads(re.sub(r",\s*([}\]])", r"\1", text))
+        except ValueError as e:
+            raise ActionParseError(f"invalid JSON: {e}")
+    if not isinstance(data, dict):
+        raise ActionParseError("the response is not a JSON object")
+    return data
+
+
+def parse_action_list(items):
+    """Validate a list of action objects; returns (actions, errors)"""
+    if not isinstance(items, list):
+        raise ActionParseError('"actions" must be a list')
+    actions, errors = [], []
+    for index, item in enumerate(items, 1):
+        try:
+            actions.append(Action.from_dict(item))
+        except ActionParseError as e:
+            errors.append(f"action {index}: {e}")
+    return actions, errors
+
+
+def parse_action_lines(text):
+    """
+    Legacy "ACTION_N: TYPE:target" lines (only the first colon after the type
+    separates it from the target, so URLs survive); returns (thought, actions, errors)
+    """
+    thought, actions, errors = "", [], []
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if line.startswith("THOUGHT:"):
+            thought = line[len("THOUGHT:"):].strip()
+            continue
+        match = re.match(r"^ACTION_\d+\s*:\s*([A-Za-z]+)\s*:\s*(.*)$", line)
+        if match:
+            try:
+                actions.append(Action.create(match.group(1), match.group(2)))
+            except ActionParseError as e:
+                errors.append(f"{line}: {e}")
+        elif line.startswith("ACTION_"):
+            errors.append(f"{line}: expected ACTION_N: TYPE:target")
+    return thought, actions, errors
+
+
+def parse_plan(text):
+    """
+    Parse a planner response into {"thought", "actions"}: JSON first, then the
+    legacy line format. Raises ActionParseError if nothing usable was found or
+    some actions were invalid (the valid ones are in the error's partial).
+    """
+    try:
+        data = load_json_object(text)
+        thought = str(data.get("thought", ""))
+        actions, errors = parse_action_list(data.get("actions", []))
+    except ActionParseError as json_error:
+        thought, actions, errors = parse_action_lines(text)
+        if not actions and not errors:
+            raise json_error
+    plan = {"thought": thought, "actions": actions}
+    if errors:
+        raise ActionParseError("; ".join(errors), partial=plan)
+    return plan
+
+
+def parse_step(text):
+    """
+    Parse a combined step response into page_summary, task_completed,
+    completion_reason, thought and actions; raises ActionParseError
+    """
+    data = load_json_object(text)
+    for key in ("page_summary", "task_completed", "actions"):
+        if key not in data:
+            raise ActionParseError(f'missing "{key}"')
+    if not isinstance(data["task_completed"], bool):
+        raise ActionParseError('"task_completed" must be true or false')
+    actions, errors = parse_action_list(data["actions"])
+    step = {
+        "page_summary": str(data.get("page_summary", "")),
+        "task_completed": data["task_completed"],
+        "completion_reason": str(data.get("completion_reason", "")),
+        "thought": str(data.get("thought", "")),
+        "actions": actions,
+    }
+    if errors:
+        raise ActionParseError("; ".join(errors), partial=step)
+    return step
+
+
+class ActionStream:
+    """
+    Incremental parser for a JSON response that is still arriving: feed() text
+    chunks and get back each action of the "actions" array as soon as its
+    object is complete. Invalid actions are collected in errors.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.position = None                # Just after the "actions" array's '['
+        self.done = False
+        self.count = 0                      # Objects seen in the array, valid or not
+        self.actions = []
+        self.errors = []
+
+    def feed(self, chunk):
+        """Add text; returns the actions completed by it"""
+        self.buffer += chunk
+        if self.done:
+            return []
+        if self.position is None:
+            match = re.search(r'"actions"\s*:\s*\[', self.buffer)
+            if not match:
+                return []
+            self.position = match.end()
+
+        new_actions = []
+        while True:
+            span = self._next_object()
+            if span is None:
+                break
+            start, end = span
+            self.position = end
+            self.count += 1
+            try:
+                new_actions.append(Action.from_dict(load_json_object(self.buffer[start:end])))
+            except ActionParseError as e:
+                self.errors.append(f"action {self.count}: {e}")
+        self.actions.extend(new_actions)
+        return new_actions
+
+    def field(self, name):
+        """A top-level string or boolean field once its value has fully arrived, else None"""
+        match = re.search(r'"%s"\s*:\s*(true|false|"(?:[^"\\]|\\.)*")' % re.escape(name), self.buffer)
+        if not match:
+            return None
+        try:
+            return json.loads(match.group(1))
+        except ValueError:
+            return None
+
+    def partial_result(self):
+        """What is known of a plan or step response that was cut off: its fields so far and the actions"""
+        return {
+            "page_summary": str(self.field("page_summary") or ""),
+            "task_completed": self.field("task_completed") is True,
+            "completion_reason": str(self.field("completion_reason") or ""),
+            "thought": str(self.field("thought") or ""),
+            "actions": list(self.actions),
+        }
+
+    def _next_object(self):
+        """(start, end) of the next complete object in the array, or None"""
+        text, i = self.buffer, self.position
+        while i < len(text) and text[i] in " \t\r\n,":
+            i += 1
+        if i >= len(text):
+            return None
+        if text[i] == ']':
+            self.done = True
+            return None
+        if text[i] != '{':
+            self.errors.append(f"unexpected {text[i]!r} in the actions array")
+            self.done = True
+            return None
+        depth, in_string, escaped = 0, False, False
+        for j in range(i, len(text)):
+            char = text[j]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+                if depth == 0:
+                    return i, j + 1
+        return None
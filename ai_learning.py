@@ -1,117 +1,235 @@
-import json
 import os
 import time
 from datetime import datetime
 from collections import defaultdict
 import hashlib
+import math
+import re
+import threading
+from learning_store import SQLiteLearningStore, migrate_json_to_sqlite, same_website, website_from_url
+from tracing import traced
 
-class AILearningSystem:
-    def __init__(self, learning_file="ai_learning_data.json"):
-        self.learning_file = learning_file
-        self.learning_data = self.load_learning_data()
-        
-    def load_learning_data(self):
-        """Load existing learning data from file"""
-        if os.path.exists(self.learning_file):
-            try:
-                with open(self.learning_file, 'r') as f:
-                    return json.load(f)
-            except:
-                pass
-        
-        # Initialize new learning data structure
-        return {
-            "task_patterns": {},           # Patterns in successful vs failed tasks
-            "element_failures": {},        # Elements that failed to be found/clicked
-            "website_patterns": {},        # Website-specific patterns
-            "action_success_rates": {},    # Success rates of different actions
-            "common_mistakes": [],         # List of common mistakes
-            "improvement_suggestions": {}, # Suggestions for different scenarios
-            "task_completion_stats": {},   # Statistics about task completion
-            "last_updated": datetime.now().isoformat()
-        }
+# Learned selectors whose confidence drops below this are forgotten
+MIN_SELECTOR_CONFIDENCE = 0.5
+
+# Positional descriptions ("second video") pick items from listings whose
+# content changes between visits, so their selectors are not remembered
+ORDINAL_WORDS = {'first', 'second', 'third', 'fourth', 'fifth', 'sixth', 'seventh', 'eighth',
+                 'ninth', 'tenth', 'last', '1st', '2nd', '3rd', '4th', '5th'}
+
+def normalize_description(description):
+    """Lowercase and drop punctuation so small wording differences share one cache entry"""
+    return " ".join(re.findall(r"[a-z0-9@]+", description.lower()))
+
+def selector_confidence(hits, failures):
+    """Laplace-smoothed success rate of a learned selector"""
+    return (hits + 1) / (hits + failures + 2)
+
+class GoalIndex:
+    """Inverted token -> attempt index for similar-goal lookups"""
     
-    def save_learning_data(self):
-        """Save learning data to file"""
-        self.learning_data["last_updated"] = datetime.now().isoformat()
-        with open(self.learning_file, 'w') as f:
-            json.dump(self.learning_data, f, indent=2)
+    def __init__(self):
+        self.postings = defaultdict(set)  # token -> ids of attempts containing it
+        self.attempts = {}                # attempt id -> attempt
+        self.goal_tokens = {}             # attempt id -> tokens of its goal
+        self.lock = threading.RLock()
     
-    def record_task_attempt(self, user_goal, actions_taken, success, final_url, screenshot_path=None):
-        """Record a task attempt for learning"""
-        task_hash = hashlib.md5(user_goal.encode()).hexdigest()[:8]
+    @staticmethod
+    def tokenize(goal):
+        """Same keyword split as AILearningSystem.similar_goals"""
+        return set(goal.lower().split())
+    
+    def add(self, attempt):
+        """Index one attempt (a dict with at least 'id' and 'goal')"""
+        tokens = self.tokenize(attempt["goal"])
+        with self.lock:
+            self.attempts[attempt["id"]] = attempt
+            self.goal_tokens[attempt["id"]] = tokens
+            for token in tokens:
+                self.postings[token].add(attempt["id"])
+    
+    def __len__(self):
+        return len(self.attempts)
+    
+    def idf(self, token):
+        """Inverse document frequency of a token over all indexed goals"""
+        return math.log((1 + len(self.attempts)) / (1 + len(self.postings.get(token, ())))) + 1
+    
+    def search(self, goal, min_common=2, success=None, website=None, ranking=None, top_k=None,
+               start_website=None):
+        """
+        Attempts sharing at least min_common keywords with the goal.
+        Cost scales with the posting lists of the goal's tokens, not with history size.
+        ranking: None (insertion order), 'jaccard' or 'tfidf'. Returns (score, attempt) pairs.
+        website filters on the host of the final URL, start_website on the site
+        the attempt started on (attempts recorded without a start URL count as
+        starting where they ended); hosts are compared without a leading 'www.'.
+        """
+        query = self.tokenize(goal)
+        weights = {}
         
-        # Extract key information
-        task_info = {
-            "goal": user_goal,
-            "actions": actions_taken,
-            "success": success,
-            "final_url": final_url,
-            "timestamp": datetime.now().isoformat(),
-            "screenshot": screenshot_path
-        }
+        def weight(token):
+            # Squared idf, memoized for the duration of one search
+            if token not in weights:
+                weights[token] = self.idf(token) ** 2
+            return weights[token]
         
-        # Store in learning data
-        if task_hash not in self.learning_data["task_patterns"]:
-            self.learning_data["task_patterns"][task_hash] = []
+        with self.lock:
+            query_norm = sum(weight(t) for t in query) if ranking == 'tfidf' else 0
+            # Prefix filtering: a match shares at least min_common query tokens, so it must
+            # appear in one of the postings left after dropping the (min_common - 1) longest
+            # lists (usually stopwords like "on" or "for").
+            by_length = sorted(query, key=lambda t: len(self.postings.get(t, ())))
+            probe = by_length[:len(by_length) - (min_common - 1)] if min_common > 1 else by_length
+            candidate_ids = set()
+            for token in probe:
+                candidate_ids.update(self.postings.get(token, ()))
+            
+            matches = []
+            for attempt_id in candidate_ids:
+                tokens = self.goal_tokens[attempt_id]
+                count = len(query & tokens)
+                if count < min_common:
+                    continue
+                attempt = self.attempts[attempt_id]
+                if success is not None and bool(attempt["success"]) != success:
+                    continue
+                if website is not None and not same_website(website, website_from_url(attempt.get("final_url"))):
+                    continue
+                if start_website is not None and not same_website(
+                        start_website, website_from_url(attempt.get("start_url") or attempt.get("final_url"))):
+                    continue
+                if ranking == 'jaccard':
+                    score = count / len(query | tokens)
+                elif ranking == 'tfidf':
+                    shared = sum(weight(t) for t in query & tokens)
+                    norm = math.sqrt(query_norm * sum(weight(t) for t in tokens))
+                    score = shared / norm if norm else 0
+                else:
+                    score = count
+                matches.append((score, attempt))
         
-        self.learning_data["task_patterns"][task_hash].append(task_info)
+        if ranking:
+            matches.sort(key=lambda match: (-match[0], match[1]["id"]))
+        else:
+            matches.sort(key=lambda match: match[1]["id"])
+        return matches[:top_k] if top_k else matches
+
+class AILearningSystem:
+    def __init__(self, learning_file="ai_learning_data.json", store=None):
+        self.learning_file = learning_file
+        self.store = store if store is not None else self.open_default_store()
+        self._goal_index = None
+        # Guards the goal index so one learner can be shared by parallel workers
+        self.lock = threading.RLock()
         
-        # Update success statistics
-        if user_goal not in self.learning_data["task_completion_stats"]:
-            self.learning_data["task_completion_stats"][user_goal] = {"success": 0, "total": 0}
+    @property
+    def goal_index(self):
+        """Inverted goal index, built from the store on first use and kept up to date"""
+        with self.lock:
+            if self._goal_index is None:
+                index = GoalIndex()
+                for attempt in self.store.task_attempts():
+                    index.add(attempt)
+                self._goal_index = index
+            return self._goal_index
+    
+    def find_similar_attempts(self, user_goal, success=None, website=None, ranking=None, top_k=None,
+                              start_website=None):
+        """Past attempts with similar goals, optionally ranked ('jaccard' or 'tfidf') and limited to top_k"""
+        return [attempt for _, attempt in self.goal_index.search(
+            user_goal, success=success, website=website, ranking=ranking, top_k=top_k, start_website=start_website
+        )]
         
-        self.learning_data["task_completion_stats"][user_goal]["total"] += 1
-        if success:
-            self.learning_data["task_completion_stats"][user_goal]["success"] += 1
+    def open_default_store(self):
+        """Open the SQLite store next to the learning file, importing the legacy JSON once"""
+        db_path = os.path.splitext(self.learning_file)[0] + ".db"
+        store = SQLiteLearningStore(db_path)
+        imported = migrate_json_to_sqlite(self.learning_file, store)
+        if imported:
+            print(f"📚 Migrated {imported} learning events from {self.learning_file} to {db_path}")
+        return store
+    
+    @property
+    def learning_data(self):
+        """Learning data in the original dictionary format (read-only; rebuilt only after writes)"""
+        return self.store.export_data()
         
-        self.save_learning_data()
+    def load_learning_data(self):
+        """Load existing learning data from the store"""
+        return self.store.export_data()
     
+    def save_learning_data(self):
+        """Persist pending learning data (each event is already written as it is recorded)"""
+        self.store.flush()
+    
+    @traced("learning.record_task_attempt")
+    def record_task_attempt(self, user_goal, actions_taken, success, final_url, screenshot_path=None,
+                            start_url=None):
+        """Record a task attempt for learning (start_url: the page the goal started on)"""
+        task_hash = hashlib.md5(user_goal.encode()).hexdigest()[:8]
+        timestamp = datetime.now().isoformat()
+        with self.lock:
+            attempt_id = self.store.add_task_attempt(task_hash, user_goal, actions_taken, success, final_url,
+                                                     screenshot_path, timestamp, start_url)
+            
+            # Keep the goal index current without rebuilding it
+            if self._goal_index is not None:
+                self._goal_index.add({
+                    "id": attempt_id,
+                    "task_hash": task_hash,
+                    "goal": user_goal,
+                    "actions": [tuple(a) if isinstance(a, list) else a for a in actions_taken],
+                    "success": success,
+                    "final_url": final_url,
+                    "start_url": start_url,
+                    "timestamp": timestamp,
+                    "screenshot": screenshot_path
+                })
+    
+    @traced("learning.record_element_failure")
     def record_element_failure(self, element_description, website, action_type, error_message):
         """Record when an element couldn't be found or interacted with"""
-        failure_key = f"{website}_{element_description}_{action_type}"
-        
-        if failure_key not in self.learning_data["element_failures"]:
-            self.learning_data["element_failures"][failure_key] = {
-                "count": 0,
-                "errors": [],
-                "suggestions": []
-            }
-        
-        self.learning_data["element_failures"][failure_key]["count"] += 1
-        self.learning_data["element_failures"][failure_key]["errors"].append({
-            "error": error_message,
-            "timestamp": datetime.now().isoformat()
-        })
-        
         # Generate suggestions based on failure patterns
         suggestions = self.generate_element_suggestions(element_description, website, action_type)
-        self.learning_data["element_failures"][failure_key]["suggestions"] = suggestions
-        
-        self.save_learning_data()
+        self.store.add_element_failure(website, element_description, action_type, error_message,
+                                       datetime.now().isoformat(), suggestions)
     
+    @traced("learning.record_action_success")
     def record_action_success(self, action_type, description, success, website):
         """Record success/failure of specific actions"""
-        action_key = f"{action_type}_{website}"
-        
-        if action_key not in self.learning_data["action_success_rates"]:
-            self.learning_data["action_success_rates"][action_key] = {
-                "success": 0,
-                "total": 0,
-                "descriptions": []
-            }
-        
-        self.learning_data["action_success_rates"][action_key]["total"] += 1
-        if success:
-            self.learning_data["action_success_rates"][action_key]["success"] += 1
-        
-        self.learning_data["action_success_rates"][action_key]["descriptions"].append({
-            "description": description,
-            "success": success,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        self.save_learning_data()
+        self.store.add_action_result(action_type, website, description, success, datetime.now().isoformat())
+    
+    def is_cacheable_description(self, element_description):
+        """Whether the selector resolving this description is worth remembering"""
+        return not (set(normalize_description(element_description).split()) & ORDINAL_WORDS)
+    
+    def get_cached_selectors(self, website, element_description):
+        """Learned selectors for a description on a website, most trusted first"""
+        if not self.is_cacheable_description(element_description):
+            return []
+        entries = self.store.selector_stats(website, normalize_description(element_description))
+        ranked = sorted(
+            ((selector_confidence(e["hits"], e["failures"]), e["hits"], e["selector"]) for e in entries),
+            reverse=True
+        )
+        return [selector for confidence, _, selector in ranked if confidence >= MIN_SELECTOR_CONFIDENCE]
+    
+    @traced("learning.record_selector")
+    def record_selector_success(self, website, element_description, selector):
+        """Remember the selector that resolved a description on a website"""
+        if selector and self.is_cacheable_description(element_description):
+            self.store.add_selector_result(website, normalize_description(element_description), selector,
+                                           True, datetime.now().isoformat())
+    
+    @traced("learning.record_selector")
+    def record_selector_failure(self, website, element_description, selector):
+        """Lower a learned selector's confidence, forgetting it once it is no longer trusted"""
+        key = normalize_description(element_description)
+        stats = self.store.add_selector_result(website, key, selector, False, datetime.now().isoformat())
+        if selector_confidence(stats["hits"], stats["failures"]) < MIN_SELECTOR_CONFIDENCE:
+            self.store.remove_selector(website, key, selector)
+            print(f"🧹 Forgot learned selector {selector} for '{element_description}' on {website}")
     
     def generate_element_suggestions(self, element_description, website, action_type):
         """Generate suggestions based on common failure patterns"""
@@ -170,28 +288,30 @@ class AILearningSystem:
         suggestions = []
         
         # Check for similar failed tasks
-        for task_hash, attempts in self.learning_data["task_patterns"].items():
-            for attempt in attempts:
-                if not attempt["success"] and self.similar_goals(user_goal, attempt["goal"]):
-                    # Analyze what went wrong - actions are tuples (action_type, description)
-                    failed_actions = [a for a in attempt["actions"] if isinstance(a, tuple) and len(a) >= 2]
-                    if failed_actions:
-                        suggestions.append(f"Similar task failed: {attempt['goal']}")
-                        suggestions.append(f"Failed actions: {[f'{a[0]}: {a[1]}' for a in failed_actions[:3]]}")
+        for attempt in self.find_similar_attempts(user_goal, success=False):
+            # Analyze what went wrong - actions are tuples (action_type, description)
+            failed_actions = [a for a in attempt["actions"] if isinstance(a, tuple) and len(a) >= 2]
+            if failed_actions:
+                suggestions.append(f"Similar task failed: {attempt['goal']}")
+                suggestions.append(f"Failed actions: {[f'{a[0]}: {a[1]}' for a in failed_actions[:3]]}")
         
         # Check for website-specific patterns
-        if current_website in self.learning_data["website_patterns"]:
-            website_patterns = self.learning_data["website_patterns"][current_website]
-            if "common_elements" in website_patterns:
-                suggestions.extend(website_patterns["common_elements"])
+        website_patterns = self.store.website_patterns(current_website)
+        if "common_elements" in website_patterns:
+            suggestions.extend(website_patterns["common_elements"])
         
         # Check for element failures on this website
-        for failure_key, failure_data in self.learning_data["element_failures"].items():
-            if current_website in failure_key and failure_data["count"] > 2:
-                suggestions.extend(failure_data["suggestions"][:3])  # Top 3 suggestions
+        for failure in self.store.element_failures(website=current_website, min_count=3):
+            suggestions.extend(self.failure_suggestions(failure)[:3])  # Top 3 suggestions
         
         return list(set(suggestions))  # Remove duplicates
     
+    def failure_suggestions(self, failure):
+        """Suggestions for an aggregated element failure"""
+        return failure.get("suggestions") or self.generate_element_suggestions(
+            failure["description"], failure["website"], failure["action_type"]
+        )
+    
     def similar_goals(self, goal1, goal2):
         """Check if two goals are similar"""
         # Simple similarity check - can be enhanced with NLP
@@ -205,15 +325,14 @@ class AILearningSystem:
         strategies = []
         
         # Find successful similar tasks
-        for task_hash, attempts in self.learning_data["task_patterns"].items():
-            successful_attempts = [a for a in attempts if a["success"]]
-            for attempt in successful_attempts:
-                if self.similar_goals(user_goal, attempt["goal"]) and website in attempt["final_url"]:
-                    strategies.append({
-                        "goal": attempt["goal"],
-                        "actions": attempt["actions"],
-                        "success_rate": len(successful_attempts) / len(attempts)
-                    })
+        attempts = self.find_similar_attempts(user_goal, success=True, website=website)
+        success_rates = self.store.task_success_rates({a["task_hash"] for a in attempts}) if attempts else {}
+        for attempt in attempts:
+            strategies.append({
+                "goal": attempt["goal"],
+                "actions": attempt["actions"],
+                "success_rate": success_rates.get(attempt["task_hash"], 0)
+            })
         
         return strategies
     
@@ -222,47 +341,40 @@ class AILearningSystem:
         common_mistakes = []
         
         # Analyze element failures
-        for failure_key, failure_data in self.learning_data["element_failures"].items():
-            if failure_data["count"] >= 3:  # Mistake made 3+ times
-                common_mistakes.append({
-                    "type": "element_failure",
-                    "description": failure_key,
-                    "count": failure_data["count"],
-                    "suggestions": failure_data["suggestions"]
-                })
+        for failure in self.store.element_failures(min_count=3):  # Mistake made 3+ times
+            common_mistakes.append({
+                "type": "element_failure",
+                "description": failure["failure_key"],
+                "count": failure["count"],
+                "suggestions": self.failure_suggestions(failure)
+            })
         
         # Analyze low success rate actions
-        for action_key, action_data in self.learning_data["action_success_rates"].items():
-            if action_data["total"] >= 5:  # At least 5 attempts
-                success_rate = action_data["success"] / action_data["total"]
-                if success_rate < 0.5:  # Less than 50% success
-                    common_mistakes.append({
-                        "type": "low_success_action",
-                        "description": action_key,
-                        "success_rate": success_rate,
-                        "total_attempts": action_data["total"]
-                    })
+        for action_data in self.store.action_stats(min_total=5):  # At least 5 attempts
+            success_rate = action_data["success"] / action_data["total"]
+            if success_rate < 0.5:  # Less than 50% success
+                common_mistakes.append({
+                    "type": "low_success_action",
+                    "description": action_data["action_key"],
+                    "success_rate": success_rate,
+                    "total_attempts": action_data["total"]
+                })
         
-        self.learning_data["common_mistakes"] = common_mistakes
-        self.save_learning_data()
+        self.store.set_common_mistakes(common_mistakes)
         return common_mistakes
     
     def get_learning_summary(self):
         """Get a summary of what the AI has learned"""
-        total_tasks = sum(len(attempts) for attempts in self.learning_data["task_patterns"].values())
-        successful_tasks = sum(
-            sum(1 for attempt in attempts if attempt["success"])
-            for attempts in self.learning_data["task_patterns"].values()
-        )
+        total_tasks, successful_tasks = self.store.task_counts()
+        element_failures = self.store.element_failures()
         
         return {
             "total_tasks_attempted": total_tasks,
             "successful_tasks": successful_tasks,
             "success_rate": successful_tasks / total_tasks if total_tasks > 0 else 0,
-            "common_mistakes_count": len(self.learning_data["common_mistakes"]),
-            "element_failures_count": len(self.learning_data["element_failures"]),
-            "websites_learned": list(set(
-                key.split('_')[0] for key in self.learning_data["element_failures"].keys()
-            )),
-            "last_updated": self.learning_data["last_updated"]
+            "common_mistakes_count": len(self.store.common_mistakes()),
+            "element_failures_count": len(element_failures),
+            "websites_learned": list(set(failure["website"] for failure in element_failures)),
+            "learned_selectors": self.store.selector_count(),
+            "last_updated": self.store.last_updated()
         }
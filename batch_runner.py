@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Batch runner for Miki Miki
+
+Runs a file (or stdin) of goals across a pool of browser workers instead of
+one goal at a time from the interactive prompt. Browsers come from a warm
+BrowserPool (a reusable profile per slot, health-checked and reset between
+goals); each worker has its own screenshot directory, model calls from
+different workers run concurrently and results are streamed to a JSONL file.
+
+Usage:
+    python batch_runner.py goals.txt --workers 4 --output results.jsonl
+    cat goals.jsonl | python batch_runner.py - --headless --timeout 300
+    python batch_runner.py goals.txt --headless --block-images --block-fonts --viewport 1280x800
+
+Goal files are plain text (one goal per line) or JSONL objects with a "goal"
+key and an optional "id".
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+from ai_learning import AILearningSystem
+from browser_pool import BrowserConfig, BrowserPool
+from main import run_goal, format_model_call_summary, create_network_policy, NETWORK_DOMAIN_BLOCKLISTS
+from network_policy import NetworkPolicy, format_bytes
+
+
+def load_goals(path):
+    """
+    Read goals from a text/JSONL file ('-' for stdin) as dicts with id and goal
+    """
+    handle = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    goals = []
+    try:
+        for line_number, line in enumerate(handle, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                entry = json.loads(line)
+                goals.append({"id": entry.get("id", line_number), "goal": entry["goal"]})
+            else:
+                goals.append({"id": line_number, "goal": line})
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+    return goals
+
+
+class BatchRunner:
+    def __init__(self, workers=2, output="results.jsonl", retries=1, timeout=300,
+                 headless=True, work_dir="batch_runs", ai_learner=None, browser_config=None, max_uses=50):
+        self.workers = workers
+        self.output = output
+        self.retries = retries
+        self.timeout = timeout
+        self.headless = headless
+        self.work_dir = work_dir
+        self.browser_config = browser_config or BrowserConfig(headless=headless, page_load_timeout=min(timeout, 60),
+                                                              network_policy=create_network_policy())
+        # One warm browser per worker, each with its own reusable profile directory
+        self.pool = BrowserPool(self.browser_config, size=workers, max_uses=max_uses,
+                                profile_root=os.path.join(work_dir, "profiles"))
+        # One learner shared by every worker; its store and index are lock-protected
+        self.ai_learner = ai_learner or AILearningSystem()
+        self.goal_queue = queue.Queue()
+        self.output_lock = threading.Lock()
+        self.stats = {"completed": 0, "failed": 0, "retries": 0}
+
+    def write_result(self, result):
+        """Append one result line to the JSONL output as soon as it is ready"""
+        with self.output_lock:
+            with open(self.output, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(result) + '\n')
+            self.stats["completed" if result["success"] else "failed"] += 1
+
+    def run_with_retries(self, worker_id, entry):
+        """
+        Run one goal, retrying failed attempts. Each attempt takes a browser from
+        the pool; a crashed browser is discarded and replaced in the background.
+        """
+        screenshot_dir = os.path.join(self.work_dir, f"worker_{worker_id}", f"goal_{entry['id']}")
+        os.makedirs(screenshot_dir, exist_ok=True)
+        result = None
+
+        for attempt in range(1, self.retries + 2):
+            if attempt > 1:
+                with self.output_lock:
+                    self.stats["retries"] += 1
+                print(f"🔁 Worker {worker_id}: retry {attempt - 1}/{self.retries} for goal {entry['id']}")
+            driver = None
+            try:
+                driver = self.pool.acquire()
+                result = run_goal(driver, entry["goal"], self.ai_learner, [],
+                                  screenshot_dir=screenshot_dir, deadline=time.time() + self.timeout)
+                self.pool.release(driver)
+            except Exception as e:
+                print(f"❌ Worker {worker_id}: goal {entry['id']} crashed: {e}")
+                result = {"goal": entry["goal"], "success": False, "final_url": None, "actions": [],
+                          "model_calls": 0, "duration": 0.0, "error": str(e)}
+                # The browser may be unusable after a crash; replace it
+                if driver is not None:
+                    self.pool.discard(driver)
+
+            result["attempts"] = attempt
+            if result["success"]:
+                break
+
+        return result
+
+    def worker(self, worker_id):
+        """Consume goals from the queue until the stop sentinel arrives"""
+        while True:
+            entry = self.goal_queue.get()
+            if entry is None:
+                break
+            result = self.run_with_retries(worker_id, entry)
+            result.update({"id": entry["id"], "worker": worker_id,
+                           "finished_at": datetime.now().isoformat()})
+            self.write_result(result)
+            status = "✅" if result["success"] else "❌"
+            print(f"{status} Worker {worker_id}: goal {entry['id']} in {result['duration']}s "
+                  f"({result['model_calls']} model calls)")
+
+    def run(self, goals):
+        """Run all goals across the worker pool and return the summary stats"""
+        os.makedirs(self.work_dir, exist_ok=True)
+        # Launch the browsers in the background while the goals are queued
+        self.pool.warm()
+        for entry in goals:
+            self.goal_queue.put(entry)
+        for _ in range(self.workers):
+            self.goal_queue.put(None)
+
+        start = time.time()
+        threads = [threading.Thread(target=self.worker, args=(i,), name=f"miki-worker-{i}", daemon=True)
+                   for i in range(1, self.workers + 1)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.pool.close()
+
+        summary = dict(self.stats, goals=len(goals), workers=self.workers,
+                       wall_time=round(time.time() - start, 3))
+        print(f"\n📊 Batch finished: {summary['completed']}/{len(goals)} goals completed, "
+              f"{summary['retries']} retries, {summary['wall_time']}s wall time")
+        print(f"📞 {format_model_call_summary()}")
+        pool_stats = self.pool.get_stats()
+        summary["browser_launches"] = pool_stats["launches"]
+        print(f"🌐 Browsers: {pool_stats['launches']} launches (avg {pool_stats['avg_launch_time']:.1f}s), "
+              f"{pool_stats['warm_acquires']}/{pool_stats['acquires']} goals started on a warm browser, "
+              f"avg wait {pool_stats['avg_acquire_wait']:.2f}s")
+        network = self.browser_config.network_policy.get_stats()
+        summary.update({"requests_blocked": network["requests_blocked"], "bytes_saved": network["bytes_saved"],
+                        "bytes_loaded": network["bytes_loaded"]})
+        if network["requests_loaded"] or network["requests_blocked"]:
+            print(f"🛡️  Network: {format_bytes(network['bytes_loaded'])} loaded, {network['requests_blocked']} requests "
+                  f"blocked (~{format_bytes(network['bytes_saved'])} saved) {network['blocked_by_category']}")
+        return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Miki Miki goals in parallel browser workers")
+    parser.add_argument("goals", help="goal file (text or JSONL), '-' for stdin")
+    parser.add_argument("--workers", type=int, default=2, help="number of parallel browsers")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("--retries", type=int, default=1, help="retries per failed goal")
+    parser.add_argument("--timeout", type=int, default=300, help="seconds allowed per goal attempt")
+    parser.add_argument("--headed", dest="headless", action="store_false",
+                        help="show browser windows (browsers run headless by default)")
+    parser.add_argument("--work-dir", default="batch_runs", help="profiles and screenshots per worker")
+    parser.add_argument("--viewport", default="1366x900", help="browser viewport as WIDTHxHEIGHT")
+    parser.add_argument("--block-images", action="store_true", help="don't load images")
+    parser.add_argument("--block-fonts", action="store_true", help="don't load web fonts")
+    parser.add_argument("--block-media", action="store_true", help="don't load audio/video")
+    parser.add_argument("--no-block-ads", action="store_true", help="let ads and trackers load")
+    parser.add_argument("--essential-only", action="store_true",
+                        help="block everything but documents, scripts, styles and XHR")
+    parser.add_argument("--max-uses", type=int, default=50, help="goals per browser before it is recycled")
+    args = parser.parse_args(argv)
+
+    goals = load_goals(args.goals)
+    if not goals:
+        print("No goals to run.")
+        return
+    print(f"🚀 Running {len(goals)} goals on {args.workers} workers...")
+    width, height = (int(v) for v in args.viewport.lower().split("x"))
+    network_policy = NetworkPolicy(block_ads=not args.no_block_ads, block_trackers=not args.no_block_ads,
+                                   block_fonts=args.block_fonts, block_media=args.block_media,
+                                   block_images=args.block_images, essential_only=args.essential_only,
+                                   domain_blocklists=NETWORK_DOMAIN_BLOCKLISTS)
+    browser_config = BrowserConfig(headless=args.headless, viewport=(width, height),
+                                   page_load_timeout=min(args.timeout, 60), network_policy=network_policy)
+    runner = BatchRunner(workers=args.workers, output=args.output, retries=args.retries,
+                         timeout=args.timeout, headless=args.headless, work_dir=args.work_dir,
+                         browser_config=browser_config, max_uses=args.max_uses)
+    runner.run(goals)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark: single-pass element resolver vs the XPath strategy cascade
+
+Loads the saved HTML fixtures in headless Chrome and resolves the same
+descriptions with both approaches, reporting wall time, WebDriver round
+trips and whether the expected element (marked with data-bench-target) won.
+
+Usage:
+    python benchmarks/bench_element_resolver.py [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+from element_resolver import find_best_element
+from main import find_element_by_strategies
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# (fixture, description, expected data-bench-target)
+CASES = [
+    ("google_home.html", "large search box in center of page", "search"),
+    ("google_home.html", "Sign In button in top right corner", "signin"),
+    ("google_home.html", "Google Search button", "submit"),
+    ("youtube_results.html", "search box at the top of the page", "search"),
+    ("youtube_results.html", "second video title in the list", "second-video"),
+    ("amazon_results.html", "first laptop product image in the search results", "first-product"),
+    ("amazon_product.html", "Add to Cart button", "add-to-cart"),
+]
+
+
+def install_round_trip_counter(driver):
+    """
+    Wrap driver.execute so every WebDriver command is counted
+    """
+    counter = {"count": 0}
+    original_execute = driver.execute
+
+    def counting_execute(driver_command, params=None):
+        counter["count"] += 1
+        return original_execute(driver_command, params)
+
+    driver.execute = counting_execute
+    return counter
+
+
+def run_case(driver, counter, resolve, description):
+    """
+    Resolve one description, returning (element, seconds, round_trips)
+    """
+    counter["count"] = 0
+    start = time.perf_counter()
+    element = resolve(driver, description)
+    elapsed = time.perf_counter() - start
+    return element, elapsed, counter["count"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Element resolver benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case")
+    args = parser.parse_args()
+
+    chrome_options = Options()
+    chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--window-size=1366,900")
+    driver = webdriver.Chrome(options=chrome_options)
+    counter = install_round_trip_counter(driver)
+
+    strategies = {
+        "resolver": lambda d, desc: find_best_element(d, desc)[0],
+        "cascade": find_element_by_strategies,
+    }
+    totals = {name: {"time": 0.0, "trips": 0, "hits": 0} for name in strategies}
+
+    try:
+        print(f"{'case':<58} {'strategy':<9} {'ms':>8} {'trips':>6}  hit")
+        print("-" * 90)
+        for fixture, description, expected in CASES:
+            driver.get("file://" + os.path.join(FIXTURES_DIR, fixture))
+            for name, resolve in strategies.items():
+                times = []
+                for _ in range(args.repeat):
+                    element, elapsed, trips = run_case(driver, counter, resolve, description)
+                    times.append(elapsed)
+                hit = element is not None and element.get_attribute("data-bench-target") == expected
+                best = min(times)
+                totals[name]["time"] += best
+                totals[name]["trips"] += trips
+                totals[name]["hits"] += int(hit)
+                label = f"{fixture}: {description}"[:58]
+                print(f"{label:<58} {name:<9} {best * 1000:>8.1f} {trips:>6}  {'✅' if hit else '❌'}")
+
+        print("-" * 90)
+        for name, total in totals.items():
+            print(f"{name:<9} total {total['time'] * 1000:8.1f} ms, "
+                  f"{total['trips']} round trips, {total['hits']}/{len(CASES)} correct")
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark: inverted goal index vs linear similar_goals scan
+
+Fills an in-memory learning store with synthetic task history of growing
+size and times get_improvement_suggestions-style lookups both ways.
+
+Usage:
+    python benchmarks/bench_goal_index.py [--sizes 100,1000,10000,50000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_learning import AILearningSystem
+from learning_store import JSONLearningStore
+
+VERBS = ["search for", "find", "play", "buy", "open", "watch", "look up", "compare", "read", "book"]
+ADJECTIVES = ["cheap", "best", "new", "used", "funny", "live", "beginner", "advanced", "vintage", "wireless",
+              "red", "large", "quiet", "fast", "local", "organic", "classic", "portable", "smart", "free"]
+NOUNS = ["laptops", "headphones", "tutorials", "videos", "recipes", "cameras", "boots", "guitars", "flights",
+         "hotels", "news", "podcasts", "books", "sneakers", "monitors", "keyboards", "tents", "bikes", "phones",
+         "courses", "concerts", "jackets", "lamps", "watches", "games"]
+SITES = ["google", "youtube", "amazon", "ebay", "wikipedia", "reddit", "bing", "etsy", "imdb", "spotify"]
+QUERIES = ["search for beginner tutorials on google", "play funny videos on youtube",
+           "buy cheap laptops on amazon", "find vintage guitars on ebay"]
+
+
+def synthetic_goal(rng):
+    return f"{rng.choice(VERBS)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} on {rng.choice(SITES)}"
+
+
+def build_learner(size, seed=42):
+    rng = random.Random(seed)
+    learner = AILearningSystem(store=JSONLearningStore(learning_file=None))
+    for _ in range(size):
+        site = rng.choice(SITES)
+        learner.record_task_attempt(synthetic_goal(rng), [("click", "search box"), ("type", "query")],
+                                    rng.random() < 0.6, f"https://www.{site}.com/results")
+    return learner
+
+
+def linear_scan(learner, goal):
+    """The pre-index lookup: tokenize and compare against every attempt"""
+    return [a for a in learner.store.task_attempts() if learner.similar_goals(goal, a["goal"])]
+
+
+def time_lookups(lookup, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for goal in QUERIES:
+            results = lookup(goal)
+    return (time.perf_counter() - start) / (repeat * len(QUERIES)), len(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Goal index benchmark")
+    parser.add_argument("--sizes", default="100,1000,10000,50000", help="comma separated history sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="lookup rounds per size")
+    args = parser.parse_args()
+
+    print(f"{'history':>8} {'linear ms':>10} {'index ms':>9} {'tfidf top10 ms':>15} {'matches':>8} {'speedup':>8}")
+    print("-" * 64)
+    for size in [int(s) for s in args.sizes.split(",")]:
+        learner = build_learner(size)
+        learner.goal_index  # build once, as the agent does on its first lookup
+        linear, _ = time_lookups(lambda g: linear_scan(learner, g), args.repeat)
+        indexed, matches = time_lookups(lambda g: learner.find_similar_attempts(g), args.repeat)
+        ranked, _ = time_lookups(lambda g: learner.find_similar_attempts(g, ranking="tfidf", top_k=10), args.repeat)
+        print(f"{size:>8} {linear * 1000:>10.2f} {indexed * 1000:>9.2f} {ranked * 1000:>15.2f} "
+              f"{matches:>8} {linear / indexed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Benchmark: offline end-to-end replay of the agent loop
+
+Serves the saved HTML fixtures from a local HTTP server, replaces Gemini with
+a deterministic stub answering from recorded step responses, and runs whole
+goals through run_goal (the body of the interactive autonomous_ai_browser
+loop) in headless Chrome. Reports wall time, WebDriver round trips, model
+calls and success per scenario, so regressions show up as numbers without a
+network connection or an API key.
+
+Usage:
+    python benchmarks/bench_replay.py [--repeat 3] [--model-latency 0.5] [--json out.json]
+"""
+
+import argparse
+import functools
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as agent
+from ai_learning import AILearningSystem
+from gemini_client import FakeBackend
+from learning_store import JSONLearningStore
+from tracing import tracer
+from bench_element_resolver import install_round_trip_counter
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def step(summary, actions=(), completed=False, reason=""):
+    """A recorded combined-step response as the model would return it"""
+    return json.dumps({
+        "page_summary": summary,
+        "task_completed": completed,
+        "completion_reason": reason,
+        "thought": reason or summary,
+        "actions": [{"type": t, "target": target} for t, target in actions],
+    })
+
+
+# Each scenario starts on a fixture page. Recorded responses are matched on a
+# fragment of the CURRENT URL in the prompt and consumed in order (the last one
+# repeats). "check" is a JS expression telling whether the goal really succeeded.
+SCENARIOS = [
+    {
+        "name": "google_search",
+        "start": "google_home.html",
+        "goal": "search for python tutorials on Google",
+        "responses": [
+            ("google_home.html", [step(
+                "Google home page with a search box in the center",
+                [("CLICK", "search box in the center of the page"), ("TYPE", "python tutorials"), ("PRESS", "ENTER")],
+            )]),
+            ("google_results.html", [step(
+                "Google results for python tutorials", completed=True,
+                reason="Search results for python tutorials are displayed",
+            )]),
+        ],
+        "check": "return location.pathname.endsWith('google_results.html') && "
+                 "new URLSearchParams(location.search).get('q') === 'python tutorials';",
+    },
+    {
+        "name": "youtube_second_video",
+        "start": "youtube_results.html?search_query=funny+cats",
+        "goal": "play the second funny cats video on YouTube",
+        "responses": [
+            ("youtube_results.html", [step(
+                "YouTube search results for funny cats, a vertical list of videos",
+                [("CLICK", "second video title in the list")],
+            )]),
+            ("youtube_watch.html", [step(
+                "YouTube watch page, the video player is visible", completed=True,
+                reason="The second video is playing",
+            )]),
+        ],
+        "check": "return location.pathname.endsWith('youtube_watch.html') && "
+                 "new URLSearchParams(location.search).get('v') === 'video2';",
+    },
+    {
+        "name": "amazon_add_to_cart",
+        "start": "amazon_results.html?k=laptops",
+        "goal": "add the first laptop to the cart on Amazon",
+        "responses": [
+            ("amazon_results.html", [step(
+                "Amazon search results for laptops in a grid",
+                [("CLICK", "first laptop product image in the search results")],
+            )]),
+            ("amazon_product.html", [
+                step("Amazon product page with an Add to Cart button on the right",
+                     [("CLICK", "Add to Cart button")], reason="The item is not in the cart yet"),
+                step("Amazon product page, added to cart", completed=True,
+                     reason="The cart count shows 1 item"),
+            ]),
+        ],
+        "check": "return document.getElementById('nav-cart-count').textContent.trim() === '1';",
+    },
+]
+
+
+class RecordedResponses:
+    """
+    Stub model handler: answers step prompts from a scenario's recorded
+    responses, matched on the CURRENT URL in the prompt
+    """
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.used = {}
+
+    def __call__(self, model_name, parts):
+        prompt = "\n".join(p for p in parts if isinstance(p, str))
+        match = re.search(r"CURRENT URL:\s*(\S+)", prompt)
+        url = match.group(1) if match else ""
+        for fragment, answers in self.responses:
+            if fragment in url:
+                index = self.used.get(fragment, 0)
+                self.used[fragment] = index + 1
+                return answers[min(index, len(answers) - 1)]
+        # Unknown page or a non-step prompt: report no progress
+        return step("Unrecognized page", reason=f"No recorded response for {url or 'this prompt'}")
+
+
+def start_fixture_server():
+    """Serve the fixtures directory on a free localhost port in a background thread"""
+    class QuietHandler(SimpleHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    handler = functools.partial(QuietHandler, directory=FIXTURES_DIR)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, name="fixture-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def run_scenario(driver, counter, base_url, scenario, model_latency, work_dir):
+    """Replay one scenario and return its measurements"""
+    agent.gemini_client.set_backend(FakeBackend(handler=RecordedResponses(scenario["responses"]),
+                                                latency=model_latency))
+    agent.gemini_cache.clear()
+    # Fresh in-memory learner so runs don't learn from each other
+    ai_learner = AILearningSystem(store=JSONLearningStore(None))
+
+    driver.get(base_url + scenario["start"])
+    counter["count"] = 0
+    start = time.perf_counter()
+    result = agent.run_goal(driver, scenario["goal"], ai_learner, [], screenshot_dir=work_dir,
+                            deadline=time.time() + 120)
+    wall_time = time.perf_counter() - start
+    round_trips = counter["count"]
+
+    try:
+        verified = bool(driver.execute_script(scenario["check"]))
+    except Exception:
+        verified = False
+    return {
+        "scenario": scenario["name"],
+        "wall_time": round(wall_time, 3),
+        "round_trips": round_trips,
+        "model_calls": result["model_calls"],
+        "agent_success": result["success"],
+        "verified": verified,
+        "actions": len(result["actions"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end replay benchmark")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scenario (best wall time is reported)")
+    parser.add_argument("--model-latency", type=float, default=0.0, help="simulated seconds per model call")
+    parser.add_argument("--scenario", action="append", help="only run the named scenario(s)")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="show the agent's own output")
+    args = parser.parse_args()
+
+    scenarios = [s for s in SCENARIOS if not args.scenario or s["name"] in args.scenario]
+    server, base_url = start_fixture_server()
+    tracer.configure(None)  # Keep benchmark runs out of the trace file
+    driver = agent.create_driver(headless=True)
+    counter = install_round_trip_counter(driver)
+    work_dir = tempfile.mkdtemp(prefix="miki_replay_")
+    results = []
+
+    try:
+        for scenario in scenarios:
+            runs = []
+            for _ in range(args.repeat):
+                if args.verbose:
+                    runs.append(run_scenario(driver, counter, base_url, scenario, args.model_latency, work_dir))
+                else:
+                    with open(os.devnull, "w") as devnull:
+                        stdout = sys.stdout
+                        sys.stdout = devnull
+                        try:
+                            runs.append(run_scenario(driver, counter, base_url, scenario, args.model_latency, work_dir))
+                        finally:
+                            sys.stdout = stdout
+            best = min(runs, key=lambda r: r["wall_time"])
+            best["success_rate"] = sum(1 for r in runs if r["verified"]) / len(runs)
+            results.append(best)
+    finally:
+        driver.quit()
+        server.shutdown()
+
+    print(f"{'scenario':<24} {'wall s':>8} {'trips':>6} {'model':>6} {'actions':>8}  agent  verified")
+    print("-" * 76)
+    for r in results:
+        print(f"{r['scenario']:<24} {r['wall_time']:>8.2f} {r['round_trips']:>6} {r['model_calls']:>6} "
+              f"{r['actions']:>8}  {'✅' if r['agent_success'] else '❌'}     "
+              f"{'✅' if r['verified'] else '❌'} ({r['success_rate']:.0%})")
+    print("-" * 76)
+    print(f"{'total':<24} {sum(r['wall_time'] for r in results):>8.2f} "
+          f"{sum(r['round_trips'] for r in results):>6} {sum(r['model_calls'] for r in results):>6}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"model_latency": args.model_latency, "repeat": args.repeat, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Browser provisioning for Miki Miki
+
+launch_chrome() starts a Chrome WebDriver from a BrowserConfig (headless,
+fixed viewport, fast-start flags, a NetworkPolicy for ad/tracker/font/media
+blocking, reusable user-data dir). BrowserPool keeps pre-launched drivers warm, hands
+them out per goal, health-checks and resets them on return, and recycles
+them after a number of uses, so batch runs do not pay ChromeDriver and
+Chrome start-up for every goal.
+"""
+
+import os
+import queue
+import threading
+import time
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+from network_policy import NetworkPolicy
+
+# Put on the idle queue when a slot is freed, so a blocked acquire() wakes up
+# and can launch into the slot
+SLOT_FREED = object()
+
+# Flags that skip first-run work and background services Chrome does on start
+FAST_START_ARGS = [
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-sync",
+    "--disable-default-apps",
+    "--disable-dev-shm-usage",
+    "--mute-audio",
+]
+
+
+
+class BrowserConfig:
+    """
+    How a browser is launched; viewport None means a maximized window. Without
+    a network_policy, the block_* flags build one that blocks only those types.
+    """
+
+    def __init__(self, headless=False, viewport=None, block_images=False, block_fonts=False,
+                 block_media=False, profile_dir=None, page_load_strategy="normal", page_load_timeout=None,
+                 network_policy=None):
+        self.headless = headless
+        self.viewport = viewport or ((1366, 900) if headless else None)
+        self.profile_dir = profile_dir
+        self.page_load_strategy = page_load_strategy
+        self.page_load_timeout = page_load_timeout
+        self.network_policy = network_policy or NetworkPolicy(
+            block_ads=False, block_trackers=False, block_fonts=block_fonts, block_media=block_media,
+            block_images=block_images, count_requests=False)
+
+    @property
+    def block_images(self):
+        return self.network_policy.block_images
+
+
+def build_chrome_options(config, profile_dir=None):
+    """
+    Chrome options for a config: the anti-detection options plus fast-start
+    flags, viewport and resource blocking
+    """
+    chrome_options = Options()
+    if config.headless:
+        chrome_options.add_argument("--headless=new")
+    if config.viewport:
+        chrome_options.add_argument(f"--window-size={config.viewport[0]},{config.viewport[1]}")
+    else:
+        chrome_options.add_argument("--start-maximized")
+    profile_dir = profile_dir or config.profile_dir
+    if profile_dir:
+        chrome_options.add_argument(f"--user-data-dir={os.path.abspath(profile_dir)}")
+    for arg in FAST_START_ARGS:
+        chrome_options.add_argument(arg)
+    if config.block_images:
+        # The content setting also stops CSS and extension-less image URLs the CDP patterns miss
+        chrome_options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    if config.network_policy.count_requests:
+        # Network events for the blocked/loaded request counters
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    chrome_options.page_load_strategy = config.page_load_strategy
+    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    return chrome_options
+
+
+def launch_chrome(config, profile_dir=None):
+    """
+    Start a Chrome WebDriver for a config
+    """
+    driver = webdriver.Chrome(options=build_chrome_options(config, profile_dir))
+    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    if config.page_load_timeout:
+        driver.set_page_load_timeout(config.page_load_timeout)
+    # Every driver reaches its policy through the driver itself (e.g. to re-apply per site)
+    driver.network_policy = config.network_policy
+    if config.network_policy.enabled:
+        config.network_policy.apply(driver)
+    return driver
+
+
+def is_healthy(driver):
+    """Whether a driver still answers commands (the browser has not crashed or hung)"""
+    try:
+        return driver.execute_script("return 1") == 1 and len(driver.window_handles) > 0
+    except Exception:
+        return False
+
+
+class BrowserPool:
+    def __init__(self, config=None, size=2, max_uses=50, profile_root=None, reset_url="about:blank",
+                 launcher=launch_chrome):
+        self.config = config or BrowserConfig(headless=True)
+        self.size = size
+        self.max_uses = max_uses
+        self.profile_root = profile_root
+        self.reset_url = reset_url
+        self.launcher = launcher
+        self.idle = queue.Queue()
+        self.info = {}                      # id(driver) -> {"slot", "uses", "launched_at"}
+        self.free_slots = list(range(size))
+        self.lock = threading.Lock()
+        self.closed = False
+        self.stats = {"launches": 0, "launch_time": 0.0, "acquires": 0, "warm_acquires": 0,
+                      "acquire_wait": 0.0, "health_failures": 0, "recycled": 0}
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def _profile_dir(self, slot):
+        """Each slot reuses its own user-data dir across launches (warm disk cache, cookies)"""
+        if not self.profile_root:
+            return self.config.profile_dir
+        profile_dir = os.path.join(self.profile_root, f"slot_{slot}")
+        os.makedirs(profile_dir, exist_ok=True)
+        return profile_dir
+
+    def _launch(self, slot):
+        """Launch a driver for a slot; the slot is freed again if the launch fails"""
+        started = time.time()
+        try:
+            driver = self.launcher(self.config, self._profile_dir(slot))
+        except Exception:
+            self._free_slot(slot)
+            raise
+        with self.lock:
+            self.info[id(driver)] = {"slot": slot, "uses": 0, "launched_at": time.time()}
+            self.stats["launches"] += 1
+            self.stats["launch_time"] += time.time() - started
+        return driver
+
+    def _take_slot(self):
+        with self.lock:
+            return self.free_slots.pop(0) if self.free_slots else None
+
+    def _free_slot(self, slot):
+        """Give a slot back and wake one waiting acquire()"""
+        with self.lock:
+            self.free_slots.append(slot)
+        self.idle.put(SLOT_FREED)
+
+    def _launch_into_pool(self, slot):
+        try:
+            self.idle.put(self._launch(slot))
+        except Exception as e:
+            print(f"⚠️  Could not pre-launch browser: {e}")
+
+    def warm(self, count=None, wait=False):
+        """Pre-launch up to count drivers (default: fill the pool) in background threads"""
+        threads = []
+        for _ in range(self.size if count is None else count):
+            slot = self._take_slot()
+            if slot is None:
+                break
+            thread = threading.Thread(target=self._launch_into_pool, args=(slot,), name=f"browser-warm-{slot}",
+                                      daemon=True)
+            thread.start()
+            threads.append(thread)
+        if wait:
+            for thread in threads:
+                thread.join()
+        return len(threads)
+
+    def acquire(self, timeout=None):
+        """
+        Hand out a healthy driver: a warm one if available, otherwise a fresh
+        launch while the pool is below its size, otherwise wait for a release
+        """
+        started = time.time()
+        while True:
+            try:
+                driver = self.idle.get_nowait()
+                warm = True
+            except queue.Empty:
+                slot = self._take_slot()
+                if slot is not None:
+                    driver, warm = self._launch(slot), False
+                else:
+                    remaining = None if timeout is None else timeout - (time.time() - started)
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("No browser available from the pool")
+                    try:
+                        driver, warm = self.idle.get(timeout=remaining), True
+                    except queue.Empty:
+                        raise TimeoutError("No browser available from the pool")
+
+            if driver is SLOT_FREED:
+                # A launch failed or a browser was discarded: the loop retries the free slot
+                continue
+
+            if warm and not is_healthy(driver):
+                self._count("health_failures")
+                self.discard(driver, replace=False)
+                continue
+
+            with self.lock:
+                self.info[id(driver)]["uses"] += 1
+                self.stats["acquires"] += 1
+                self.stats["warm_acquires"] += int(warm)
+                self.stats["acquire_wait"] += time.time() - started
+            return driver
+
+    def release(self, driver):
+        """
+        Return a driver after a goal: reset it to a blank page and put it back,
+        or replace it in the background if it is unhealthy or worn out
+        """
+        if self.closed:
+            self.discard(driver, replace=False)
+            return
+        with self.lock:
+            uses = self.info.get(id(driver), {}).get("uses", 0)
+        if uses >= self.max_uses:
+            self._count("recycled")
+            self.discard(driver)
+            return
+        try:
+            if self.reset_url:
+                driver.get(self.reset_url)
+        except Exception:
+            pass
+        if not is_healthy(driver):
+            self._count("health_failures")
+            self.discard(driver)
+            return
+        self.idle.put(driver)
+
+    def discard(self, driver, replace=True):
+        """Quit a driver (e.g. after a crash) and optionally launch its replacement in the background"""
+        with self.lock:
+            info = self.info.pop(id(driver), None)
+        self.config.network_policy.forget(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        if info is None:
+            return
+        if replace and not self.closed:
+            threading.Thread(target=self._launch_into_pool, args=(info["slot"],), daemon=True).start()
+        else:
+            self._free_slot(info["slot"])
+
+    def close(self):
+        """Quit every idle driver; drivers still out are quit when released"""
+        self.closed = True
+        while True:
+            try:
+                driver = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            if driver is not SLOT_FREED:
+                self.discard(driver, replace=False)
+
+    def get_stats(self):
+        """Launch, reuse and health statistics"""
+        with self.lock:
+            stats = dict(self.stats)
+        stats["avg_launch_time"] = stats["launch_time"] / stats["launches"] if stats["launches"] else 0
+        stats["avg_acquire_wait"] = stats["acquire_wait"] / stats["acquires"] if stats["acquires"] else 0
+        return stats
@@ -0,0 +1,254 @@
+"""
+Single-pass element resolver for Miki Miki
+
+Instead of walking a cascade of XPath/CSS queries (each query and every
+is_displayed()/is_enabled() check is a separate WebDriver round trip), the
+resolver injects one script that scores every visible, interactive element on
+the page against the description and returns the ranked matches at once.
+Each match carries a stable, unique selector that the learning system can
+remember per site (see lookup_selectors).
+"""
+
+# Elements below this score are not considered a match for the description
+MIN_MATCH_SCORE = 2.0
+
+RESOLVER_SCRIPT = r"""
+const description = (arguments[0] || '').toLowerCase().trim();
+const limit = arguments[1] || 5;
+
+const STOPWORDS = new Set(['the', 'a', 'an', 'in', 'on', 'of', 'to', 'at', 'for', 'with',
+    'and', 'or', 'page', 'list', 'results', 'result', 'search results', 'element', 'click',
+    'this', 'that', 'is', 'from', 'below', 'above', 'next', 'near', 'under', 'it']);
+const POSITION_WORDS = new Set(['top', 'bottom', 'left', 'right', 'center', 'centre',
+    'middle', 'corner', 'upper', 'lower']);
+const ORDINALS = {'first': 1, 'second': 2, 'third': 3, 'fourth': 4, 'fifth': 5,
+    'sixth': 6, 'seventh': 7, 'eighth': 8, 'ninth': 9, 'tenth': 10,
+    '1st': 1, '2nd': 2, '3rd': 3, '4th': 4, '5th': 5};
+const ROLE_WORDS = new Set(['button', 'link', 'input', 'field', 'box', 'textbox', 'icon',
+    'image', 'thumbnail', 'title', 'tab', 'menu', 'checkbox', 'dropdown']);
+
+const words = description.split(/[^a-z0-9@.\-]+/).filter(Boolean);
+let ordinal = 0;
+const positions = [];
+const tokens = [];
+for (const w of words) {
+    if (ORDINALS[w]) { ordinal = ORDINALS[w]; continue; }
+    if (w === 'last') { ordinal = -1; continue; }
+    if (POSITION_WORDS.has(w)) { positions.push(w); continue; }
+    if (STOPWORDS.has(w) || ROLE_WORDS.has(w)) { continue; }
+    tokens.push(w);
+}
+const has = (w) => words.indexOf(w) !== -1;
+const wantsVideo = has('video') || has('videos') || has('thumbnail');
+const wantsProduct = ['product', 'item', 'laptop', 'phone', 'buy'].some(has);
+const wantsSearch = has('search');
+const wantsEmail = has('email') || description.indexOf('@') !== -1;
+const wantsInput = ['input', 'field', 'box', 'textbox'].some(has) || wantsSearch || wantsEmail;
+const wantsButton = has('button');
+const wantsLink = has('link');
+const wantsSignIn = description.indexOf('sign in') !== -1 || has('login') || has('signin');
+
+const vw = window.innerWidth || document.documentElement.clientWidth;
+const vh = window.innerHeight || document.documentElement.clientHeight;
+
+const SELECTOR = 'a[href], button, input:not([type=hidden]), textarea, select, summary, ' +
+    '[role=button], [role=link], [role=tab], [role=menuitem], [role=option], ' +
+    '[role=checkbox], [role=textbox], [role=searchbox], [role=combobox], ' +
+    '[onclick], [tabindex]:not([tabindex="-1"]), [contenteditable=""], ' +
+    '[contenteditable=true], ytd-video-renderer, ytd-rich-item-renderer, ' +
+    '[data-component-type=s-search-result]';
+
+function isVisible(el, rect) {
+    if (rect.width < 2 || rect.height < 2) return false;
+    const style = window.getComputedStyle(el);
+    if (style.visibility === 'hidden' || style.display === 'none') return false;
+    if (parseFloat(style.opacity) === 0) return false;
+    return true;
+}
+
+function textOf(el) {
+    const t = (el.innerText || el.textContent || '').replace(/\s+/g, ' ').trim();
+    return t.length > 200 ? t.slice(0, 200) : t;
+}
+
+// Only selectors matching exactly this element are worth remembering
+function unique(selector) {
+    try { return document.querySelectorAll(selector).length === 1 ? selector : null; } catch (e) { return null; }
+}
+
+function stableSelector(el) {
+    const tag = el.tagName.toLowerCase();
+    if (el.id && !/\d{3,}/.test(el.id)) {
+        const byId = unique('#' + CSS.escape(el.id));
+        if (byId) return byId;
+    }
+    for (const attr of ['data-testid', 'name', 'aria-label', 'placeholder']) {
+        const v = el.getAttribute(attr);
+        if (v && v.length < 80) {
+            const byAttr = unique(tag + '[' + attr + '="' + v.replace(/"/g, '\\"') + '"]');
+            if (byAttr) return byAttr;
+        }
+    }
+    return null;
+}
+
+function isListing(el, href) {
+    if (wantsVideo) {
+        if (/^ytd-(video|rich-item)-renderer$/i.test(el.tagName)) return true;
+        if (el.id === 'video-title' || el.id === 'thumbnail') return true;
+        if (href.indexOf('/watch') !== -1) return true;
+    }
+    if (wantsProduct) {
+        if (el.getAttribute('data-component-type') === 's-search-result') return true;
+        if (el.closest('[data-component-type=s-search-result], [class*=product]') && el.tagName === 'A') return true;
+    }
+    return false;
+}
+
+const seen = new Set();
+const candidates = [];
+for (const el of document.querySelectorAll(SELECTOR)) {
+    if (seen.has(el)) continue;
+    seen.add(el);
+    if (el.disabled) continue;
+    const rect = el.getBoundingClientRect();
+    if (!isVisible(el, rect)) continue;
+
+    const tag = el.tagName.toLowerCase();
+    const type = (el.getAttribute('type') || '').toLowerCase();
+    const role = (el.getAttribute('role') || '').toLowerCase();
+    const text = textOf(el).toLowerCase();
+    const aria = (el.getAttribute('aria-label') || '').toLowerCase();
+    const placeholder = (el.getAttribute('placeholder') || '').toLowerCase();
+    const title = (el.getAttribute('title') || el.getAttribute('alt') || '').toLowerCase();
+    const value = (tag === 'input' && (type === 'submit' || type === 'button')) ? (el.value || '').toLowerCase() : '';
+    const attrs = ((el.id || '') + ' ' + (el.getAttribute('name') || '') + ' ' +
+        (typeof el.className === 'string' ? el.className : '')).toLowerCase();
+    const href = (el.getAttribute('href') || '').toLowerCase();
+    const labels = aria + ' ' + placeholder + ' ' + title + ' ' + value;
+
+    let score = 0;
+    if (description && (text === description || aria === description || placeholder === description)) score += 12;
+    else if (description && description.length > 2 && (labels.indexOf(description) !== -1 || text.indexOf(description) !== -1)) score += 8;
+
+    for (const tok of tokens) {
+        if (labels.indexOf(tok) !== -1) score += 3;
+        else if (text.indexOf(tok) !== -1) score += 2;
+        else if (attrs.indexOf(tok) !== -1 || href.indexOf(tok) !== -1) score += 1;
+    }
+
+    const isTextInput = tag === 'textarea' || role === 'textbox' || role === 'searchbox' ||
+        role === 'combobox' || (tag === 'input' && ['', 'text', 'search', 'email', 'url', 'tel', 'password'].indexOf(type) !== -1) ||
+        el.isContentEditable;
+    const isButton = tag === 'button' || role === 'button' || value !== '';
+    if (wantsInput && isTextInput) score += 2;
+    if (wantsSearch && isTextInput && (type === 'search' || role === 'searchbox' || role === 'combobox' ||
+        (el.getAttribute('name') || '') === 'q' || (labels + attrs).indexOf('search') !== -1)) score += 4;
+    if (wantsEmail && (type === 'email' || (labels + attrs).indexOf('mail') !== -1)) score += 4;
+    if (wantsButton && isButton) score += 1.5;
+    if (wantsLink && tag === 'a') score += 1;
+    if (wantsSignIn && (text + labels + attrs).match(/sign.?in|log.?in/)) score += 4;
+
+    const listing = isListing(el, href);
+    if (listing) score += 2;
+
+    for (const pos of positions) {
+        const cx = rect.left + rect.width / 2, cy = rect.top + rect.height / 2;
+        if ((pos === 'top' || pos === 'upper') && cy < vh * 0.25) score += 1.5;
+        if ((pos === 'bottom' || pos === 'lower') && cy > vh * 0.75) score += 1.5;
+        if (pos === 'left' && cx < vw * 0.33) score += 1.5;
+        if (pos === 'right' && cx > vw * 0.66) score += 1.5;
+        if ((pos === 'center' || pos === 'centre' || pos === 'middle') &&
+            Math.abs(cx - vw / 2) < vw * 0.2 && Math.abs(cy - vh / 2) < vh * 0.35) score += 1.5;
+    }
+
+    // Full-page containers match everything; prefer the concrete control
+    if (rect.width * rect.height > vw * vh * 0.5) score -= 3;
+
+    candidates.push({element: el, score: score, listing: listing, tag: tag,
+        text: textOf(el).slice(0, 80), top: rect.top + window.scrollY, left: rect.left + window.scrollX,
+        rect: [Math.round(rect.left), Math.round(rect.top), Math.round(rect.width), Math.round(rect.height)],
+        selector: stableSelector(el), area: rect.width * rect.height});
+}
+
+// Ordinal references ("second video") pick the nth listing in reading order
+if (ordinal !== 0) {
+    const listings = candidates.filter(c => c.listing &&
+        !candidates.some(o => o !== c && o.listing && o.element.contains(c.element)));
+    listings.sort((a, b) => (Math.abs(a.top - b.top) < 10 ? a.left - b.left : a.top - b.top));
+    const idx = ordinal === -1 ? listings.length - 1 : ordinal - 1;
+    if (idx >= 0 && idx < listings.length) {
+        // Prefer the clickable link inside a listing container over the container itself
+        const target = listings[idx];
+        const inner = candidates.find(o => o !== target && o.tag === 'a' && target.element.contains(o.element));
+        (inner || target).score += 10;
+    }
+}
+
+candidates.sort((a, b) => (b.score - a.score) || (a.area - b.area));
+return candidates.slice(0, limit).map(c => ({element: c.element, score: c.score, tag: c.tag,
+    text: c.text, rect: c.rect, selector: c.selector}));
+"""
+
+
+# Returns the first of the given selectors that matches exactly one visible
+# element, plus the selectors that did not (gone, hidden or now ambiguous)
+LOOKUP_SCRIPT = r"""
+const selectors = arguments[0] || [];
+const missed = [];
+for (const selector of selectors) {
+    let matches = [];
+    try { matches = Array.from(document.querySelectorAll(selector)); } catch (e) { missed.push(selector); continue; }
+    const visible = matches.filter(el => {
+        const r = el.getBoundingClientRect();
+        const style = getComputedStyle(el);
+        return r.width > 1 && r.height > 1 && style.visibility !== 'hidden' && style.display !== 'none';
+    });
+    if (matches.length === 1 && visible.length === 1) {
+        return {element: visible[0], selector: selector, missed: missed};
+    }
+    missed.push(selector);
+}
+return {element: null, selector: null, missed: missed};
+"""
+
+
+def lookup_selectors(driver, selectors):
+    """
+    Try learned selectors in one round trip.
+    Returns (element, selector, missed_selectors); element is None if none matched.
+    """
+    if not selectors:
+        return None, None, []
+    try:
+        result = driver.execute_script(LOOKUP_SCRIPT, list(selectors))
+    except Exception as e:
+        print(f"⚠️  Selector lookup error: {e}")
+        return None, None, []
+    return result.get("element"), result.get("selector"), result.get("missed") or []
+
+
+def resolve_element(driver, description, limit=5):
+    """
+    Score every visible, interactive element against the description in a
+    single round trip. Returns candidate dicts (element, score, tag, text,
+    rect, selector) ordered best first; only matches above MIN_MATCH_SCORE.
+    """
+    try:
+        candidates = driver.execute_script(RESOLVER_SCRIPT, description, limit)
+    except Exception as e:
+        print(f"⚠️  Element resolver error: {e}")
+        return []
+
+    return [c for c in (candidates or []) if c.get("score", 0) >= MIN_MATCH_SCORE]
+
+
+def find_best_element(driver, description, limit=5):
+    """
+    Return the best matching element and its ranked fallbacks
+    """
+    candidates = resolve_element(driver, description, limit)
+    if not candidates:
+        return None, []
+    elements = [c["element"] for c in candidates]
+    return elements[0], elements[1:]
@@ -0,0 +1,407 @@
+"""
+Shared asyncio client for Gemini model calls
+
+Every prompt helper goes through one GeminiClient, which adds what the bare
+generate_content calls were missing:
+
+- a bounded semaphore limiting concurrent requests
+- a per-call deadline covering all retries
+- exponential backoff with jitter on quota/rate-limit and transient errors
+- request hedging: a duplicate request is sent if the first one is slow,
+  and whichever answers first wins
+- streaming: generate_stream() yields text chunks as they arrive and cancels
+  the request when the caller stops reading
+- context caching: a CacheablePrefix as the first request part is served
+  from the provider's context cache when the prompt is large enough for it
+
+The client runs its own event loop on a background thread, so synchronous
+code (the agent loop, batch workers) can call generate() from any thread.
+Backends are pluggable; FakeBackend answers offline for tests and benchmarks.
+"""
+
+import asyncio
+import concurrent.futures
+import datetime
+import hashlib
+import itertools
+import queue
+import random
+import threading
+import time
+
+DEFAULT_MODEL = 'gemini-1.5-flash'
+
+# Queued after the last chunk of a stream
+STREAM_END = object()
+
+# Smallest prefix (in tokens) the Gemini context-caching API accepts
+CONTEXT_CACHE_MIN_TOKENS = 32768
+
+
+class CacheablePrefix(str):
+    """
+    Static instructions sent as the first part of a request. Backends with
+    context caching may upload it once and refer to it instead of resending.
+    """
+
+    def __new__(cls, text, tokens=0):
+        prefix = super().__new__(cls, text)
+        prefix.tokens = tokens
+        return prefix
+
+
+class GeminiTimeout(Exception):
+    """Raised when a model call does not finish before its deadline"""
+    pass
+
+
+def is_retryable_error(error):
+    """
+    Whether an error is worth retrying: rate limits (429), quota exhaustion,
+    overloaded/unavailable servers and attempt timeouts
+    """
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    code = getattr(error, 'code', None)
+    code = getattr(code, 'value', code)  # grpc status codes are enums
+    if code in (429, 500, 503, 504):
+        return True
+    name = type(error).__name__
+    if name in ('ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'DeadlineExceeded', 'InternalServerError'):
+        return True
+    message = str(error).lower()
+    return '429' in message or 'quota' in message or 'rate limit' in message
+
+
+class GenAIBackend:
+    """Backend calling the google-generativeai SDK"""
+
+    def __init__(self, context_cache_ttl=3600, context_cache_min_tokens=CONTEXT_CACHE_MIN_TOKENS, genai=None):
+        if genai is None:
+            import google.generativeai as genai
+        self.genai = genai
+        self.models = {}
+        self.context_cache_ttl = context_cache_ttl
+        self.context_cache_min_tokens = context_cache_min_tokens
+        # (model name, prefix digest) -> (model bound to the cached prefix or None, expires at)
+        self.cached_models = {}
+        # (model name, prefix digest) -> future of a context cache being created
+        self.cache_uploads = {}
+        self.cache_lock = threading.Lock()
+        # CachedContent.create is a blocking network call; it runs here, off the event loop
+        self.cache_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="gemini-cache")
+        self.cache_stats = {"created": 0, "hits": 0, "unavailable": 0}
+
+    def get_model(self, model_name):
+        if model_name not in self.models:
+            self.models[model_name] = self.genai.GenerativeModel(model_name)
+        return self.models[model_name]
+
+    async def model_for(self, model_name, parts):
+        """
+        The model to call and the parts to send. A CacheablePrefix large
+        enough for the context-caching API is uploaded once (per TTL) and the
+        request only carries the rest; otherwise everything is sent inline.
+        Concurrent requests for the same prefix wait for a single upload.
+        """
+        prefix = parts[0] if parts else None
+        if not isinstance(prefix, CacheablePrefix) or prefix.tokens < self.context_cache_min_tokens:
+            return self.get_model(model_name), parts
+        key = (model_name, hashlib.sha256(prefix.encode("utf-8")).hexdigest())
+        with self.cache_lock:
+            model, expires_at = self.cached_models.get(key, (None, 0))
+            upload = None
+            if time.time() >= expires_at:
+                upload = self.cache_uploads.get(key)
+                if upload is None:
+                    upload = self.cache_executor.submit(self.create_cached_model, key, model_name, prefix)
+                    self.cache_uploads[key] = upload
+            elif model is not None:
+                self.cache_stats["hits"] += 1
+        if upload is not None:
+            # Shielded so a cancelled request doesn't cancel an upload others are waiting on
+            model = await asyncio.shield(asyncio.wrap_future(upload))
+        if model is None:
+            return self.get_model(model_name), parts
+        return model, parts[1:]
+
+    def create_cached_model(self, key, model_name, prefix):
+        """Upload a prefix to the context cache (blocking) and return a model bound to it, or None"""
+        try:
+            cached = self.genai.caching.CachedContent.create(
+                model=model_name, system_instruction=str(prefix),
+                ttl=datetime.timedelta(seconds=self.context_cache_ttl))
+            model = self.genai.GenerativeModel.from_cached_content(cached_content=cached)
+        except Exception as e:
+            # Unsupported model or SDK version: send the prefix inline from now on
+            print(f"⚠️  Context caching unavailable for {model_name}: {e}")
+            model = None
+        with self.cache_lock:
+            self.cache_stats["created" if model is not None else "unavailable"] += 1
+            # Refresh a little before the provider drops the cache
+            self.cached_models[key] = (model, time.time() + self.context_cache_ttl * 0.9
+                                       if model is not None else float("inf"))
+            del self.cache_uploads[key]
+        return model
+
+    async def generate(self, model_name, parts, generation_config=None):
+        model, parts = await self.model_for(model_name, parts)
+        response = await model.generate_content_async(parts, generation_config=generation_config)
+        return response.text
+
+    async def generate_stream(self, model_name, parts, generation_config=None):
+        model, parts = await self.model_for(model_name, parts)
+        response = await model.generate_content_async(parts, generation_config=generation_config, stream=True)
+        async for chunk in response:
+            yield chunk.text
+
+
+class FakeBackend:
+    """
+    Offline backend. Answers come from a handler(model_name, parts) function,
+    or from a list of scripted responses that is cycled. Exceptions in the
+    list are raised instead of returned, which makes retry paths testable.
+    Streams deliver the answer in chunk_size pieces, chunk_latency apart.
+    """
+
+    def __init__(self, responses=None, handler=None, latency=0.0, chunk_size=40, chunk_latency=0.0):
+        self.responses = itertools.cycle(responses) if responses else None
+        self.handler = handler
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.chunk_latency = chunk_latency
+        self.calls = []
+
+    async def generate(self, model_name, parts, generation_config=None):
+        self.calls.append({"model": model_name, "parts": parts, "generation_config": generation_config})
+        if self.latency:
+            await asyncio.sleep(self.latency() if callable(self.latency) else self.latency)
+        if self.handler is not None:
+            answer = self.handler(model_name, parts)
+        elif self.responses is not None:
+            answer = next(self.responses)
+        else:
+            answer = ""
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    async def generate_stream(self, model_name, parts, generation_config=None):
+        answer = await self.generate(model_name, parts, generation_config)
+        for start in range(0, len(answer), self.chunk_size):
+            if start and self.chunk_latency:
+                await asyncio.sleep(self.chunk_latency)
+            yield answer[start:start + self.chunk_size]
+
+
+class GeminiClient:
+    def __init__(self, backend=None, model_name=DEFAULT_MODEL, max_concurrency=4, timeout=60.0,
+                 max_retries=4, backoff_base=1.0, backoff_max=30.0, hedge_after=None):
+        self.backend = backend
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self.stats = {"calls": 0, "attempts": 0, "retries": 0, "hedges": 0, "hedge_wins": 0,
+                      "timeouts": 0, "errors": 0, "total_latency": 0.0}
+        self.stats_lock = threading.Lock()
+        self.loop = None
+        self.loop_thread = None
+        self.loop_lock = threading.Lock()
+        self.semaphore = None
+
+    def set_backend(self, backend):
+        """Swap the backend (e.g. a FakeBackend for offline runs)"""
+        self.backend = backend
+
+    def _count(self, key, amount=1):
+        with self.stats_lock:
+            self.stats[key] += amount
+
+    def _ensure_loop(self):
+        """Start the background event loop thread on first use"""
+        with self.loop_lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self.loop_thread = threading.Thread(target=self.loop.run_forever, name="gemini-client", daemon=True)
+                self.loop_thread.start()
+        return self.loop
+
+    async def _attempt(self, model_name, parts, generation_config, timeout):
+        """One request, bounded by the semaphore and the remaining time"""
+        async with self.semaphore:
+            self._count("attempts")
+            return await asyncio.wait_for(
+                self.backend.generate(model_name, parts, generation_config), timeout=timeout
+            )
+
+    async def _hedged_attempt(self, model_name, parts, generation_config, timeout):
+        """Send a duplicate request if the first is slower than hedge_after; first answer wins"""
+        first = asyncio.ensure_future(self._attempt(model_name, parts, generation_config, timeout))
+        if not self.hedge_after or self.hedge_after >= timeout:
+            return await first
+
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        if done:
+            return first.result()
+
+        self._count("hedges")
+        second = asyncio.ensure_future(
+            self._attempt(model_name, parts, generation_config, timeout - self.hedge_after)
+        )
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if task is second:
+                        self._count("hedge_wins")
+                    return task.result()
+                error = task.exception()
+        raise error
+
+    async def generate_async(self, parts, model_name=None, generation_config=None, timeout=None):
+        """
+        Generate a response for the prompt parts, retrying with backoff until the deadline
+        """
+        if self.semaphore is None:
+            # Created on the client's loop (Semaphore binds to a loop on older Pythons)
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        model_name = model_name or self.model_name
+        timeout = timeout or self.timeout
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        started = time.perf_counter()
+        self._count("calls")
+
+        try:
+            attempt = 0
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self._count("timeouts")
+                    raise GeminiTimeout(f"Model call exceeded its {timeout:g}s deadline")
+                try:
+                    return await self._hedged_attempt(model_name, parts, generation_config, remaining)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if attempt >= self.max_retries or not is_retryable_error(e):
+                        if isinstance(e, asyncio.TimeoutError):
+                            self._count("timeouts")
+                            raise GeminiTimeout(f"Model call exceeded its {timeout:g}s deadline")
+                        self._count("errors")
+                        raise
+                    # Exponential backoff with full jitter, never sleeping past the deadline
+                    delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+                    delay = min(delay, max(0.0, deadline - loop.time()))
+                    attempt += 1
+                    self._count("retries")
+                    print(f"⏳ Model call failed ({type(e).__name__}), "
+                          f"retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+        finally:
+            # Failed and timed-out calls count too, so avg_latency covers every call
+            self._count("total_latency", time.perf_counter() - started)
+
+    async def _stream_attempt(self, model_name, parts, generation_config, emit):
+        """One streamed request, bounded by the semaphore, emitting chunks as they arrive"""
+        async with self.semaphore:
+            self._count("attempts")
+            if not hasattr(self.backend, "generate_stream"):
+                emit(await self.backend.generate(model_name, parts, generation_config))
+                return
+            async for chunk in self.backend.generate_stream(model_name, parts, generation_config):
+                emit(chunk)
+
+    async def stream_async(self, parts, emit, model_name=None, generation_config=None, timeout=None):
+        """
+        Stream a response, calling emit(text) for every chunk. Failures are
+        retried with backoff only until the first chunk has been emitted.
+        """
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        model_name = model_name or self.model_name
+        timeout = timeout or self.timeout
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        started = time.perf_counter()
+        self._count("calls")
+        received = []
+
+        def emit_chunk(chunk):
+            received.append(True)
+            emit(chunk)
+
+        try:
+            attempt = 0
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self._count("timeouts")
+                    raise GeminiTimeout(f"Model call exceeded its {timeout:g}s deadline")
+                try:
+                    await asyncio.wait_for(self._stream_attempt(model_name, parts, generation_config, emit_chunk),
+                                           timeout=remaining)
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if received or attempt >= self.max_retries or not is_retryable_error(e):
+                        if isinstance(e, asyncio.TimeoutError):
+                            self._count("timeouts")
+                            raise GeminiTimeout(f"Model call exceeded its {timeout:g}s deadline")
+                        self._count("errors")
+                        raise
+                    delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+                    delay = min(delay, max(0.0, deadline - loop.time()))
+                    attempt += 1
+                    self._count("retries")
+                    print(f"⏳ Model call failed ({type(e).__name__}), "
+                          f"retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+        finally:
+            self._count("total_latency", time.perf_counter() - started)
+
+    def generate_stream(self, parts, model_name=None, generation_config=None, timeout=None):
+        """
+        Iterate over the response text as it arrives, from any thread. Closing
+        the iterator early (or breaking out of the loop) cancels the request.
+        """
+        loop = self._ensure_loop()
+        chunks = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self.stream_async(parts, chunks.put, model_name, generation_config, timeout), loop
+        )
+        future.add_done_callback(lambda _: chunks.put(STREAM_END))
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is STREAM_END:
+                    break
+                yield chunk
+            future.result()
+        finally:
+            if not future.done():
+                future.cancel()
+
+    def generate(self, parts, model_name=None, generation_config=None, timeout=None):
+        """Blocking wrapper around generate_async, safe to call from any thread"""
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(
+            self.generate_async(parts, model_name, generation_config, timeout), loop
+        )
+        return future.result()
+
+    def get_stats(self):
+        """Call, retry, hedge and latency statistics"""
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats["avg_latency"] = stats["total_latency"] / stats["calls"] if stats["calls"] else 0
+        return stats
@@ -0,0 +1,309 @@
+"""
+Deterministic goal verification for Miki Miki
+
+Many goals can be verified from the browser state alone: a search shows up
+in the URL's query string, a playing video is an HTMLMediaElement that is not
+paused, an "add to cart" changes the cart badge. GoalChecker collects those
+facts with one execute_script call and runs the registered predicates for
+each clause of the goal. Every predicate answers YES, NO or UNSURE and only
+UNSURE has to go to the vision model.
+
+Predicates are pluggable: register_check(name, pattern, predicate) adds one
+for goal clauses matching pattern.
+"""
+
+import re
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+from network_policy import host_matches, site_of
+
+YES = "YES"
+NO = "NO"
+UNSURE = "UNSURE"
+
+FACTS_SCRIPT = r"""
+const cartSelectors = arguments[0];
+
+function visible(el) {
+    const r = el.getBoundingClientRect();
+    if (r.width === 0 || r.height === 0) return false;
+    const style = window.getComputedStyle(el);
+    return style.visibility !== 'hidden' && style.display !== 'none';
+}
+
+// [tag, paused, ended, currentTime, readyState, duration, visible area]
+const media = [];
+for (const m of document.querySelectorAll('video, audio')) {
+    if (media.length >= 20) break;
+    const r = m.getBoundingClientRect();
+    media.push([m.tagName.toLowerCase(), m.paused, m.ended, m.currentTime || 0, m.readyState,
+        isFinite(m.duration) ? m.duration : 0, Math.round(r.width * r.height)]);
+}
+
+// First cart badge with a number in it
+let cartCount = null;
+for (const selector of cartSelectors) {
+    for (const el of document.querySelectorAll(selector)) {
+        const text = el.getAttribute('data-cart-count') || el.textContent || '';
+        const match = text.match(/\d+/);
+        if (match) { cartCount = parseInt(match[0], 10); break; }
+    }
+    if (cartCount !== null) break;
+}
+
+let passwordField = false;
+for (const el of document.querySelectorAll('input[type=password]')) {
+    if (visible(el)) { passwordField = true; break; }
+}
+
+return {url: location.href, title: document.title, media: media, cart_count: cartCount,
+        password_field: passwordField, viewport: window.innerWidth * window.innerHeight};
+"""
+
+# Cart badges on common shops, most specific first
+CART_SELECTORS = [
+    "#nav-cart-count", "[data-cart-count]", "[data-testid*=cart-count]", "[class*=cart-count]",
+    "[class*=cartCount]", "[class*=cart-quantity]", "[class*=basket-count]", "[aria-label*=cart i]",
+]
+
+# Query string parameters sites put search terms in
+SEARCH_PARAMETERS = ("q", "query", "search_query", "k", "p", "text", "search", "keyword", "keywords",
+                     "term", "field-keywords", "st", "wd")
+
+MEDIA_WORDS = r"\b(?:video|song|music|trailer|clip|movie|film|episode|track|album|playlist|podcast|stream)s?\b"
+MEDIA_SITES = ("youtube", "vimeo", "spotify", "soundcloud", "twitch", "dailymotion", "netflix")
+# A playing video only counts as the player when it covers this much of the viewport
+# (hover previews and inline autoplays in listings are much smaller)
+MIN_PLAYER_FRACTION = 0.2
+# Home, results and feed pages autoplay previews; playback there is not the goal
+LISTING_PATH = re.compile(r"^/?$|/results|/search|/feed", re.IGNORECASE)
+
+STOPWORDS = {"a", "an", "the", "for", "about", "of", "some", "any", "on", "in", "to"}
+
+# Clauses that pick one particular item ("the second video", "the cheapest laptop"):
+# the browser state cannot tell whether the right one was picked
+ORDINALS = (r"\b(?:first|second|third|fourth|fifth|sixth|seventh|eighth|ninth|tenth|last|next|previous|"
+            r"\d+(?:st|nd|rd|th))\b")
+QUALIFIERS = (r"\b(?:cheapest|priciest|best|worst|top|highest|lowest|latest|newest|oldest|longest|shortest|"
+              r"popular|(?:most|least)\s+\w+|top[\s-]rated|highest[\s-]rated)\b")
+PARTICULAR_CHOICE = re.compile(f"{ORDINALS}|{QUALIFIERS}", re.IGNORECASE)
+# Words of a media clause that say nothing about its topic
+MEDIA_FILLER = {"play", "watch", "listen", "video", "videos", "song", "songs", "music", "trailer", "trailers",
+                "clip", "clips", "movie", "movies", "film", "films", "episode", "episodes", "track", "tracks",
+                "album", "albums", "playlist", "playlists", "podcast", "podcasts", "stream", "streams", "com",
+                "random", "one", "something", "me", "my", "it", "at", "with", "from", "by", "and"} | set(MEDIA_SITES)
+
+# Splits "go to youtube and play a video" into clauses checked one by one
+CLAUSE_SPLIT = re.compile(r"\s*(?:,|;|\band then\b|\bthen\b|\band\b)\s*", re.IGNORECASE)
+
+# [(name, compiled pattern, predicate)]
+GOAL_CHECKS = []
+
+check_stats = {"checks": 0, "yes": 0, "no": 0, "unsure": 0, "model_verifications_avoided": 0}
+check_stats_lock = threading.Lock()
+
+
+def register_check(name, pattern, predicate):
+    """
+    Add a predicate for goal clauses matching pattern (case-insensitive).
+    predicate(match, facts, baseline) returns (verdict, reason); facts and
+    baseline are the FACTS_SCRIPT results now and at the start of the goal.
+    """
+    GOAL_CHECKS.append((name, re.compile(pattern, re.IGNORECASE), predicate))
+
+
+def words(text):
+    """Lowercase words of text without stopwords"""
+    return [w for w in re.findall(r"[a-z0-9]+", (text or "").lower()) if w not in STOPWORDS]
+
+
+def same_word(a, b):
+    """Words equal up to a plural 's' ("dog" and "dogs")"""
+    return a.rstrip("s") == b.rstrip("s")
+
+
+def particular_choice(clause):
+    """The ordinal or qualifier in a clause that picks one particular item, or None"""
+    match = PARTICULAR_CHOICE.search(clause)
+    return match.group(0) if match else None
+
+
+def search_terms(url):
+    """Words of the search query in a URL's query string, or None if it has none"""
+    query = parse_qs(urlsplit(url or "").query)
+    for name in SEARCH_PARAMETERS:
+        if query.get(name) and query[name][0].strip():
+            return words(query[name][0])
+    return None
+
+
+def on_site(url, site):
+    """Whether url is on the named site ("youtube", "youtube.com", "www.amazon.co.uk")"""
+    host = site_of(url)
+    site = site.lower().strip(" ./")
+    if site.startswith("www."):
+        site = site[4:]
+    if not host or not site:
+        return False
+    if "." in site:
+        return host_matches(host, site)
+    return site in host.split(".")
+
+
+def check_search(match, facts, baseline):
+    """Search for X [on site]: the terms are in the URL's query"""
+    terms, site = words(match.group("terms")), match.group("site")
+    if not terms:
+        return UNSURE, "no search terms in the goal"
+    url = facts["url"]
+    if site and not on_site(url, site):
+        return UNSURE, f"not on {site}"
+    query = search_terms(url)
+    if query is None:
+        if urlsplit(url).path in ("", "/"):
+            return NO, "still on the home page, no search has been performed"
+        return UNSURE, "no search query in the URL"
+    if sorted(query) == sorted(terms):
+        return YES, f"results for '{' '.join(query)}' are displayed"
+    return UNSURE, f"the URL searches for '{' '.join(query)}'"
+
+
+def check_media(match, facts, baseline):
+    """
+    Play/watch X: a player-sized video (or audio) is playing on a page that is
+    not a listing, and the page title mentions every topic word of X
+    """
+    clause = match.string
+    choice = particular_choice(clause)
+    path = urlsplit(facts["url"]).path
+    playing = [m for m in facts["media"] if not m[1] and not m[2] and m[3] > 0 and m[4] >= 2]
+    min_area = MIN_PLAYER_FRACTION * (facts.get("viewport") or 0)
+    players = [m for m in playing if m[0] == "audio" or m[6] >= min_area]
+    if players and not LISTING_PATH.search(path):
+        tag, _, _, current_time = players[0][:4]
+        if choice:
+            return UNSURE, f"the {tag} is playing, but the goal asks for the '{choice}' one"
+        title = words(facts.get("title"))
+        missing = [w for w in words(clause) if w not in MEDIA_FILLER and not any(same_word(w, t) for t in title)]
+        if missing:
+            return UNSURE, f"the {tag} is playing, but its title does not mention '{' '.join(missing)}'"
+        return YES, f"the {tag} is playing ({current_time:.0f}s in)"
+    if not facts["media"] and ("/results" in path or "/search" in path):
+        return NO, "still on search results, no media player on the page"
+    if playing:
+        return UNSURE, "media is playing, but only as a preview or on a listing page"
+    return UNSURE, "no media is playing yet"
+
+
+def check_website(match, facts, baseline):
+    """Go to X: the browser is on site X"""
+    site = match.group("site")
+    if on_site(facts["url"], site):
+        return YES, f"on {site_of(facts['url'])}"
+    return UNSURE, f"not on {site} yet"
+
+
+def check_cart(match, facts, baseline):
+    """Add X to cart: the cart badge went up"""
+    before, after = (baseline or {}).get("cart_count"), facts["cart_count"]
+    if before is not None and after is not None and after > before:
+        choice = particular_choice(match.string)
+        if choice:
+            return UNSURE, f"cart count went up, but the goal asks for the '{choice}' item"
+        return YES, f"cart count went from {before} to {after}"
+    return UNSURE, "no change in the cart count"
+
+
+def check_sign_in(match, facts, baseline):
+    """Sign in: still looking at a password field on a login page"""
+    path = urlsplit(facts["url"]).path.lower()
+    if facts["password_field"] and re.search(r"log-?in|sign-?in|auth", path):
+        return NO, "the login form is still displayed"
+    return UNSURE, "sign-in state is not visible in the DOM"
+
+
+register_check("search", r"^search\s+(?P<site>[\w.-]+)\s+for\s+(?P<terms>.+)$", check_search)
+register_check("search", r"^(?:search|look up)\s+(?:for\s+)?(?P<terms>.+?)"
+                         r"(?:\s+(?:on|in|at)\s+(?P<site>[\w.-]+))?$", check_search)
+register_check("media", r"^(?:play|watch|listen to)\b.*(?:%s|\b(?:%s)\b)" % (MEDIA_WORDS, "|".join(MEDIA_SITES)),
+               check_media)
+register_check("website", r"^(?:go to|open|visit|navigate to)\s+(?:the\s+)?(?P<site>[\w.-]+?)"
+                          r"(?:\s+(?:website|site|homepage|home page))?$", check_website)
+register_check("cart", r"^(?:add|put)\s+.+\s+(?:to|in|into)\s+(?:the\s+|my\s+)?(?:cart|basket|bag)$", check_cart)
+register_check("sign in", r"^(?:sign|log)\s*(?:in|on)\b", check_sign_in)
+
+
+def record_check(verdict):
+    with check_stats_lock:
+        check_stats["checks"] += 1
+        check_stats[verdict.lower()] += 1
+
+
+def record_verification_avoided():
+    """Count a model verification answered by the deterministic checks"""
+    with check_stats_lock:
+        check_stats["model_verifications_avoided"] += 1
+
+
+def get_check_stats():
+    """Verdict counts and model verifications avoided for the session"""
+    with check_stats_lock:
+        return dict(check_stats)
+
+
+def goal_clauses(user_goal):
+    """The goal split into clauses, without polite filler and trailing punctuation"""
+    clauses = []
+    for clause in CLAUSE_SPLIT.split(user_goal or ""):
+        clause = re.sub(r"^(?:please\s+|can you\s+|i want to\s+)+", "", clause.strip(" .!?"), flags=re.IGNORECASE)
+        if clause:
+            clauses.append(clause)
+    return clauses
+
+
+def combine(verdicts):
+    """YES when every clause is YES, NO when any clause is NO, else UNSURE"""
+    for verdict, reason in verdicts:
+        if verdict == NO:
+            return NO, reason
+    unsure = [reason for verdict, reason in verdicts if verdict != YES]
+    if verdicts and not unsure:
+        return YES, "; ".join(reason for _, reason in verdicts)
+    return UNSURE, "; ".join(unsure) or "no deterministic check for this goal"
+
+
+class GoalChecker:
+    """Deterministic verification of one goal against browser state"""
+
+    def __init__(self, driver, user_goal):
+        self.driver = driver
+        self.user_goal = user_goal
+        # Facts before any action, for checks that compare (e.g. the cart count)
+        self.baseline = self.facts()
+
+    def facts(self):
+        """Browser state from one script call, or None if the page cannot be read"""
+        try:
+            return self.driver.execute_script(FACTS_SCRIPT, CART_SELECTORS)
+        except Exception:
+            return None
+
+    def check(self):
+        """(verdict, reason) for the goal on the current page"""
+        facts = self.facts()
+        if facts is None:
+            verdict, reason = UNSURE, "could not read the page"
+        else:
+            verdicts = []
+            for clause in goal_clauses(self.user_goal):
+                for name, pattern, predicate in GOAL_CHECKS:
+                    match = pattern.search(clause)
+                    if match:
+                        verdicts.append(predicate(match, facts, self.baseline))
+                        break
+                else:
+                    verdicts.append((UNSURE, f"no deterministic check for '{clause}'"))
+            verdict, reason = combine(verdicts)
+        record_check(verdict)
+        return verdict, reason
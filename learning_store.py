@@ -0,0 +1,617 @@
+"""
+Storage backends for the AI learning system
+
+JSONLearningStore keeps the original single-file format (the whole file is
+rewritten on every event). SQLiteLearningStore appends one row per event,
+keeps indexes on website/action/goal and computes aggregates in SQL, so
+recording an event no longer costs O(history) disk I/O.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+
+def website_from_url(url):
+    """Extract the host part of a URL ('unknown' if there is none)"""
+    if not url or '://' not in url:
+        return 'unknown'
+    return url.split('/')[2]
+
+
+def normalize_website(website):
+    """Host name for comparisons: lower case and without a leading 'www.'"""
+    website = (website or '').lower()
+    return website[4:] if website.startswith('www.') else website
+
+
+def same_website(website, other):
+    """True when two host names (e.g. 'youtube.com' and 'www.youtube.com') are the same site"""
+    return normalize_website(website) == normalize_website(other)
+
+
+def _website_variants(website):
+    """Stored host names that count as the same site, for SQL 'IN' filters"""
+    host = normalize_website(website)
+    return [host, 'www.' + host]
+
+
+def _as_tuples(actions):
+    """Actions come back from JSON as lists; restore the (type, description) tuples"""
+    return [tuple(a) if isinstance(a, list) else a for a in (actions or [])]
+
+
+class JSONLearningStore:
+    """Original storage: one JSON document rewritten on every change"""
+
+    def __init__(self, learning_file="ai_learning_data.json"):
+        # learning_file=None keeps the data in memory only
+        self.learning_file = learning_file
+        self.lock = threading.RLock()
+        self.data = self.load()
+        self.next_id = self._assign_attempt_ids()
+
+    def _assign_attempt_ids(self):
+        """Give every task attempt a stable id (older files do not have one)"""
+        attempts = [a for entries in self.data["task_patterns"].values() for a in entries]
+        next_id = max([a.get("id", 0) for a in attempts] + [0]) + 1
+        for attempt in attempts:
+            if "id" not in attempt:
+                attempt["id"] = next_id
+                next_id += 1
+        return next_id
+
+    def load(self):
+        """Load existing learning data from file"""
+        if self.learning_file and os.path.exists(self.learning_file):
+            try:
+                with open(self.learning_file, 'r') as f:
+                    return json.load(f)
+            except:
+                pass
+
+        # Initialize new learning data structure
+        return {
+            "task_patterns": {},           # Patterns in successful vs failed tasks
+            "element_failures": {},        # Elements that failed to be found/clicked
+            "website_patterns": {},        # Website-specific patterns
+            "action_success_rates": {},    # Success rates of different actions
+            "common_mistakes": [],         # List of common mistakes
+            "improvement_suggestions": {}, # Suggestions for different scenarios
+            "task_completion_stats": {},   # Statistics about task completion
+            "selector_cache": {},          # website -> description -> selector -> hits/failures
+            "last_updated": datetime.now().isoformat()
+        }
+
+    def flush(self):
+        """Save learning data to file"""
+        with self.lock:
+            self.data["last_updated"] = datetime.now().isoformat()
+            if not self.learning_file:
+                return
+            with open(self.learning_file, 'w') as f:
+                json.dump(self.data, f, indent=2)
+
+    def export_data(self):
+        """Learning data in the legacy dictionary format"""
+        return self.data
+
+    def add_task_attempt(self, task_hash, goal, actions, success, final_url, screenshot, timestamp, start_url=None):
+        """Store a task attempt and return its id"""
+        with self.lock:
+            attempt_id = self.next_id
+            self.data["task_patterns"].setdefault(task_hash, []).append({
+                "id": attempt_id,
+                "goal": goal,
+                "actions": actions,
+                "success": success,
+                "final_url": final_url,
+                "start_url": start_url,
+                "timestamp": timestamp,
+                "screenshot": screenshot
+            })
+            self.next_id += 1
+            stats = self.data["task_completion_stats"].setdefault(goal, {"success": 0, "total": 0})
+            stats["total"] += 1
+            if success:
+                stats["success"] += 1
+            self.flush()
+            return attempt_id
+
+    def add_element_failure(self, website, description, action_type, error, timestamp, suggestions):
+        with self.lock:
+            failure_key = f"{website}_{description}_{action_type}"
+            failure = self.data["element_failures"].setdefault(
+                failure_key, {"count": 0, "errors": [], "suggestions": []}
+            )
+            failure["count"] += 1
+            failure["errors"].append({"error": error, "timestamp": timestamp})
+            failure["suggestions"] = suggestions
+            self.flush()
+
+    def add_action_result(self, action_type, website, description, success, timestamp):
+        with self.lock:
+            stats = self.data["action_success_rates"].setdefault(
+                f"{action_type}_{website}", {"success": 0, "total": 0, "descriptions": []}
+            )
+            stats["total"] += 1
+            if success:
+                stats["success"] += 1
+            stats["descriptions"].append({"description": description, "success": success, "timestamp": timestamp})
+            self.flush()
+
+    def task_attempts(self, success=None, website=None):
+        """Task attempts as dicts, optionally filtered by outcome and final website"""
+        with self.lock:
+            attempts = []
+            for task_hash, entries in self.data["task_patterns"].items():
+                for attempt in entries:
+                    if success is not None and bool(attempt["success"]) != success:
+                        continue
+                    if website is not None and not same_website(website, website_from_url(attempt.get("final_url"))):
+                        continue
+                    attempts.append(dict(attempt, task_hash=task_hash, actions=_as_tuples(attempt["actions"])))
+            return attempts
+
+    def task_counts(self):
+        """(total attempts, successful attempts)"""
+        with self.lock:
+            attempts = [a for entries in self.data["task_patterns"].values() for a in entries]
+            return len(attempts), sum(1 for a in attempts if a["success"])
+
+    def task_success_rates(self, task_hashes=None):
+        """task_hash -> successful attempts / total attempts (optionally only for some hashes)"""
+        with self.lock:
+            return {
+                task_hash: sum(1 for a in entries if a["success"]) / len(entries)
+                for task_hash, entries in self.data["task_patterns"].items()
+                if entries and (task_hashes is None or task_hash in task_hashes)
+            }
+
+    def element_failures(self, website=None, min_count=0):
+        """Aggregated element failures: failure_key, website, description, action_type, count"""
+        with self.lock:
+            failures = []
+            for failure_key, failure in self.data["element_failures"].items():
+                if failure["count"] < min_count:
+                    continue
+                parts = failure_key.split('_')
+                if website is not None and not same_website(website, parts[0]):
+                    continue
+                failures.append({
+                    "failure_key": failure_key,
+                    "website": parts[0],
+                    "description": '_'.join(parts[1:-1]),
+                    "action_type": parts[-1],
+                    "count": failure["count"],
+                    "suggestions": failure.get("suggestions", [])
+                })
+            return failures
+
+    def action_stats(self, min_total=0):
+        """Aggregated action success rates keyed like '<action>_<website>'"""
+        with self.lock:
+            return [
+                {"action_key": key, "success": stats["success"], "total": stats["total"]}
+                for key, stats in self.data["action_success_rates"].items() if stats["total"] >= min_total
+            ]
+
+    def website_patterns(self, website):
+        with self.lock:
+            return self.data["website_patterns"].get(website, {})
+
+    def selector_stats(self, website, description_key):
+        """Learned selectors for a description on a website with their hit/failure counts"""
+        with self.lock:
+            entries = self.data.get("selector_cache", {}).get(website, {}).get(description_key, {})
+            return [dict(stats, selector=selector) for selector, stats in entries.items()]
+
+    def add_selector_result(self, website, description_key, selector, success, timestamp):
+        with self.lock:
+            entries = self.data.setdefault("selector_cache", {}).setdefault(website, {}).setdefault(description_key, {})
+            stats = entries.setdefault(selector, {"hits": 0, "failures": 0, "updated": timestamp})
+            stats["hits" if success else "failures"] += 1
+            stats["updated"] = timestamp
+            self.flush()
+            return dict(stats, selector=selector)
+
+    def selector_count(self):
+        with self.lock:
+            return sum(len(entries) for descriptions in self.data.get("selector_cache", {}).values()
+                       for entries in descriptions.values())
+
+    def remove_selector(self, website, description_key, selector):
+        with self.lock:
+            entries = self.data.get("selector_cache", {}).get(website, {}).get(description_key, {})
+            if entries.pop(selector, None) is not None:
+                self.flush()
+
+    def set_common_mistakes(self, mistakes):
+        with self.lock:
+            self.data["common_mistakes"] = mistakes
+            self.flush()
+
+    def common_mistakes(self):
+        with self.lock:
+            return self.data["common_mistakes"]
+
+    def last_updated(self):
+        return self.data["last_updated"]
+
+    def close(self):
+        pass
+
+
+class SQLiteLearningStore:
+    """Append-only, indexed SQLite storage for learning events"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS task_attempts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        task_hash TEXT NOT NULL,
+        goal TEXT NOT NULL,
+        actions TEXT NOT NULL,
+        success INTEGER NOT NULL,
+        final_url TEXT,
+        website TEXT,
+        screenshot TEXT,
+        timestamp TEXT NOT NULL,
+        start_url TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_task_attempts_goal ON task_attempts (goal);
+    CREATE INDEX IF NOT EXISTS idx_task_attempts_hash ON task_attempts (task_hash);
+    CREATE INDEX IF NOT EXISTS idx_task_attempts_website ON task_attempts (website, success);
+
+    CREATE TABLE IF NOT EXISTS element_failures (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        website TEXT NOT NULL,
+        description TEXT NOT NULL,
+        action_type TEXT NOT NULL,
+        error TEXT,
+        timestamp TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_element_failures_key ON element_failures (website, description, action_type);
+
+    CREATE TABLE IF NOT EXISTS action_results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        action_type TEXT NOT NULL,
+        website TEXT NOT NULL,
+        description TEXT,
+        success INTEGER NOT NULL,
+        timestamp TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_action_results_action ON action_results (action_type, website);
+
+    CREATE TABLE IF NOT EXISTS website_patterns (
+        website TEXT PRIMARY KEY,
+        data TEXT NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS selector_cache (
+        website TEXT NOT NULL,
+        description_key TEXT NOT NULL,
+        selector TEXT NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0,
+        failures INTEGER NOT NULL DEFAULT 0,
+        updated TEXT NOT NULL,
+        PRIMARY KEY (website, description_key, selector)
+    );
+
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+    """
+
+    def __init__(self, db_path="ai_learning_data.db"):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self._batch_depth = 0
+        self._exported = None  # export_data() result, dropped on every write
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(self.SCHEMA)
+        # Databases created before start URLs were recorded
+        columns = [row["name"] for row in self.db.execute("PRAGMA table_info(task_attempts)")]
+        if "start_url" not in columns:
+            self.db.execute("ALTER TABLE task_attempts ADD COLUMN start_url TEXT")
+        self.db.commit()
+
+    def _insert(self, sql, params):
+        with self.lock:
+            cursor = self.db.execute(sql, params)
+            self._exported = None
+            if not self._batch_depth:
+                self.db.commit()
+            return cursor.lastrowid
+
+    @contextmanager
+    def batch(self):
+        """Group many inserts into a single transaction"""
+        with self.lock:
+            self._batch_depth += 1
+            try:
+                yield
+            finally:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self.db.commit()
+
+    def flush(self):
+        """Every insert is committed immediately; nothing to flush"""
+        pass
+
+    def get_meta(self, key, default=None):
+        with self.lock:
+            row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["value"]) if row else default
+
+    def set_meta(self, key, value):
+        self._insert("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def is_empty(self):
+        with self.lock:
+            return all(
+                self.db.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None
+                for table in ("task_attempts", "element_failures", "action_results")
+            )
+
+    def add_task_attempt(self, task_hash, goal, actions, success, final_url, screenshot, timestamp, start_url=None):
+        """Store a task attempt and return its id"""
+        return self._insert(
+            "INSERT INTO task_attempts (task_hash, goal, actions, success, final_url, website, screenshot, timestamp, "
+            "start_url) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (task_hash, goal, json.dumps(actions), int(bool(success)), final_url,
+             website_from_url(final_url), screenshot, timestamp, start_url)
+        )
+
+    def add_element_failure(self, website, description, action_type, error, timestamp, suggestions=None):
+        # Suggestions are derived from the key on read, so only the event is stored
+        self._insert(
+            "INSERT INTO element_failures (website, description, action_type, error, timestamp) VALUES (?, ?, ?, ?, ?)",
+            (website, description, action_type, error, timestamp)
+        )
+
+    def add_action_result(self, action_type, website, description, success, timestamp):
+        self._insert(
+            "INSERT INTO action_results (action_type, website, description, success, timestamp) VALUES (?, ?, ?, ?, ?)",
+            (action_type, website, description, int(bool(success)), timestamp)
+        )
+
+    def _attempt_from_row(self, row):
+        return {
+            "id": row["id"],
+            "task_hash": row["task_hash"],
+            "goal": row["goal"],
+            "actions": _as_tuples(json.loads(row["actions"])),
+            "success": bool(row["success"]),
+            "final_url": row["final_url"],
+            "start_url": row["start_url"],
+            "timestamp": row["timestamp"],
+            "screenshot": row["screenshot"]
+        }
+
+    def task_attempts(self, success=None, website=None):
+        """Task attempts as dicts, optionally filtered by outcome and final website"""
+        sql = "SELECT * FROM task_attempts"
+        clauses, params = [], []
+        if success is not None:
+            clauses.append("success = ?")
+            params.append(int(success))
+        if website is not None:
+            clauses.append("website IN (?, ?)")
+            params.extend(_website_variants(website))
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        with self.lock:
+            rows = self.db.execute(sql + " ORDER BY id", params).fetchall()
+        return [self._attempt_from_row(row) for row in rows]
+
+    def task_counts(self):
+        """(total attempts, successful attempts)"""
+        with self.lock:
+            row = self.db.execute("SELECT COUNT(*) AS total, SUM(success) AS successful FROM task_attempts").fetchone()
+        return row["total"], row["successful"] or 0
+
+    def task_success_rates(self, task_hashes=None):
+        """task_hash -> successful attempts / total attempts (optionally only for some hashes)"""
+        sql = "SELECT task_hash, AVG(success) AS rate FROM task_attempts"
+        params = []
+        if task_hashes is not None:
+            params = list(task_hashes)
+            if not params:
+                return {}
+            sql += f" WHERE task_hash IN ({', '.join('?' * len(params))})"
+        with self.lock:
+            rows = self.db.execute(sql + " GROUP BY task_hash", params).fetchall()
+        return {row["task_hash"]: row["rate"] for row in rows}
+
+    def element_failures(self, website=None, min_count=0):
+        """Aggregated element failures: failure_key, website, description, action_type, count"""
+        sql = ("SELECT website, description, action_type, COUNT(*) AS count FROM element_failures "
+               + ("WHERE website IN (?, ?) " if website is not None else "")
+               + "GROUP BY website, description, action_type HAVING COUNT(*) >= ?")
+        params = (_website_variants(website) if website is not None else []) + [min_count]
+        with self.lock:
+            rows = self.db.execute(sql, params).fetchall()
+        return [
+            {
+                "failure_key": f"{row['website']}_{row['description']}_{row['action_type']}",
+                "website": row["website"],
+                "description": row["description"],
+                "action_type": row["action_type"],
+                "count": row["count"],
+                "suggestions": None
+            }
+            for row in rows
+        ]
+
+    def action_stats(self, min_total=0):
+        """Aggregated action success rates keyed like '<action>_<website>'"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT action_type, website, SUM(success) AS success, COUNT(*) AS total FROM action_results "
+                "GROUP BY action_type, website HAVING COUNT(*) >= ?", (min_total,)
+            ).fetchall()
+        return [
+            {"action_key": f"{row['action_type']}_{row['website']}", "success": row["success"], "total": row["total"]}
+            for row in rows
+        ]
+
+    def website_patterns(self, website):
+        with self.lock:
+            row = self.db.execute("SELECT data FROM website_patterns WHERE website = ?", (website,)).fetchone()
+        return json.loads(row["data"]) if row else {}
+
+    def set_website_patterns(self, website, patterns):
+        self._insert("INSERT OR REPLACE INTO website_patterns (website, data) VALUES (?, ?)",
+                     (website, json.dumps(patterns)))
+
+    def selector_stats(self, website, description_key):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT selector, hits, failures, updated FROM selector_cache WHERE website = ? AND description_key = ?",
+                (website, description_key),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def add_selector_result(self, website, description_key, selector, success, timestamp):
+        hit, failure = (1, 0) if success else (0, 1)
+        with self.lock:
+            self._insert(
+                "INSERT INTO selector_cache (website, description_key, selector, hits, failures, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (website, description_key, selector) DO UPDATE SET "
+                "hits = hits + excluded.hits, failures = failures + excluded.failures, updated = excluded.updated",
+                (website, description_key, selector, hit, failure, timestamp),
+            )
+            row = self.db.execute(
+                "SELECT selector, hits, failures, updated FROM selector_cache "
+                "WHERE website = ? AND description_key = ? AND selector = ?",
+                (website, description_key, selector),
+            ).fetchone()
+        return dict(row)
+
+    def selector_count(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM selector_cache").fetchone()[0]
+
+    def remove_selector(self, website, description_key, selector):
+        self._insert("DELETE FROM selector_cache WHERE website = ? AND description_key = ? AND selector = ?",
+                     (website, description_key, selector))
+
+    def set_common_mistakes(self, mistakes):
+        self.set_meta("common_mistakes", mistakes)
+
+    def common_mistakes(self):
+        return self.get_meta("common_mistakes", [])
+
+    def last_updated(self):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT MAX(ts) AS ts FROM ("
+                "SELECT MAX(timestamp) AS ts FROM task_attempts UNION ALL "
+                "SELECT MAX(timestamp) FROM element_failures UNION ALL "
+                "SELECT MAX(timestamp) FROM action_results)"
+            ).fetchone()
+        return row["ts"] or datetime.now().isoformat()
+
+    def export_data(self):
+        """
+        Learning data rebuilt in the legacy dictionary format. The result is
+        kept until the next write, so treat it as read-only.
+        """
+        with self.lock:
+            if self._exported is None:
+                self._exported = self._build_export()
+            return self._exported
+
+    def _build_export(self):
+        data = JSONLearningStore(learning_file=None)
+        for attempt in self.task_attempts():
+            data.add_task_attempt(attempt["task_hash"], attempt["goal"], attempt["actions"], attempt["success"],
+                                  attempt["final_url"], attempt["screenshot"], attempt["timestamp"],
+                                  attempt["start_url"])
+        with self.lock:
+            failures = self.db.execute("SELECT * FROM element_failures ORDER BY id").fetchall()
+            results = self.db.execute("SELECT * FROM action_results ORDER BY id").fetchall()
+            patterns = self.db.execute("SELECT website, data FROM website_patterns").fetchall()
+            selectors = self.db.execute("SELECT * FROM selector_cache").fetchall()
+        for row in failures:
+            data.add_element_failure(row["website"], row["description"], row["action_type"], row["error"],
+                                     row["timestamp"], [])
+        for row in results:
+            data.add_action_result(row["action_type"], row["website"], row["description"], bool(row["success"]),
+                                   row["timestamp"])
+        for row in patterns:
+            data.data["website_patterns"][row["website"]] = json.loads(row["data"])
+        for row in selectors:
+            entries = data.data["selector_cache"].setdefault(row["website"], {}).setdefault(row["description_key"], {})
+            entries[row["selector"]] = {"hits": row["hits"], "failures": row["failures"], "updated": row["updated"]}
+        data.data["common_mistakes"] = self.common_mistakes()
+        data.data["last_updated"] = self.last_updated()
+        return data.data
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def migrate_json_to_sqlite(json_path, store):
+    """
+    One-time import of a legacy ai_learning_data.json into an SQLite store.
+    Returns the number of imported events (0 if already migrated or nothing to do).
+    """
+    if store.get_meta("migrated_from_json") or not os.path.exists(json_path):
+        return 0
+
+    legacy = JSONLearningStore(json_path).data
+    imported = 0
+    with store.batch():
+        for task_hash, attempts in legacy.get("task_patterns", {}).items():
+            for attempt in attempts:
+                store.add_task_attempt(task_hash, attempt.get("goal", ""), attempt.get("actions", []),
+                                       attempt.get("success", False), attempt.get("final_url"),
+                                       attempt.get("screenshot"), attempt.get("timestamp", ""),
+                                       attempt.get("start_url"))
+                imported += 1
+
+        for failure_key, failure in legacy.get("element_failures", {}).items():
+            parts = failure_key.split('_')
+            website, description, action_type = parts[0], '_'.join(parts[1:-1]), parts[-1]
+            errors = failure.get("errors") or []
+            # Older files may carry a count without the individual errors
+            errors += [{"error": None, "timestamp": ""}] * max(0, failure.get("count", 0) - len(errors))
+            for error in errors:
+                store.add_element_failure(website, description, action_type, error.get("error"),
+                                          error.get("timestamp", ""))
+                imported += 1
+
+        for action_key, stats in legacy.get("action_success_rates", {}).items():
+            action_type, _, website = action_key.partition('_')
+            for entry in stats.get("descriptions", []):
+                store.add_action_result(action_type, website, entry.get("description"),
+                                        entry.get("success", False), entry.get("timestamp", ""))
+                imported += 1
+
+        for website, patterns in legacy.get("website_patterns", {}).items():
+            store.set_website_patterns(website, patterns)
+
+        for website, descriptions in legacy.get("selector_cache", {}).items():
+            for description_key, entries in descriptions.items():
+                for selector, stats in entries.items():
+                    store._insert(
+                        "INSERT OR REPLACE INTO selector_cache "
+                        "(website, description_key, selector, hits, failures, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                        (website, description_key, selector, stats.get("hits", 0), stats.get("failures", 0),
+                         stats.get("updated", "")),
+                    )
+
+        if legacy.get("common_mistakes"):
+            store.set_common_mistakes(legacy["common_mistakes"])
+        store.set_meta("migrated_from_json", {"path": json_path, "events": imported,
+                                              "at": datetime.now().isoformat()})
+    return imported
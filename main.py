@@ -1,6 +1,4 @@
-from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -9,47 +7,109 @@ from selenium.webdriver.common.action_chains import ActionChains
 import time
 import requests
 import base64
-import json
 import os
-from PIL import Image
-import io
 import re
+import threading
+import sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
 from ai_learning import AILearningSystem
+from element_resolver import resolve_element, lookup_selectors
+from learning_store import website_from_url
+from plan_replay import check_replay_outcome, find_replay_plan
+from browser_pool import BrowserConfig, launch_chrome
+from network_policy import NetworkPolicy, format_bytes
+from page_snapshot import PageSnapshot
+from model_router import ModelRouter, PageProfile, Tier
+from prompts import PLAN_PROMPT, STEP_PROMPT, VERIFY_PROMPT, WHY_STUCK_PROMPT
+from page_delta import PageState
+from speculation import Speculation, get_speculation_stats
+from goal_checks import NO, UNSURE, YES, GoalChecker, get_check_stats, record_verification_avoided
+from accessibility_tree import AccessibilityTree
+from actions import ACTION_TYPES, PLAN_SCHEMA, STEP_SCHEMA, ActionParseError, ActionStream, parse_plan, parse_step
+from set_of_marks import PageMarks
+from response_cache import FINGERPRINT_SCRIPT, ResponseCache
+from gemini_client import GeminiClient, GenAIBackend
+from screenshot_pipeline import capture, load_screenshot
+from page_waits import wait_for_page_settle, wait_for_element_stable, wait_after_action, get_wait_stats
+from tracing import tracer, span, traced, report
 
+# Screenshots stay in memory and are encoded by Chrome as downscaled JPEG/WebP.
+# Set DEBUG_SCREENSHOTS to True to also write each capture to disk.
+SCREENSHOT_MAX_WIDTH = 1280
+SCREENSHOT_FORMAT = "jpeg"
+SCREENSHOT_QUALITY = 70
+DEBUG_SCREENSHOTS = False
+
+@traced("capture")
 def capture_screenshot(driver, filename="screenshot.png"):
     """
-    Capture a screenshot of the current page
+    Capture a screenshot of the current page in memory. The file name is only
+    used in debug mode, with its extension matching the encoded format.
     """
     try:
-        driver.save_screenshot(filename)
-        print(f"Screenshot saved as {filename}")
-        return filename
+        debug_path = None
+        if DEBUG_SCREENSHOTS:
+            extension = "jpg" if SCREENSHOT_FORMAT == "jpeg" else SCREENSHOT_FORMAT
+            debug_path = f"{os.path.splitext(filename)[0]}.{extension}"
+        screenshot = capture(driver, max_width=SCREENSHOT_MAX_WIDTH, image_format=SCREENSHOT_FORMAT,
+                             quality=SCREENSHOT_QUALITY, debug_path=debug_path)
+        if screenshot is not None:
+            screenshot.fingerprint = capture_fingerprint(driver)
+        if MODEL_ROUTING and screenshot is not None:
+            screenshot.profile = capture_page_profile(driver)
+        if debug_path:
+            print(f"Screenshot saved as {debug_path}")
+        return screenshot
     except Exception as e:
         print(f"Error capturing screenshot: {e}")
         return None
 
-def get_page_text_content(driver):
+def capture_fingerprint(driver):
     """
-    Extract text content from the page
+    URL and DOM fingerprint of the page (for the response cache key and
+    change detection), or None when the page cannot be read
     """
     try:
-        # Get the main content areas
-        body_text = driver.find_element(By.TAG_NAME, "body").text
-        title = driver.title
-        
-        # Get visible text content
-        visible_elements = driver.find_elements(By.XPATH, "//*[not(self::script or self::style)]")
-        visible_text = []
-        
-        for element in visible_elements:
-            if element.is_displayed() and element.text.strip():
-                visible_text.append(element.text.strip())
-        
+        return driver.execute_script(FINGERPRINT_SCRIPT)
+    except Exception as e:
+        print(f"⚠️  Could not fingerprint the page: {e}")
+        return None
+
+@traced("capture.ids")
+def capture_element_ids(driver, screenshot):
+    """
+    Number the page's interactive elements for id-based targeting: the pruned
+    accessibility tree in A11Y_MODE, or numbered boxes drawn on the screenshot
+    in SOM_MODE. Returns (screenshot, element_ids); element_ids is None when
+    neither mode is on or the capture failed.
+    """
+    try:
+        if A11Y_MODE:
+            ax_tree = AccessibilityTree.capture(driver, max_nodes=A11Y_MAX_NODES)
+            print(f"🌳 Accessibility tree: {len(ax_tree.nodes)} elements")
+            return screenshot, ax_tree
+        if SOM_MODE and screenshot is not None:
+            marks = PageMarks.capture(driver, max_marks=SOM_MAX_MARKS)
+            print(f"🔢 Marked {len(marks.marks)} elements on the screenshot")
+            return marks.annotate(screenshot), marks
+    except Exception as e:
+        print(f"Error numbering page elements: {e}")
+    return screenshot, None
+
+def get_page_text_content(driver, max_text_blocks=200):
+    """
+    Extract text content from the page with a single DOM snapshot
+    """
+    try:
+        snapshot = PageSnapshot.capture(driver, max_text_blocks=max_text_blocks, body_text=True)
+
         return {
-            "title": title,
-            "body_text": body_text,
-            "visible_text": visible_text[:10]  # First 10 visible text elements
+            "title": snapshot.title,
+            "body_text": snapshot.body_text,
+            "visible_text": snapshot.text_blocks[:10],  # First 10 visible text elements
+            "snapshot": snapshot
         }
     except Exception as e:
         print(f"Error extracting text content: {e}")
@@ -59,62 +119,425 @@ def get_page_text_content(driver):
 GEMINI_API_KEY = "Your Gemini api key goes here..."
 genai.configure(api_key=GEMINI_API_KEY)
 
+# Shared model client: concurrency limit, per-call deadline, backoff on quota
+# errors and a hedged duplicate request when a response is slower than
+# GEMINI_HEDGE_AFTER seconds (None disables hedging)
+GEMINI_MODEL = 'gemini-1.5-flash'
+GEMINI_MAX_CONCURRENCY = 4
+GEMINI_TIMEOUT = 60
+GEMINI_HEDGE_AFTER = 15
+# Static prompt prefixes are uploaded to Gemini's context cache for this long
+# (when they are large enough for the API, see gemini_client.CONTEXT_CACHE_MIN_TOKENS)
+GEMINI_CONTEXT_CACHE_TTL = 3600
+gemini_client = GeminiClient(GenAIBackend(context_cache_ttl=GEMINI_CONTEXT_CACHE_TTL), model_name=GEMINI_MODEL, max_concurrency=GEMINI_MAX_CONCURRENCY,
+                             timeout=GEMINI_TIMEOUT, hedge_after=GEMINI_HEDGE_AFTER)
+
+# Previous actions offered to the planner; the prompt budget trims the oldest
+PROMPT_HISTORY_ACTIONS = 10
+
+# Tiered model routing: each call type goes to a tier (model + how much of the
+# screenshot it sees). On simple pages (few elements, no CAPTCHA) planning is
+# text-only from a DOM snapshot. A low-confidence answer (no actions and no
+# verdict, or a malformed one) is retried on the tier in MODEL_ESCALATION.
+# Prices (USD per million input/output tokens) are for the cost estimate.
+MODEL_ROUTING = True
+GEMINI_TEXT_MODEL = 'gemini-1.5-flash-8b'
+MODEL_TIERS = [
+    Tier("text", GEMINI_TEXT_MODEL, image_width=0, input_price=0.0375, output_price=0.15),
+    Tier("low", GEMINI_MODEL, image_width=512, input_price=0.075, output_price=0.30),
+    Tier("full", GEMINI_MODEL, image_width=None, input_price=0.075, output_price=0.30),
+]
+MODEL_ROUTES = {"analyze": "low", "verify": "low", "why_stuck": "full", "plan": "full", "step": "full"}
+SIMPLE_PAGE_ROUTES = {"plan": "text", "step": "text"}
+SIMPLE_PAGE_MAX_ELEMENTS = 30
+MODEL_ESCALATION = {"text": "full", "low": "full"}
+model_router = ModelRouter(MODEL_TIERS, MODEL_ROUTES, default_tier="full", simple_routes=SIMPLE_PAGE_ROUTES,
+                           escalation=MODEL_ESCALATION, simple_max_interactive=SIMPLE_PAGE_MAX_ELEMENTS)
+
+# Combined "step" mode: one model call returns the page summary, the completion
+# verdict for the previous step and the next action plan. Falls back to the
+# separate analyze/plan/verify calls when the response cannot be parsed.
+STEP_MODE = True
+
+# Accessibility-tree mode: the step call gets a pruned, numbered accessibility
+# tree of the page (plus a small thumbnail unless A11Y_THUMBNAIL_WIDTH is None)
+# instead of the full screenshot, and actions target elements by id ("#12").
+A11Y_MODE = False
+A11Y_MAX_NODES = 300
+A11Y_THUMBNAIL_WIDTH = 480
+
+# Set-of-marks mode: interactive elements are outlined and numbered on the
+# screenshot, and actions target them by number ("#17"), which executes on the
+# stored element handle without searching the page. A11Y_MODE takes precedence.
+SOM_MODE = False
+SOM_MAX_MARKS = 80
+
+# Replay the recorded actions of a similar goal that already succeeded on the
+# same site (with the differing words substituted) before asking the model
+REPLAY_MODE = True
+
+# Event-driven waits: return as soon as the page settles (see page_waits.py),
+# bounded by these maximums in seconds
+PAGE_SETTLE_MAX_WAIT = 8
+ACTION_SETTLE_MAX_WAIT = 3
+
+# Structured spans for every phase of a goal (see tracing.py), appended to
+# TRACE_FILE as JSONL or, with TRACE_FORMAT = "otlp", as OTLP/JSON.
+# Set TRACE_FILE to None to disable tracing.
+TRACE_FILE = "miki_trace.jsonl"
+TRACE_FORMAT = "jsonl"
+tracer.configure(TRACE_FILE, TRACE_FORMAT)
+
+# Network policy for new browsers (see network_policy.py): ads and trackers are
+# blocked by default. NETWORK_ESSENTIAL_ONLY also drops images, fonts and media,
+# which makes pages load fastest but leaves image-only elements invisible to the
+# model. NETWORK_DOMAIN_BLOCKLISTS adds patterns per site, e.g.
+# {"example.com": ["*example.com/widgets/*"]}. Don't block video streams on
+# video sites: the same URLs serve the player on watch pages.
+NETWORK_BLOCK_ADS = True
+NETWORK_BLOCK_TRACKERS = True
+NETWORK_ESSENTIAL_ONLY = False
+NETWORK_DOMAIN_BLOCKLISTS = {}
+
+# Planner responses are requested as JSON matching a schema (actions.py). A
+# malformed one is re-asked with the parse error at most MAX_REASKS times.
+STRUCTURED_OUTPUT = True
+MAX_REASKS = 1
+
+# Stream planner responses and execute each action as soon as it has been
+# generated instead of waiting for the whole plan
+STREAMING_PLANS = True
+
+# Check the goal against URL, DOM and media state before asking the vision
+# model to verify it; only UNSURE verdicts go to the model
+DETERMINISTIC_VERIFY = True
+
+# Compare the page before and after each batch of actions; when nothing
+# changed, re-plan straight away instead of analysing and verifying it
+CHANGE_DETECTION = True
+# Actions that count as failed when the page did not change after them
+NO_EFFECT_ACTION_TYPES = ("click", "type", "press", "select", "hover")
+
+# Speculative pipelining (step mode with change detection): as soon as the
+# actions are done, capture the page and send the next step request from a
+# worker thread while the page finishes settling. The answer is used only if
+# the settled page has the same fingerprint and screenshot tiles.
+SPECULATIVE_STEPS = True
+speculation_pool = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY, thread_name_prefix="miki-speculate")
+
+# Model usage counters for the session (shared by all worker threads)
+model_call_stats = {"calls": 0, "goals_completed": 0, "by_type": {},
+                    "structured": 0, "malformed": 0, "reasks": 0, "gave_up": 0}
+model_call_lock = threading.Lock()
+# Calls made for the goal running on the current thread; the counter is a
+# list so speculative requests on worker threads can count towards it
+goal_model_calls = threading.local()
+
+def goal_model_call_counter():
+    """
+    The current thread's per-goal call counter
+    """
+    if not hasattr(goal_model_calls, "counter"):
+        goal_model_calls.counter = [0]
+    return goal_model_calls.counter
+
+def record_model_call(call_type):
+    """
+    Count a model call of the given type
+    """
+    with model_call_lock:
+        model_call_stats["calls"] += 1
+        model_call_stats["by_type"][call_type] = model_call_stats["by_type"].get(call_type, 0) + 1
+        goal_model_call_counter()[0] += 1
+
+def record_structured_response(key):
+    """
+    Count a structured response outcome: structured, malformed, reasks or gave_up
+    """
+    with model_call_lock:
+        model_call_stats[key] += 1
+
+def record_goal_completed():
+    """
+    Count a completed goal for the calls-per-goal statistic
+    """
+    with model_call_lock:
+        model_call_stats["goals_completed"] += 1
+
+def reset_goal_model_calls():
+    """
+    Start counting model calls for a new goal on this thread
+    """
+    goal_model_calls.counter = [0]
+
+def get_goal_model_calls():
+    """
+    Model calls made for the current goal on this thread
+    """
+    return goal_model_call_counter()[0]
+
+# Cache for model responses on visually identical pages. Set GEMINI_CACHE_DB to a
+# file path (e.g. "gemini_cache.db") to keep responses across sessions.
+GEMINI_CACHE_TTL = 600
+GEMINI_CACHE_DB = None
+gemini_cache = ResponseCache(max_entries=256, ttl_seconds=GEMINI_CACHE_TTL, db_path=GEMINI_CACHE_DB)
+
+@traced("capture.profile")
+def capture_page_profile(driver):
+    """
+    Complexity and text view of the current page for model routing, or None
+    """
+    try:
+        return PageProfile(PageSnapshot.capture(driver, max_text_blocks=60, max_elements=60))
+    except Exception as e:
+        print(f"⚠️  Could not profile the page: {e}")
+        return None
+
+def page_profile_of(parts):
+    """
+    PageProfile attached to the first screenshot among request parts, or None
+    """
+    for part in parts:
+        profile = getattr(part, "profile", None)
+        if profile is not None:
+            return profile
+    return None
+
+def route_model_call(call_type, parts):
+    """
+    Tier for a call: routed by call type and page complexity, or always the
+    full-screenshot tier when MODEL_ROUTING is off
+    """
+    if not MODEL_ROUTING:
+        return model_router.tiers["full"]
+    return model_router.route(call_type, page_profile_of(parts))
+
+def escalation_tier(tier):
+    """
+    Tier to retry a low-confidence answer on, or None
+    """
+    if not MODEL_ROUTING:
+        return None
+    return model_router.escalate(tier)
+
+def is_low_confidence(result):
+    """
+    Whether a parsed plan or step neither acts nor decides: no actions and the
+    task not completed
+    """
+    return not result["actions"] and not result.get("task_completed")
+
+def generate_model_text(call_type, parts, generation_config=None, tier=None, escalated=False):
+    """
+    Send prompt parts to Gemini through the shared client and return the text.
+    Screenshots among the parts are sent as the tier requires (full, downscaled
+    or replaced by the page's text view); the tier is routed when not given.
+    """
+    tier = tier or route_model_call(call_type, parts)
+    prepared = model_router.prepare(parts, tier, page_profile_of(parts))
+    record_model_call(call_type)
+    started = time.perf_counter()
+    with span(f"model.{call_type}", model=tier.model_name, tier=tier.name):
+        text = gemini_client.generate(prepared, model_name=tier.model_name, generation_config=generation_config)
+    model_router.record(tier, time.perf_counter() - started, prepared, text, escalated)
+    return text
+
+def generate_structured(call_type, parts, parse, schema, tier=None):
+    """
+    Ask for a JSON response matching schema and parse it with parse (which
+    raises ActionParseError). A malformed response is re-asked with the error,
+    at most MAX_REASKS times (on the escalation tier when there is one); after
+    that the salvageable part of the last response is returned, or None. A
+    valid but low-confidence answer is asked again on the escalation tier.
+    """
+    generation_config = structured_generation_config(schema)
+    escalated = tier is not None
+    tier = tier or route_model_call(call_type, parts)
+    text = error = None
+    for attempt in range(MAX_REASKS + 1):
+        if attempt:
+            record_structured_response("reasks")
+            print(f"🔁 Re-asking for a valid {call_type} response ({attempt}/{MAX_REASKS})...")
+            parts = parts + [f"Your previous response was invalid: {error}\n"
+                             f"Previous response:\n{text}\n\n"
+                             "Answer again with ONLY a JSON object in the requested format."]
+            if escalation_tier(tier):
+                tier, escalated = escalation_tier(tier), True
+        text = generate_model_text(call_type, parts, generation_config, tier, escalated)
+        record_structured_response("structured")
+        with span(f"parse.{call_type}") as attributes:
+            try:
+                result = parse(text)
+                valid = True
+            except ActionParseError as e:
+                valid = False
+                error = e
+            attributes["valid"] = valid
+        if valid:
+            next_tier = escalation_tier(tier)
+            if next_tier is not None and is_low_confidence(result):
+                print(f"⬆️  Low-confidence {call_type} answer on the {tier.name} tier, asking the {next_tier.name} tier")
+                return generate_structured(call_type, parts, parse, schema, next_tier)
+            return result
+        record_structured_response("malformed")
+        print(f"⚠️  Malformed {call_type} response: {error}")
+    
+    record_structured_response("gave_up")
+    return error.partial
+
+def generate_plan(call_type, parts, parse, schema, executor=None):
+    """
+    Structured planner call: streamed into the executor when STREAMING_PLANS
+    is on and one is given, otherwise generated in one piece
+    """
+    if STREAMING_PLANS and executor is not None:
+        return stream_structured(call_type, parts, parse, schema, executor)
+    return generate_structured(call_type, parts, parse, schema)
+
+def structured_generation_config(schema):
+    """
+    Generation config asking for JSON matching schema (None when STRUCTURED_OUTPUT is off)
+    """
+    if not STRUCTURED_OUTPUT:
+        return None
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+def stream_structured(call_type, parts, parse, schema, executor, tier=None):
+    """
+    Stream a structured response and hand every action to executor as soon as
+    its JSON object is complete, so the browser works while the model is still
+    generating. The rest of the plan, and the request with it, is cancelled
+    when an action fails or the response says the task is already completed.
+    Returns the parsed response like generate_structured.
+    """
+    escalated = tier is not None
+    tier = tier or route_model_call(call_type, parts)
+    prepared = model_router.prepare(parts, tier, page_profile_of(parts))
+    record_model_call(call_type)
+    record_structured_response("structured")
+    stream = ActionStream()
+    stop_reason = None
+    started = time.perf_counter()
+    with span(f"model.{call_type}", model=tier.model_name, tier=tier.name, streamed=True) as attributes:
+        chunks = gemini_client.generate_stream(prepared, model_name=tier.model_name,
+                                               generation_config=structured_generation_config(schema))
+        try:
+            for chunk in chunks:
+                for action in stream.feed(chunk):
+                    if stream.field("task_completed") is True:
+                        stop_reason = "the response says the task is already completed"
+                        break
+                    if not executor.started:
+                        attributes["first_action_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                        print(f"⚡ First action ready after {time.perf_counter() - started:.1f}s, "
+                              f"executing while the rest of the plan streams in")
+                    if not executor(action):
+                        stop_reason = f"{action.name} {action.target} failed"
+                        break
+                if stop_reason:
+                    break
+        except Exception as e:
+            if not executor.started:
+                raise
+            stop_reason = f"the response stream failed ({e})"
+        finally:
+            chunks.close()
+        attributes["actions"] = len(stream.actions)
+        attributes["cancelled"] = stop_reason is not None
+    model_router.record(tier, time.perf_counter() - started, prepared, stream.buffer, escalated)
+    
+    if stop_reason:
+        print(f"✂️  Cancelling the rest of the plan: {stop_reason}")
+        return stream.partial_result()
+    next_tier = escalation_tier(tier)
+    try:
+        with span(f"parse.{call_type}"):
+            result = parse(stream.buffer)
+    except ActionParseError as e:
+        record_structured_response("malformed")
+        print(f"⚠️  Malformed {call_type} response: {e}")
+        if executor.started:
+            # Some actions already ran; re-asking would plan them again
+            return e.partial or stream.partial_result()
+        return generate_structured(call_type, parts, parse, schema, next_tier)
+    if next_tier is not None and not executor.started and is_low_confidence(result):
+        print(f"⬆️  Low-confidence {call_type} answer on the {tier.name} tier, asking the {next_tier.name} tier")
+        return stream_structured(call_type, parts, parse, schema, executor, next_tier)
+    return result
+
+def compile_prompt(template, **values):
+    """
+    Compile a prompt template within its token budget, reporting trimmed fields
+    """
+    with span("prompt.compile", template=template.name) as attributes:
+        prompt = template.compile(**values)
+        attributes["tokens"] = prompt.tokens
+        attributes["truncated"] = prompt.truncated
+    if prompt.truncated:
+        print(f"✂️  Trimmed {', '.join(prompt.truncated)} to keep the {template.name} prompt at ~{prompt.tokens} tokens")
+    return prompt
+
+def generate_with_cache(call_type, prompt_parts, screenshot, key_parts, is_confident=None):
+    """
+    Generate a response, reusing the cached text when the same call was made
+    for a visually identical screenshot of a page with the same URL and DOM
+    fingerprint, with the same inputs on the same tier. An answer that fails
+    is_confident is asked again on the escalation tier.
+    """
+    parts = list(prompt_parts) + [screenshot]
+    tier = route_model_call(call_type, parts)
+    with span("cache.lookup", call_type=call_type) as attributes:
+        key = gemini_cache.make_key(call_type, screenshot.image, tier.name, *key_parts, page=screenshot.fingerprint)
+        cached = gemini_cache.get(key)
+        attributes["hit"] = cached is not None
+    if cached is not None:
+        print(f"⚡ Reusing cached {call_type} response for an identical page")
+        return cached
+    
+    text = generate_model_text(call_type, parts, tier=tier)
+    next_tier = escalation_tier(tier)
+    if next_tier is not None and is_confident is not None and not is_confident(text):
+        print(f"⬆️  Low-confidence {call_type} answer on the {tier.name} tier, asking the {next_tier.name} tier")
+        text = generate_model_text(call_type, parts, tier=next_tier, escalated=True)
+    gemini_cache.set(key, text)
+    return text
+
+def format_model_call_summary():
+    """
+    Human readable summary of model calls per completed goal
+    """
+    calls = model_call_stats["calls"]
+    goals = model_call_stats["goals_completed"]
+    per_goal = f"{calls / goals:.1f}" if goals else "n/a"
+    by_type = ", ".join(f"{k}={v}" for k, v in sorted(model_call_stats["by_type"].items()))
+    saved = gemini_cache.get_stats()["model_calls_saved"]
+    client = gemini_client.get_stats()
+    structured = model_call_stats["structured"]
+    malformed_rate = model_call_stats["malformed"] / structured if structured else 0
+    avoided = get_check_stats()["model_verifications_avoided"]
+    summary = (f"{calls} calls, {goals} goals completed, {per_goal} calls/goal, {saved} saved by cache, "
+               f"{avoided} verifications answered without the model, "
+               f"{client['retries']} retries, {client['hedges']} hedged, avg {client['avg_latency']:.1f}s, "
+               f"{malformed_rate:.0%} malformed ({model_call_stats['reasks']} re-asked) [{by_type}]")
+    if MODEL_ROUTING:
+        summary += f" tiers: {model_router.format_stats()}"
+    return summary
+
 def verify_task_completion(screenshot_path, user_goal, current_analysis):
     """
     Verify if the user's goal has actually been accomplished by analyzing the current page
     """
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        # Load the screenshot
-        with open(screenshot_path, 'rb') as img_file:
-            img_data = img_file.read()
-        image = Image.open(io.BytesIO(img_data))
-        
-        verification_prompt = f"""
-        You are a TASK VERIFICATION AI. Your job is to determine if a task has been ACTUALLY COMPLETED.
-        
-        ORIGINAL USER GOAL: "{user_goal}"
-        
-        CURRENT PAGE ANALYSIS: {current_analysis.get('ai_analysis', 'No analysis available')}
-        
-        Look at this screenshot and determine: HAS THE USER'S GOAL BEEN ACTUALLY ACCOMPLISHED?
-        
-        VERIFICATION RULES:
-        
-        🎥 "Play a video" / "Watch a video":
-        - COMPLETED: Video player is visible, video is loading/playing, on a video page
-        - NOT COMPLETED: Still on search results, still on homepage, no video player visible
-        
-        🔍 "Search for X":
-        - COMPLETED: Search results for X are displayed, search was executed
-        - NOT COMPLETED: Still on homepage, search not performed, wrong search results
-        
-        🛒 "Buy/Purchase X":
-        - COMPLETED: Item in cart, on checkout page, purchase in progress
-        - NOT COMPLETED: Still browsing, no item selected, not in cart
-        
-        📧 "Sign in/Login":
-        - COMPLETED: User is logged in, dashboard visible, profile accessible
-        - NOT COMPLETED: Still on login page, login failed, not authenticated
+        # Load the screenshot (in-memory capture or a file path)
+        screenshot = load_screenshot(screenshot_path)
         
-        🌐 "Go to website X":
-        - COMPLETED: Actually on website X, correct URL, page loaded
-        - NOT COMPLETED: Still on search results, wrong website, page not loaded
+        verification_prompt = compile_prompt(
+            VERIFY_PROMPT, goal=user_goal, analysis=current_analysis.get('ai_analysis', 'No analysis available')
+        )
         
-        📱 "Click on X":
-        - COMPLETED: X was clicked, now on the destination page/content
-        - NOT COMPLETED: Still on same page, X not clicked, no navigation occurred
-        
-        RESPOND WITH EXACTLY ONE OF THESE:
-        TASK_COMPLETED: YES - [brief reason why it's complete]
-        TASK_COMPLETED: NO - [brief reason why it's not complete and what's missing]
-        
-        Be STRICT in your evaluation. The user's goal must be ACTUALLY ACCOMPLISHED, not just partially done.
-        """
-        
-        response = model.generate_content([verification_prompt, image])
-        result = response.text.strip()
+        # The analysis text is derived from the same screenshot, so the goal is enough for the key
+        result = generate_with_cache("verify", verification_prompt.parts(), screenshot, [user_goal],
+                                     is_confident=lambda text: "TASK_COMPLETED:" in text).strip()
         
         if "TASK_COMPLETED: YES" in result:
             print(f"✅ Task Verification: COMPLETED - {result.split('YES - ')[1] if 'YES - ' in result else 'Goal achieved'}")
@@ -134,59 +557,13 @@ def ask_gemini_why_stuck_and_how_to_fix(screenshot_path, user_goal, stuck_reason
     Ask Gemini to analyze WHY we're stuck and HOW to fix the specific problem
     """
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        # Load the screenshot
-        with open(screenshot_path, 'rb') as img_file:
-            img_data = img_file.read()
-        image = Image.open(io.BytesIO(img_data))
-        
-        problem_analysis_prompt = f"""
-        🚨 PROBLEM ANALYSIS MODE 🚨
-        
-        I am an AI trying to accomplish this goal: "{user_goal}"
-        
-        But I am STUCK because: {stuck_reason}
-        
-        Looking at this screenshot, I need your help to understand:
-        
-        1. 🤔 WHY am I seeing this page/popup/challenge?
-        2. 🔍 WHAT is this page asking me to do?
-        3. 🛠️ HOW can I solve this specific problem to continue toward my goal?
-        4. 📋 WHAT exact steps should I take to get past this obstacle?
-        
-        Common obstacles you might see:
-        - 🤖 CAPTCHA/reCAPTCHA verification
-        - 🚫 Access denied/blocked pages
-        - 📧 Email verification requests
-        - 🔐 Login/authentication requirements
-        - 🍪 Cookie consent popups
-        - 📱 Mobile app redirect prompts
-        - ⚠️ Error pages or timeouts
-        - 🔒 Age verification or location restrictions
+        # Load the screenshot (in-memory capture or a file path)
+        screenshot = load_screenshot(screenshot_path)
         
-        Please provide a DETAILED SOLUTION in this format:
+        problem_analysis_prompt = compile_prompt(WHY_STUCK_PROMPT, goal=user_goal, stuck_reason=stuck_reason)
         
-        PROBLEM_TYPE: [What kind of obstacle this is]
-        WHY_HERE: [Why I'm seeing this page/challenge]
-        WHAT_TO_DO: [What this page is asking me to do]
-        SOLUTION_STEPS: [Step-by-step instructions to solve this]
-        
-        Example:
-        PROBLEM_TYPE: reCAPTCHA verification
-        WHY_HERE: Google detected unusual traffic and is verifying I'm human
-        WHAT_TO_DO: Complete the reCAPTCHA challenge by checking "I'm not a robot"
-        SOLUTION_STEPS: 
-        1. Click the "I'm not a robot" checkbox
-        2. Wait for verification to complete (may show image challenge)
-        3. Complete any additional image selection if prompted
-        4. Wait for redirect to original search results
-        
-        Be specific and actionable - I need to know exactly what to click/type/wait for!
-        """
-        
-        response = model.generate_content([problem_analysis_prompt, image])
-        return response.text.strip()
+        return generate_with_cache("why_stuck", problem_analysis_prompt.parts(), screenshot,
+                                   [user_goal, stuck_reason]).strip()
         
     except Exception as e:
         print(f"⚠️  Problem analysis error: {e}")
@@ -197,19 +574,10 @@ def analyze_with_gemini_ai(screenshot_path, user_instruction=None):
     Analyze page content using Google's Gemini AI with vision capabilities
     """
     try:
-        # Initialize Gemini Pro Vision model
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        # Load the screenshot
-        if not os.path.exists(screenshot_path):
+        # Load the screenshot (in-memory capture or a file path)
+        if screenshot_path is None or (isinstance(screenshot_path, str) and not os.path.exists(screenshot_path)):
             return {"error": "Screenshot not found"}
-            
-        # Open and prepare the image
-        with open(screenshot_path, 'rb') as img_file:
-            img_data = img_file.read()
-        
-        # Convert to PIL Image
-        image = Image.open(io.BytesIO(img_data))
+        screenshot = load_screenshot(screenshot_path)
         
         # Create the prompt for Gemini
         base_prompt = """
@@ -229,10 +597,7 @@ def analyze_with_gemini_ai(screenshot_path, user_instruction=None):
             base_prompt += "Based on the user's goal, suggest the BEST next action to take on this page. Be specific about which element to click or interact with."
         
         # Send to Gemini
-        response = model.generate_content([base_prompt, image])
-        
-        # Parse the response
-        analysis_text = response.text
+        analysis_text = generate_with_cache("analyze", [base_prompt], screenshot, [user_instruction])
         
         return {
             "ai_analysis": analysis_text,
@@ -244,120 +609,29 @@ def analyze_with_gemini_ai(screenshot_path, user_instruction=None):
         print(f"Error in Gemini AI analysis: {e}")
         return {"error": f"Gemini AI analysis failed: {str(e)}"}
 
-def ask_gemini_for_autonomous_actions(screenshot_path, user_goal, current_url, previous_actions=None):
+def ask_gemini_for_autonomous_actions(screenshot_path, user_goal, current_url, previous_actions=None,
+                                      element_ids=None, executor=None, problem=None, suggestions=None):
     """
-    Ask Gemini AI to make autonomous decisions and execute actions without asking permission
+    Ask Gemini AI to make autonomous decisions and execute actions without asking permission.
+    With screenshot marks (element_ids) the model targets elements by number.
+    With a StreamingExecutor the actions already run while the response streams in.
+    problem (an obstacle analysis) and learning suggestions are added as prompt fields.
     """
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        # Load the screenshot
-        with open(screenshot_path, 'rb') as img_file:
-            img_data = img_file.read()
-        image = Image.open(io.BytesIO(img_data))
-        
-        # Build context from previous actions
-        context = ""
-        if previous_actions:
-            context = f"\nPrevious actions taken: {', '.join([f'{a[0]}: {a[1]}' for a in previous_actions[-3:]])}"
-        
-        prompt = f"""
-        You are an AUTONOMOUS AI web automation agent with FULL DECISION-MAKING POWER. 
+        # Load the screenshot (in-memory capture or a file path)
+        screenshot = load_screenshot(screenshot_path)
         
-        USER GOAL: "{user_goal}"
-        CURRENT URL: {current_url}
-        {context}
+        history = [f"{a[0]}: {a[1]}" for a in (previous_actions or [])[-PROMPT_HISTORY_ACTIONS:]]
+        marks = element_ids.legend if isinstance(element_ids, PageMarks) else None
+        prompt = compile_prompt(PLAN_PROMPT, goal=user_goal, url=current_url, problem=problem, history=history,
+                                suggestions=suggestions, marks=marks)
         
-        You have COMPLETE AUTONOMY to:
-        1. Make your own decisions about what actions to take
-        2. Execute actions immediately without asking permission
-        3. Adapt your strategy based on what you see
-        4. Think multiple steps ahead
-        5. Handle errors and try alternative approaches
-        6. Complete the entire task independently
-        
-        IMPORTANT: You are NOT asking for permission - you are EXECUTING actions directly.
-        
-        CRITICAL VISUAL UNDERSTANDING RULES:
-        
-        🎥 VIDEO PLATFORMS (YouTube, etc.):
-        - Video listings have THUMBNAIL + TITLE combinations
-        - To click "first video" = click the thumbnail or title of the topmost video
-        - To click "second video" = click the thumbnail or title of the video in position #2
-        - Look for rectangular thumbnail images with video titles next to/below them
-        - Video elements are usually in a vertical or grid layout
-        
-        🛒 E-COMMERCE (Amazon, eBay, etc.):
-        - Product listings have PRODUCT IMAGE + TITLE + PRICE combinations
-        - To click "first product" = click the image or title of the topmost product
-        - Products are usually in grid or list format with consistent spacing
-        
-        📱 SOCIAL MEDIA (Facebook, Twitter, etc.):
-        - Posts have PROFILE PICTURE + NAME + CONTENT combinations
-        - Click on profile pictures, names, or post content to interact
-        
-        🔗 GENERAL LINK PATTERNS:
-        - Links can be text, buttons, images, or image+text combinations
-        - Look for underlined text, colored text, or clickable-looking elements
-        - Buttons often have borders, background colors, or visual emphasis
-        
-        CRITICAL: When describing elements to click, be VERY SPECIFIC about their location and appearance:
-        - "Sign In button in top right corner"
-        - "email input field in the center of the page"
-        - "Magic Link button below the email field"
-        - "search box in the center of the page"
-        - "first video thumbnail in the search results"
-        - "second video title in the list"
-        - "product image for iPhone in the search results"
-        
-        Looking at this webpage, analyze what you see and decide what actions to take to achieve the user's goal.
-        
-        Return your response in this EXACT format:
-        THOUGHT: [Your reasoning about what you see and what you need to do]
-        ACTION_1: [action_type]:[target_description]
-        ACTION_2: [action_type]:[target_description]
-        ...
-        ACTION_N: [action_type]:[target_description]
-        
-        Available action types:
-        - CLICK: Click on an element (be VERY specific about location/appearance)
-        - TYPE: Type text (provide exact text to type)
-        - NAVIGATE: Go to a URL (provide the URL)
-        - SCROLL: Scroll direction (UP/DOWN/LEFT/RIGHT)
-        - WAIT: Wait for element to load (specify what to wait for)
-        - PRESS: Press a key (ENTER, TAB, ESC, etc.)
-        - HOVER: Hover over an element
-        - SELECT: Select from dropdown/options
-        
-        Examples:
-        THOUGHT: I can see Google's search page. I need to click the search box, type the query, and press Enter to search.
-        ACTION_1: CLICK:large search box in center of page
-        ACTION_2: TYPE:python tutorials
-        ACTION_3: PRESS:ENTER
-        
-        THOUGHT: I can see YouTube search results for Taylor Swift. I need to click on the second video in the list.
-        ACTION_1: CLICK:second video thumbnail in the search results list
-        
-        THOUGHT: I can see Amazon search results for laptops. I need to click on the first laptop product.
-        ACTION_1: CLICK:first laptop product image in the search results
-        
-        THOUGHT: I can see a sign-in page. I need to click the email field, type the email, then click the magic link button.
-        ACTION_1: CLICK:email input field in the center of the form
-        ACTION_2: TYPE:user@example.com
-        ACTION_3: CLICK:Magic Link button below the email field
-        
-        Be intelligent, proactive, and decisive. Think like a human would - see the page, understand the goal, and take action.
-        ALWAYS be specific about element locations and descriptions.
-        
-        WHEN YOU SEE LISTINGS (videos, products, posts, etc.), REMEMBER:
-        - Each listing is a clickable unit (thumbnail + title + details)
-        - Use positional references: "first", "second", "third", "top", "bottom"
-        - Target either the thumbnail/image OR the title text
-        - Be specific about what type of listing you're clicking
-        """
-        
-        response = model.generate_content([prompt, image])
-        return parse_autonomous_actions(response.text)
+        plan = generate_plan("plan", prompt.parts() + [screenshot], parse_plan, PLAN_SCHEMA, executor)
+        if plan is None:
+            return []
+        if plan["thought"]:
+            print(f"🧠 AI Thought: {plan['thought']}")
+        return plan["actions"]
         
     except Exception as e:
         print(f"Error asking Gemini for autonomous actions: {e}")
@@ -365,111 +639,368 @@ def ask_gemini_for_autonomous_actions(screenshot_path, user_goal, current_url, p
 
 def parse_autonomous_actions(gemini_response):
     """
-    Parse Gemini's autonomous action suggestions
+    Parse Gemini's autonomous action suggestions (JSON, or the older
+    ACTION_N lines), keeping the valid actions of a malformed response
     """
-    actions = []
-    thought = ""
-    lines = gemini_response.split('\n')
-    
-    for line in lines:
-        line = line.strip()
-        if line.startswith('THOUGHT:'):
-            thought = line.replace('THOUGHT:', '').strip()
-            print(f"🧠 AI Thought: {thought}")
-        elif line.startswith('ACTION_'):
-            try:
-                # Extract action from format "ACTION_X: TYPE:description"
-                action_part = line.split(':', 1)[1].strip()
-                action_type, description = action_part.split(':', 1)
-                action_type = action_type.strip().upper()
-                description = description.strip()
-                
-                if action_type == 'CLICK':
-                    actions.append(('ai_click', description))
-                elif action_type == 'TYPE':
-                    actions.append(('ai_type', description))
-                elif action_type == 'NAVIGATE':
-                    actions.append(('ai_navigate', description))
-                elif action_type == 'SCROLL':
-                    actions.append(('ai_scroll', description))
-                elif action_type == 'WAIT':
-                    actions.append(('ai_wait', description))
-                elif action_type == 'PRESS':
-                    actions.append(('ai_press', description))
-                elif action_type == 'HOVER':
-                    actions.append(('ai_hover', description))
-                elif action_type == 'SELECT':
-                    actions.append(('ai_select', description))
-                    
-            except Exception as e:
-                print(f"Error parsing action line '{line}': {e}")
-                continue
-    
-    return actions
+    try:
+        plan = parse_plan(gemini_response)
+    except ActionParseError as e:
+        print(f"⚠️  Malformed action response: {e}")
+        plan = e.partial or {"thought": "", "actions": []}
+    if plan["thought"]:
+        print(f"🧠 AI Thought: {plan['thought']}")
+    return plan["actions"]
 
 def parse_gemini_actions(gemini_response):
     """
     Parse Gemini's action suggestions into executable actions
     """
-    actions = []
-    lines = gemini_response.split('\n')
+    return parse_autonomous_actions(gemini_response)
+
+# Action types the combined step response may use
+STEP_ACTION_TYPES = ACTION_TYPES
+
+def ask_gemini_for_step(screenshot_path, user_goal, current_url, previous_actions=None, verify_previous=False,
+                        element_ids=None, executor=None):
+    """
+    Ask Gemini for the page summary, completion verdict and next action plan in ONE call.
+    With element_ids (an accessibility tree or screenshot marks) targets may be
+    element ids; an accessibility tree replaces the screenshot with its text
+    and a thumbnail. With a StreamingExecutor the actions already run while the
+    response streams in.
+    Returns None if the response cannot be parsed so callers can fall back.
+    """
+    try:
+        # Load the screenshot (in-memory capture or a file path)
+        screenshot = load_screenshot(screenshot_path)
+        
+        history = [f"{a[0]}: {a[1]}" for a in (previous_actions or [])[-PROMPT_HISTORY_ACTIONS:]]
+        elements = None
+        if isinstance(element_ids, AccessibilityTree):
+            elements = list(element_ids.lines)
+        elif isinstance(element_ids, PageMarks):
+            elements = element_ids.legend.splitlines()
+        stage = ("The previous actions have just been executed: verify the goal, then plan what is left."
+                 if verify_previous else "First look at this page for the goal.")
+        prompt = compile_prompt(STEP_PROMPT, goal=user_goal, url=current_url, stage=stage, history=history,
+                                elements=elements)
+        
+        parts = prompt.parts()
+        if not isinstance(element_ids, AccessibilityTree):
+            parts.append(screenshot)
+        elif A11Y_THUMBNAIL_WIDTH:
+            parts.append(screenshot.thumbnail(A11Y_THUMBNAIL_WIDTH))
+        step = generate_plan("step", parts, parse_step, STEP_SCHEMA, executor)
+        if step is not None and step["thought"]:
+            print(f"🧠 AI Thought: {step['thought']}")
+        return step
+        
+    except Exception as e:
+        print(f"Error asking Gemini for combined step: {e}")
+        return None
+
+def parse_step_response(gemini_response):
+    """
+    Parse the JSON response of a combined step call, or return None if it is malformed
+    """
+    try:
+        return parse_step(gemini_response)
+    except ActionParseError:
+        return None
+
+def plan_first_step(screenshot_path, user_goal, current_url, previous_actions, element_ids=None, executor=None,
+                    suggestions=None):
+    """
+    Understand the page and plan the first actions for a goal.
+    Returns (understanding, actions); understanding is None on analysis error.
+    Actions streamed into executor have already been executed. Learning
+    suggestions go into the planning prompt of the separate-calls path.
+    """
+    if STEP_MODE:
+        step = ask_gemini_for_step(screenshot_path, user_goal, current_url, previous_actions, element_ids=element_ids,
+                                   executor=executor)
+        if step is not None:
+            return step["page_summary"], step["actions"]
+        print("⚠️  Combined step response unusable, falling back to separate calls...")
     
-    for line in lines:
-        if line.strip().startswith('ACTION_'):
-            try:
-                # Extract action from format "ACTION_X: TYPE:description"
-                action_part = line.split(':', 1)[1].strip()
-                action_type, description = action_part.split(':', 1)
-                action_type = action_type.strip().upper()
-                description = description.strip()
-                
-                if action_type == 'CLICK':
-                    actions.append(('ai_click', description))
-                elif action_type == 'TYPE':
-                    actions.append(('ai_type', description))
-                elif action_type == 'NAVIGATE':
-                    actions.append(('ai_navigate', description))
-                elif action_type == 'SCROLL':
-                    actions.append(('ai_scroll', description))
-                elif action_type == 'WAIT':
-                    actions.append(('ai_wait', description))
-                    
-            except Exception as e:
-                print(f"Error parsing action line '{line}': {e}")
-                continue
+    ai_analysis = analyze_with_gemini_ai(screenshot_path, user_goal)
+    if 'error' in ai_analysis:
+        print(f"❌ AI Analysis Error: {ai_analysis['error']}")
+        return None, []
+    
+    # AI makes autonomous decisions and executes immediately
+    print("\n🤖 AI is making autonomous decisions...")
+    ai_actions = ask_gemini_for_autonomous_actions(screenshot_path, user_goal, current_url, previous_actions,
+                                                   element_ids, executor, suggestions=suggestions)
+    return ai_analysis['ai_analysis'], ai_actions
+
+def check_goal_deterministically(goal_checker):
+    """
+    Verdict of the deterministic goal checks as (verdict, reason); (None, None)
+    when they are off or there is no checker
+    """
+    if not DETERMINISTIC_VERIFY or goal_checker is None:
+        return None, None
+    with span("verify.deterministic") as attributes:
+        verdict, reason = goal_checker.check()
+        attributes["verdict"] = verdict
+    print(f"🧪 Deterministic check: {verdict} - {reason}")
+    return verdict, reason
+
+@traced("capture.state")
+def capture_page_state(driver, screenshot):
+    """
+    Page fingerprint and screenshot tile hashes for change detection, or None
+    when change detection is off or the page cannot be read
+    """
+    if not CHANGE_DETECTION:
+        return None
+    try:
+        return PageState.capture(driver, screenshot)
+    except Exception as e:
+        print(f"⚠️  Could not fingerprint the page: {e}")
+        return None
+
+def detect_no_effect(driver, before, screenshot, actions, ai_learner=None):
+    """
+    Compare the page with its state before actions were executed.
+    Returns (state, no_effect); when nothing changed at all the actions are
+    recorded as failed for learning.
+    """
+    after = capture_page_state(driver, screenshot)
+    if before is None or after is None:
+        return after, False
+    delta = before.diff(after)
+    print(f"🔬 Page change: {delta.describe()}")
+    if not delta.unchanged:
+        return after, False
+    
+    print("🟰 The actions had no effect on the page")
+    if ai_learner:
+        website = website_from_url(driver.current_url)
+        for action_type, description in actions:
+            if action_type in NO_EFFECT_ACTION_TYPES:
+                ai_learner.record_element_failure(description, website, action_type, "No effect on the page")
+    return after, True
+
+def replan_after_no_effect(screenshot_path, user_goal, current_url, previous_actions, tried_actions,
+                           element_ids=None, executor=None):
+    """
+    Plan new actions after the last ones left the page unchanged, without the
+    analysis, verification and why-stuck calls
+    """
+    tried = ", ".join(f"{action_type.upper()}: {description}" for action_type, description in tried_actions)
+    problem = (f"NO EFFECT: The last actions ({tried or 'none could be executed'}) left the page exactly as it "
+               f"was: same URL, same content, same pixels. Do not repeat them. Pick different elements or a "
+               f"different approach to make progress.")
+    
+    return ask_gemini_for_autonomous_actions(
+        screenshot_path,
+        user_goal,
+        current_url,
+        previous_actions,
+        element_ids,
+        executor,
+        problem=problem
+    )
+
+def verify_without_model(goal_checker=None):
+    """
+    Verification after actions that had no effect: only the deterministic
+    checks can still find the goal complete (e.g. the page was already right).
+    Returns (task_completed, stuck_reason, next_actions) like verify_step.
+    """
+    verdict, reason = check_goal_deterministically(goal_checker)
+    if verdict == YES:
+        print(f"✅ Task Verification: COMPLETED - {reason}")
+        return True, None, []
+    print("⏭️  Skipping model verification, re-planning right away...")
+    return False, "the last actions had no effect on the page", None
+
+def speculate_step(counter, screenshot, user_goal, current_url, previous_actions, element_ids):
+    """
+    Worker thread body of a speculative step request; its model calls count
+    towards the goal of the thread that started it
+    """
+    goal_model_calls.counter = counter
+    return ask_gemini_for_step(screenshot, user_goal, current_url, previous_actions, verify_previous=True,
+                               element_ids=element_ids)
+
+def start_speculative_step(driver, user_goal, previous_actions, screenshot_dir, filename):
+    """
+    Capture the page right after the actions and request the next step in the
+    background while the page settles. Returns a Speculation, or None when
+    speculation is off or the page could not be captured.
+    """
+    if not (SPECULATIVE_STEPS and STEP_MODE and CHANGE_DETECTION):
+        return None
+    with span("speculate.start"):
+        screenshot = capture_screenshot(driver, os.path.join(screenshot_dir, filename))
+        state = capture_page_state(driver, screenshot)
+        if screenshot is None or state is None:
+            return None
+        screenshot, element_ids = capture_element_ids(driver, screenshot)
+        print("🔮 Pre-planning the next step while the page settles...")
+        return Speculation(speculation_pool, state, screenshot, element_ids, speculate_step, goal_model_call_counter(),
+                           screenshot, user_goal, driver.current_url, list(previous_actions), element_ids)
+
+def confirm_speculation(driver, speculation, screenshot, state, no_effect=False):
+    """
+    Keep a speculative step if the settled page (state) is the one it was
+    requested on. Returns (screenshot, element_ids, speculation): the
+    speculative capture when it is kept, otherwise the settled screenshot
+    with fresh element ids and speculation None. After actions without
+    effect the step is re-planned instead, so the speculation is dropped.
+    """
+    if speculation is not None and not no_effect and speculation.matches(state):
+        print("🔮 Page unchanged while settling, keeping the pre-planned step")
+        return speculation.screenshot, speculation.element_ids, speculation
+    if speculation is not None:
+        if not no_effect:
+            print("🗑️  Page changed while settling, discarding the pre-planned step")
+        speculation.discard()
+    screenshot, element_ids = capture_element_ids(driver, screenshot)
+    return screenshot, element_ids, None
+
+def verify_step(screenshot_path, user_goal, current_url, previous_actions, element_ids=None, executor=None,
+                goal_checker=None, speculation=None):
+    """
+    Verify whether the goal is complete after executing actions.
+    Returns (task_completed, stuck_reason, next_actions); next_actions is None
+    when the continuation still has to be planned separately. Next actions
+    streamed into executor have already been executed. A YES (or, without
+    the combined step call, NO) from goal_checker skips the model. A confirmed
+    speculation supplies the step call's answer.
+    """
+    verdict, reason = check_goal_deterministically(goal_checker)
+    if verdict == YES:
+        if speculation is not None:
+            speculation.discard()
+        record_verification_avoided()
+        print(f"✅ Task Verification: COMPLETED - {reason}")
+        return True, None, []
+    # The combined step call also plans the next actions, so NO still needs it
+    if verdict == NO and not STEP_MODE:
+        record_verification_avoided()
+        print(f"❌ Task Verification: NOT COMPLETED - {reason}")
+        return False, reason, None
+    
+    if STEP_MODE:
+        step = None
+        if speculation is not None:
+            step, overlapped = speculation.result()
+            if step is not None:
+                print(f"🔮 Using the pre-planned step ({overlapped:.1f}s of model time overlapped with settling)")
+        if step is None:
+            step = ask_gemini_for_step(screenshot_path, user_goal, current_url, previous_actions,
+                                       verify_previous=True, element_ids=element_ids, executor=executor)
+        if step is not None:
+            print("\n" + "="*70)
+            print("📊 AI CURRENT STATUS:")
+            print("="*70)
+            print(step["page_summary"])
+            print("="*70)
+            if step["task_completed"]:
+                print(f"✅ Task Verification: COMPLETED - {step['completion_reason'] or 'Goal achieved'}")
+                return True, None, []
+            reason = step["completion_reason"] or 'Goal not achieved'
+            print(f"❌ Task Verification: NOT COMPLETED - {reason}")
+            return False, reason, step["actions"]
+        print("⚠️  Combined step response unusable, falling back to separate calls...")
+    
+    final_analysis = analyze_with_gemini_ai(screenshot_path, user_goal)
+    
+    print("\n" + "="*70)
+    print("📊 AI CURRENT STATUS:")
+    print("="*70)
+    print(final_analysis.get('ai_analysis', 'Analysis unavailable'))
+    print("="*70)
     
-    return actions
+    # Check if task is actually completed
+    print("\n🎯 Verifying task completion...")
+    task_completed, stuck_reason = verify_task_completion(screenshot_path, user_goal, final_analysis)
+    return task_completed, stuck_reason, None
 
-def execute_autonomous_actions(driver, actions, ai_learner=None):
+def plan_continuation(screenshot_path, user_goal, stuck_reason, current_url, previous_actions, element_ids=None,
+                      executor=None):
     """
-    Execute autonomous AI actions with intelligent error handling, retry logic, and learning
+    Ask WHY we're stuck and plan the actions that get past the obstacle (separate calls)
+    """
+    # 🧠 SMART PROBLEM ANALYSIS: Ask Gemini WHY we're stuck and HOW to fix it
+    print("\n🤔 Analyzing WHY we're stuck and HOW to solve this problem...")
+    print("="*70)
+    problem_solution = ask_gemini_why_stuck_and_how_to_fix(screenshot_path, user_goal, stuck_reason)
+    print("🧠 PROBLEM ANALYSIS & SOLUTION:")
+    print("="*70)
+    print(problem_solution)
+    print("="*70)
+    
+    # AI analyzes current state and plans next actions with the solution context
+    # (a prompt field of its own, the goal stays the goal)
+    return ask_gemini_for_autonomous_actions(
+        screenshot_path, 
+        user_goal, 
+        current_url, 
+        previous_actions,
+        element_ids,
+        executor,
+        problem=problem_solution
+    )
+
+def execute_autonomous_actions(driver, actions, ai_learner=None, element_ids=None):
+    """
+    Execute autonomous AI actions with intelligent error handling, retry logic, and learning.
+    Targets like "#12" refer to element_ids, the accessibility tree or screenshot marks the actions were planned on.
     """
     wait = WebDriverWait(driver, 10)
     executed_actions = []
     current_website = driver.current_url.split('/')[2] if driver.current_url != 'data:,' else 'unknown'
     
     for action_type, description in actions:
+        action_span = tracer.start_span(f"action.{action_type.replace('ai_', '')}")
+        action_error = None
         try:
             print(f"🤖 Autonomous Action: {action_type} - {description}")
+            url_before = driver.current_url
+            id_node = element_ids.node(description) if element_ids is not None else None
+            if id_node is not None:
+                # Resolve by id, but log, learn and fall back on the element's own label
+                description = id_node.label
             
             if action_type == 'ai_navigate':
                 print(f"🌐 Navigating to: {description}")
+                apply_network_policy(driver, description)
                 driver.get(description)
-                time.sleep(3)
+                wait_for_page_settle(driver, "navigate", old_delay=3, max_wait=PAGE_SETTLE_MAX_WAIT)
                 executed_actions.append(('navigate', description))
                 
             elif action_type == 'ai_click':
                 # Intelligent element finding with multiple strategies
                 print(f"🔍 Looking for element: {description}")
-                element = find_element_by_description(driver, description)
-                if element:
-                    # Scroll to element if needed
-                    driver.execute_script("arguments[0].scrollIntoView(true);", element)
-                    time.sleep(0.5)
-                    element.click()
+                page_website = website_from_url(url_before)
+                clicked = False
+                for element, selector, source in iter_element_matches(driver, description, ai_learner, page_website,
+                                                                      id_node):
+                    try:
+                        # Scroll to element if needed
+                        driver.execute_script("arguments[0].scrollIntoView(true);", element)
+                        wait_for_element_stable(driver, element, "scroll into view", old_delay=0.5)
+                        element.click()
+                        clicked = True
+                        # Remember the concrete selector so the next run is a single lookup
+                        if ai_learner and selector:
+                            ai_learner.record_selector_success(page_website, description, selector)
+                        break
+                    except Exception as click_error:
+                        if ai_learner and source == "cache":
+                            ai_learner.record_selector_failure(page_website, description, selector)
+                        # Try the next ranked candidate (e.g. click intercepted by an overlay)
+                        print(f"⚠️  Click failed, trying next candidate: {click_error}")
+
+                if clicked:
                     print(f"✅ Clicked: {description}")
                     executed_actions.append(('click', description))
-                    
+
                     # Record successful action for learning
                     if ai_learner:
                         ai_learner.record_action_success('click', description, True, current_website)
@@ -483,11 +1014,11 @@ def execute_autonomous_actions(driver, actions, ai_learner=None):
                     
                     # Debug: Show all clickable elements on page
                     try:
-                        all_buttons = driver.find_elements(By.XPATH, "//button | //a | //*[@role='button']")
-                        print(f"🔍 Found {len(all_buttons)} clickable elements on page:")
-                        for i, btn in enumerate(all_buttons[:5]):  # Show first 5
-                            if btn.is_displayed():
-                                print(f"  {i+1}. {btn.tag_name}: '{btn.text}' (class: {btn.get_attribute('class')})")
+                        snapshot = PageSnapshot.capture(driver, max_text_blocks=1, max_elements=50)
+                        clickable = snapshot.element_dicts()
+                        print(f"🔍 Found {len(clickable)} visible clickable elements on page:")
+                        for i, btn in enumerate(clickable[:5]):  # Show first 5
+                            print(f"  {i+1}. {btn['tag']}: '{btn['text']}' (at {btn['x']}, {btn['y']})")
                     except:
                         pass
                     
@@ -601,12 +1132,14 @@ def execute_autonomous_actions(driver, actions, ai_learner=None):
                         wait_time = int(re.findall(r'\d+', description)[0])
                     except:
                         pass
-                time.sleep(wait_time)
-                print(f"✅ Waited {wait_time} seconds")
+                # Up to the requested time, but no longer than it takes the page to settle
+                wait_for_page_settle(driver, "requested wait", old_delay=wait_time, max_wait=wait_time)
+                print(f"✅ Waited up to {wait_time} seconds")
                 executed_actions.append(('wait', f'{wait_time}s'))
                 
             elif action_type == 'ai_hover':
-                element = find_element_by_description(driver, description)
+                element = find_element_by_description(driver, description, ai_learner, website_from_url(url_before),
+                                                      id_node)
                 if element:
                     ActionChains(driver).move_to_element(element).perform()
                     print(f"✅ Hovered over: {description}")
@@ -616,7 +1149,8 @@ def execute_autonomous_actions(driver, actions, ai_learner=None):
                     
             elif action_type == 'ai_select':
                 # Handle dropdown selections
-                element = find_element_by_description(driver, description)
+                element = find_element_by_description(driver, description, ai_learner, website_from_url(url_before),
+                                                      id_node)
                 if element:
                     element.click()
                     print(f"✅ Selected: {description}")
@@ -624,15 +1158,101 @@ def execute_autonomous_actions(driver, actions, ai_learner=None):
                 else:
                     print(f"⚠️  Could not find element to select: {description}")
             
-            time.sleep(1)  # Small delay between actions
+            # Let the action take effect before the next one
+            if action_type not in ('ai_navigate', 'ai_wait'):
+                wait_after_action(driver, url_before, f"after {action_type}", old_delay=1,
+                                  max_wait=ACTION_SETTLE_MAX_WAIT,
+                                  expect_navigation=action_type in ('ai_click', 'ai_press'))
             
         except Exception as e:
             print(f"❌ Error executing {action_type}: {e}")
+            action_error = e
             # Continue with next action instead of stopping
+        finally:
+            tracer.end_span(action_span, action_error)
     
     return executed_actions
 
-def find_element_by_description(driver, description):
+class StreamingExecutor:
+    """
+    Executes planned actions one at a time as they stream in from the model
+    """
+
+    def __init__(self, driver, ai_learner=None, element_ids=None):
+        self.driver = driver
+        self.ai_learner = ai_learner
+        self.element_ids = element_ids
+        self.planned = []
+        self.executed = []
+
+    @property
+    def started(self):
+        return bool(self.planned)
+
+    def __call__(self, action):
+        """Execute one action; returns whether it succeeded"""
+        self.planned.append(action)
+        executed = execute_autonomous_actions(self.driver, [action], self.ai_learner, self.element_ids)
+        self.executed.extend(executed)
+        return bool(executed)
+
+def iter_element_matches(driver, description, ai_learner=None, website=None, id_node=None):
+    """
+    Yield (element, selector, source) matches for a description, cheapest source
+    first: the element the model picked by id (id_node), selectors learned
+    for this website, then the single-pass resolver, then the strategy cascade.
+    Later sources only run if the caller keeps iterating (e.g. because clicking
+    the cached match failed).
+    """
+    if id_node is not None:
+        with span("resolve.id") as attributes:
+            element = id_node.resolve(driver)
+            attributes["found"] = element is not None
+        if element is not None:
+            yield element, None, "id"
+
+    if ai_learner is not None and website:
+        selectors = ai_learner.get_cached_selectors(website, description)
+        if selectors:
+            with span("resolve.cache") as attributes:
+                element, selector, missed = lookup_selectors(driver, selectors)
+                attributes["hit"] = element is not None
+            for stale in missed:
+                ai_learner.record_selector_failure(website, description, stale)
+            if element is not None:
+                print(f"⚡ Using learned selector {selector}")
+                yield element, selector, "cache"
+
+    with span("resolve.resolver") as attributes:
+        candidates = resolve_element(driver, description)
+        attributes["found"] = bool(candidates)
+    if candidates:
+        for candidate in candidates:
+            yield candidate["element"], candidate.get("selector"), "resolver"
+        return
+
+    with span("resolve.strategies") as attributes:
+        element = find_element_by_strategies(driver, description)
+        attributes["found"] = element is not None
+    if element is not None:
+        yield element, None, "strategies"
+
+def find_element_candidates(driver, description):
+    """
+    Return candidate elements for a description, best match first.
+    Uses the single-pass resolver and falls back to the strategy cascade.
+    """
+    return [element for element, _, _ in iter_element_matches(driver, description)]
+
+def find_element_by_description(driver, description, ai_learner=None, website=None, id_node=None):
+    """
+    Find the element best matching a free-text description
+    """
+    for element, _, _ in iter_element_matches(driver, description, ai_learner, website, id_node):
+        return element
+    return None
+
+def find_element_by_strategies(driver, description):
     """
     Enhanced element finding with multiple intelligent strategies
     """
@@ -842,6 +1462,340 @@ def find_element_by_description(driver, description):
     
     return None
 
+class GoalTimeout(Exception):
+    """Raised when a goal runs past its deadline"""
+    pass
+
+def check_deadline(deadline):
+    """
+    Raise GoalTimeout if the goal's deadline (a time.time() value) has passed
+    """
+    if deadline is not None and time.time() > deadline:
+        raise GoalTimeout("Goal exceeded its time limit")
+
+def run_goal(driver, user_goal, ai_learner, all_executed_actions=None, screenshot_dir=".", deadline=None):
+    """
+    Run one goal to completion (or until attempts/deadline run out).
+    Returns a result dict: goal, success, final_url, actions, model_calls, duration, error.
+    """
+    if all_executed_actions is None:
+        all_executed_actions = []
+    goal_actions_start = len(all_executed_actions)
+    start_time = time.time()
+    reset_goal_model_calls()
+    result = {"goal": user_goal, "success": False, "final_url": None, "actions": [],
+              "model_calls": 0, "duration": 0.0, "error": None}
+    # Traffic from before this goal doesn't count towards it
+    collect_network_stats(driver)
+    
+    try:
+        with span("goal", goal=user_goal) as attributes:
+            task_completed = run_goal_steps(driver, user_goal, ai_learner, all_executed_actions, screenshot_dir, deadline)
+            attributes["success"] = task_completed
+        result["success"] = task_completed
+    except GoalTimeout as e:
+        print(f"\n⏱️  {e}: {user_goal}")
+        result["error"] = str(e)
+    
+    try:
+        result["final_url"] = driver.current_url
+    except Exception:
+        pass
+    result["actions"] = [list(a) for a in all_executed_actions[goal_actions_start:]]
+    result["model_calls"] = get_goal_model_calls()
+    result["duration"] = round(time.time() - start_time, 3)
+    network = collect_network_stats(driver)
+    if network:
+        result.update(network)
+        print(f"🛡️  Network: {network['requests_loaded']} requests ({format_bytes(network['bytes_loaded'])}) loaded, "
+              f"{network['requests_blocked']} blocked (~{format_bytes(network['bytes_saved'])} saved)")
+    return result
+
+def apply_network_policy(driver, url):
+    """
+    Set the driver's blocked URL patterns for the site about to be loaded
+    """
+    policy = getattr(driver, "network_policy", None)
+    if policy is not None and policy.enabled:
+        policy.apply(driver, url)
+
+def collect_network_stats(driver):
+    """
+    Requests and bytes loaded and blocked since the last call, or None when
+    the driver has no request counting
+    """
+    policy = getattr(driver, "network_policy", None)
+    if policy is None or not policy.count_requests:
+        return None
+    return policy.collect(driver)
+
+def replay_learned_plan(driver, user_goal, ai_learner, all_executed_actions):
+    """
+    Replay the actions of a similar goal that succeeded on this website.
+    Returns True if the outcome verified; on divergence, or when neither the
+    URL nor the deterministic checks confirm the goal, the caller continues
+    with model planning (and model verification) from the current page.
+    """
+    plan = find_replay_plan(ai_learner, user_goal, website_from_url(driver.current_url))
+    if plan is None:
+        return False
+    attempt, actions, expected_url, substitutions = plan
+    
+    print(f"\n♻️  Replaying learned plan from a similar goal: {attempt['goal']}")
+    if substitutions:
+        print("   Substituting " + ", ".join(f"'{old}' → '{new}'" for old, new in substitutions))
+    # Browser state before the replay, for checks that compare (e.g. the cart count)
+    goal_checker = GoalChecker(driver, user_goal)
+    with span("replay", actions=len(actions)) as attributes:
+        executed = execute_autonomous_actions(driver, actions, ai_learner)
+        all_executed_actions.extend(executed)
+        wait_for_page_settle(driver, "before verification", old_delay=3, max_wait=PAGE_SETTLE_MAX_WAIT)
+        if len(executed) < len(actions):
+            verdict, reason = NO, "an action could not be executed"
+        else:
+            verdict, reason = check_replay_outcome(attempt["final_url"], expected_url, driver.current_url,
+                                                   substitutions)
+            if verdict == UNSURE:
+                # The URL cannot show the outcome (e.g. which video plays): check the goal itself
+                verdict, reason = goal_checker.check()
+        attributes["verified"] = verdict == YES
+    
+    if verdict == YES:
+        print(f"✅ Replay verified: reached {driver.current_url} without planning ({reason})")
+        return True
+    print(f"↩️  Replay not verified ({reason}), falling back to model planning...")
+    return False
+
+def print_goal_stats():
+    """
+    Model calls and wait time for the goal that just finished
+    """
+    print(f"📞 Model calls for this goal: {get_goal_model_calls()} "
+          f"(session: {format_model_call_summary()})")
+    speculations = get_speculation_stats()
+    if speculations["started"]:
+        print(f"🔮 Speculation: {speculations['used']}/{speculations['started']} pre-planned steps used, "
+              f"{speculations['discarded']} discarded, {speculations['time_overlapped']:.1f}s of model time "
+              f"overlapped with settling")
+    waits = get_wait_stats()
+    print(f"⏱️  Waits: {waits['total_waited']:.1f}s spent vs {waits['total_old_delay']:g}s of fixed delays "
+          f"({waits['time_saved']:.1f}s saved, {waits['timeouts']} hit the max)")
+
+def run_goal_steps(driver, user_goal, ai_learner, all_executed_actions, screenshot_dir, deadline):
+    """
+    Plan, execute and verify a goal; returns whether it was completed
+    """
+    goal_actions_start = len(all_executed_actions)
+    print(f"\n🧠 Autonomous AI Goal: {user_goal}")
+    print("🤖 AI is taking control and executing independently...")
+    
+    # Get learning suggestions for this task
+    current_website = driver.current_url.split('/')[2] if driver.current_url != 'data:,' else 'unknown'
+    learning_suggestions = ai_learner.get_improvement_suggestions(user_goal, current_website)
+    learned_strategies = ai_learner.get_learned_strategies(user_goal, current_website)
+    
+    if learning_suggestions:
+        print(f"\n📚 LEARNING INSIGHTS:")
+        for suggestion in learning_suggestions[:3]:  # Show top 3
+            print(f"   💡 {suggestion}")
+    
+    if learned_strategies:
+        print(f"\n🎯 LEARNED STRATEGIES:")
+        for strategy in learned_strategies[:2]:  # Show top 2
+            print(f"   ✅ Similar task: {strategy['goal']} (Success: {strategy['success_rate']:.1%})")
+    
+    # If no page is loaded yet, start with Google
+    current_url = driver.current_url
+    if current_url == 'data:,' or 'about:blank' in current_url:
+        print("🌐 Starting with Google.com...")
+        driver.get("https://www.google.com")
+        wait_for_page_settle(driver, "initial page load", old_delay=2, max_wait=PAGE_SETTLE_MAX_WAIT)
+    # Recorded with the attempt: replay looks for plans that started on the same site
+    start_url = driver.current_url
+    
+    if REPLAY_MODE and replay_learned_plan(driver, user_goal, ai_learner, all_executed_actions):
+        ai_learner.record_task_attempt(user_goal, all_executed_actions[goal_actions_start:], True, driver.current_url,
+                                       start_url=start_url)
+        print(f"\n✅ AI SUCCESSFULLY completed the task: {user_goal}")
+        record_goal_completed()
+        print_goal_stats()
+        return True
+    check_deadline(deadline)
+    
+    # Browser state before any action, for the deterministic verification
+    goal_checker = GoalChecker(driver, user_goal) if DETERMINISTIC_VERIFY else None
+    
+    # Capture current page (in memory)
+    screenshot_path = capture_screenshot(driver, os.path.join(screenshot_dir, "screenshot.png"))
+    page_state = capture_page_state(driver, screenshot_path)
+    screenshot_path, element_ids = capture_element_ids(driver, screenshot_path)
+    
+    # Get AI analysis and plan for the current page
+    check_deadline(deadline)
+    print("👁️  AI is analyzing the current page...")
+    executor = StreamingExecutor(driver, ai_learner, element_ids)
+    understanding, ai_actions = plan_first_step(screenshot_path, user_goal, current_url, all_executed_actions,
+                                                element_ids, executor, learning_suggestions)
+    
+    if understanding is None:
+        return False
+    
+    # Display AI's understanding
+    print("\n" + "="*70)
+    print("🧠 AI UNDERSTANDING:")
+    print("="*70)
+    print(understanding)
+    print("="*70)
+    
+    if not ai_actions:
+        print("❌ AI couldn't determine actions. Trying alternative approach...")
+        return False
+    
+    print(f"\n📋 AI decided to execute {len(ai_actions)} actions:")
+    for i, (action_type, description) in enumerate(ai_actions, 1):
+        print(f"  {i}. {action_type.upper()}: {description}")
+    
+    if executor.started:
+        print(f"\n🚀 AI executed {len(executor.executed)} actions while the plan streamed in")
+        executed_actions = executor.executed
+    else:
+        # Execute actions immediately without asking permission
+        print(f"\n🚀 AI is executing actions AUTONOMOUSLY...")
+        executed_actions = execute_autonomous_actions(driver, ai_actions, ai_learner, element_ids)
+    all_executed_actions.extend(executed_actions)
+    
+    # Wait for the page to settle (the next step is already being planned) and analyze result
+    speculation = start_speculative_step(driver, user_goal, all_executed_actions, screenshot_dir,
+                                         "speculative_screenshot.png")
+    wait_for_page_settle(driver, "before verification", old_delay=3, max_wait=PAGE_SETTLE_MAX_WAIT)
+    check_deadline(deadline)
+    final_screenshot = capture_screenshot(driver, os.path.join(screenshot_dir, "result_screenshot.png"))
+    page_state, no_effect = detect_no_effect(driver, page_state, final_screenshot, executed_actions, ai_learner)
+    last_actions = executed_actions
+    final_screenshot, element_ids, speculation = confirm_speculation(driver, speculation, final_screenshot,
+                                                                     page_state, no_effect)
+    
+    executor = StreamingExecutor(driver, ai_learner, element_ids)
+    if no_effect:
+        task_completed, stuck_reason, next_actions = verify_without_model(goal_checker)
+    else:
+        print("\n🔍 AI is analyzing the results...")
+        task_completed, stuck_reason, next_actions = verify_step(
+            final_screenshot, user_goal, driver.current_url, all_executed_actions, element_ids, executor,
+            goal_checker, speculation
+        )
+    
+    if task_completed:
+        print(f"\n✅ AI SUCCESSFULLY completed the task: {user_goal}")
+        print(f"📈 Total actions executed: {len(all_executed_actions)}")
+        
+        # Show learning improvement
+        learning_summary = ai_learner.get_learning_summary()
+        print(f"📚 AI Learning Progress: {learning_summary['success_rate']:.1%} success rate")
+    else:
+        print(f"\n⚠️  Task NOT fully completed yet. AI will continue working...")
+        print(f"🎯 Goal: {user_goal}")
+        print(f"🔄 Attempting to complete the remaining steps...")
+        
+        # Continue working until task is complete
+        max_attempts = 3
+        attempt = 1
+        
+        while not task_completed and attempt <= max_attempts:
+            print(f"\n🔄 Continuation attempt {attempt}/{max_attempts}")
+            check_deadline(deadline)
+            
+            if next_actions is not None:
+                # The combined step call already planned the way forward
+                continue_actions = next_actions
+            elif no_effect:
+                executor = StreamingExecutor(driver, ai_learner, element_ids)
+                continue_actions = replan_after_no_effect(final_screenshot, user_goal, driver.current_url,
+                                                          all_executed_actions, last_actions, element_ids, executor)
+            else:
+                executor = StreamingExecutor(driver, ai_learner, element_ids)
+                continue_actions = plan_continuation(final_screenshot, user_goal, stuck_reason, driver.current_url,
+                                                     all_executed_actions, element_ids, executor)
+            
+            if continue_actions:
+                print(f"\n📋 AI continuing with {len(continue_actions)} more actions:")
+                for i, (action_type, description) in enumerate(continue_actions, 1):
+                    print(f"  {i}. {action_type.upper()}: {description}")
+                
+                if executor.started:
+                    print(f"\n🚀 AI executed {len(executor.executed)} actions while the plan streamed in")
+                    new_executed = executor.executed
+                else:
+                    # Execute continuation actions
+                    print(f"\n🚀 AI continuing execution...")
+                    # Ids in the continuation refer to the elements numbered on the last capture
+                    new_executed = execute_autonomous_actions(driver, continue_actions, ai_learner, element_ids)
+                all_executed_actions.extend(new_executed)
+                
+                # Check again once the page has settled
+                speculation = start_speculative_step(driver, user_goal, all_executed_actions, screenshot_dir,
+                                                     f"speculative_{attempt}.png")
+                wait_for_page_settle(driver, "before verification", old_delay=3, max_wait=PAGE_SETTLE_MAX_WAIT)
+                check_deadline(deadline)
+                final_screenshot = capture_screenshot(driver, os.path.join(screenshot_dir, f"verification_{attempt}.png"))
+                page_state, no_effect = detect_no_effect(driver, page_state, final_screenshot, new_executed,
+                                                         ai_learner)
+                last_actions = new_executed
+                final_screenshot, element_ids, speculation = confirm_speculation(driver, speculation,
+                                                                                 final_screenshot, page_state,
+                                                                                 no_effect)
+                executor = StreamingExecutor(driver, ai_learner, element_ids)
+                if no_effect:
+                    task_completed, stuck_reason, next_actions = verify_without_model(goal_checker)
+                else:
+                    task_completed, stuck_reason, next_actions = verify_step(
+                        final_screenshot, user_goal, driver.current_url, all_executed_actions, element_ids, executor,
+                        goal_checker, speculation
+                    )
+                
+                if task_completed:
+                    print(f"\n✅ AI SUCCESSFULLY completed the task after {attempt} continuation attempts!")
+                    break
+            else:
+                print(f"\n❌ AI couldn't determine continuation actions for attempt {attempt}")
+                next_actions = None
+            
+            attempt += 1
+        
+        if not task_completed:
+            print(f"\n⚠️  AI could not fully complete the task after {max_attempts} attempts")
+            print(f"📊 Total actions executed: {len(all_executed_actions)}")
+        else:
+            print(f"📈 Total actions executed: {len(all_executed_actions)}")
+    
+    # Record this goal's actions and final outcome for learning (and later replay)
+    final_url = driver.current_url
+    # Only debug-mode captures have a file worth recording
+    screenshot_file = final_screenshot.path if final_screenshot is not None else None
+    ai_learner.record_task_attempt(user_goal, all_executed_actions[goal_actions_start:], task_completed, final_url,
+                                   screenshot_file, start_url)
+    
+    if task_completed:
+        record_goal_completed()
+    print_goal_stats()
+    return task_completed
+
+def create_network_policy():
+    """
+    Network policy from the NETWORK_* settings
+    """
+    return NetworkPolicy(block_ads=NETWORK_BLOCK_ADS, block_trackers=NETWORK_BLOCK_TRACKERS,
+                         essential_only=NETWORK_ESSENTIAL_ONLY, domain_blocklists=NETWORK_DOMAIN_BLOCKLISTS)
+
+def create_driver(headless=False, profile_dir=None, config=None):
+    """
+    Start a Chrome WebDriver with the anti-detection options.
+    profile_dir gives the browser its own user-data dir (one per parallel worker);
+    a BrowserConfig enables viewport, fast-start and resource-blocking options.
+    """
+    return launch_chrome(config or BrowserConfig(headless=headless, profile_dir=profile_dir,
+                                                 network_policy=create_network_policy()))
+
 def autonomous_ai_browser():
     """
     Fully autonomous AI browser automation with machine learning capabilities
@@ -850,16 +1804,8 @@ def autonomous_ai_browser():
         # Initialize the AI Learning System
         ai_learner = AILearningSystem()
         
-        # Set up Chrome options
-        chrome_options = Options()
-        chrome_options.add_argument("--start-maximized")
-        chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        chrome_options.add_experimental_option('useAutomationExtension', False)
-        
         # Initialize the Chrome WebDriver
-        driver = webdriver.Chrome(options=chrome_options)
-        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        driver = create_driver()
         
         print("Miki Miki - AI-Powered Browser Automation with Gemini Vision")
         print("Made with love by Flash Dynamics Syndicate")
@@ -919,164 +1865,16 @@ def autonomous_ai_browser():
                     print(f"   Total tasks: {summary['total_tasks_attempted']}")
                     print(f"   Success rate: {summary['success_rate']:.1%}")
                     print(f"   Websites learned: {', '.join(summary['websites_learned'])}")
+                    cache_stats = gemini_cache.get_stats()
+                    print(f"   Model calls saved by cache: {cache_stats['model_calls_saved']} "
+                          f"(hit rate {cache_stats['hit_rate']:.1%})")
                     print("=" * 50)
                     continue
                 
                 if not user_goal:
                     continue
                 
-                print(f"\n🧠 Autonomous AI Goal: {user_goal}")
-                print("🤖 AI is taking control and executing independently...")
-                
-                # Get learning suggestions for this task
-                current_website = driver.current_url.split('/')[2] if driver.current_url != 'data:,' else 'unknown'
-                learning_suggestions = ai_learner.get_improvement_suggestions(user_goal, current_website)
-                learned_strategies = ai_learner.get_learned_strategies(user_goal, current_website)
-                
-                if learning_suggestions:
-                    print(f"\n📚 LEARNING INSIGHTS:")
-                    for suggestion in learning_suggestions[:3]:  # Show top 3
-                        print(f"   💡 {suggestion}")
-                
-                if learned_strategies:
-                    print(f"\n🎯 LEARNED STRATEGIES:")
-                    for strategy in learned_strategies[:2]:  # Show top 2
-                        print(f"   ✅ Similar task: {strategy['goal']} (Success: {strategy['success_rate']:.1%})")
-                
-                # If no page is loaded yet, start with Google
-                current_url = driver.current_url
-                if current_url == 'data:,' or 'about:blank' in current_url:
-                    print("🌐 Starting with Google.com...")
-                    driver.get("https://www.google.com")
-                    time.sleep(2)
-                
-                # Capture current page
-                screenshot_path = capture_screenshot(driver)
-                
-                # Get AI analysis of current page
-                print("👁️  AI is analyzing the current page...")
-                ai_analysis = analyze_with_gemini_ai(screenshot_path, user_goal)
-                
-                if 'error' in ai_analysis:
-                    print(f"❌ AI Analysis Error: {ai_analysis['error']}")
-                    continue
-                
-                # Display AI's understanding
-                print("\n" + "="*70)
-                print("🧠 AI UNDERSTANDING:")
-                print("="*70)
-                print(ai_analysis['ai_analysis'])
-                print("="*70)
-                
-                # AI makes autonomous decisions and executes immediately
-                print("\n🤖 AI is making autonomous decisions...")
-                ai_actions = ask_gemini_for_autonomous_actions(screenshot_path, user_goal, current_url, all_executed_actions)
-                
-                if not ai_actions:
-                    print("❌ AI couldn't determine actions. Trying alternative approach...")
-                    continue
-                
-                print(f"\n📋 AI decided to execute {len(ai_actions)} actions:")
-                for i, (action_type, description) in enumerate(ai_actions, 1):
-                    print(f"  {i}. {action_type.upper()}: {description}")
-                
-                # Execute actions immediately without asking permission
-                print(f"\n🚀 AI is executing actions AUTONOMOUSLY...")
-                executed_actions = execute_autonomous_actions(driver, ai_actions, ai_learner)
-                all_executed_actions.extend(executed_actions)
-                
-                # Wait and analyze result
-                time.sleep(3)
-                final_screenshot = capture_screenshot(driver, "result_screenshot.png")
-                
-                print("\n🔍 AI is analyzing the results...")
-                final_analysis = analyze_with_gemini_ai(final_screenshot, user_goal)
-                
-                print("\n" + "="*70)
-                print("📊 AI CURRENT STATUS:")
-                print("="*70)
-                print(final_analysis.get('ai_analysis', 'Analysis unavailable'))
-                print("="*70)
-                
-                # Check if task is actually completed
-                print("\n🎯 Verifying task completion...")
-                task_completed, stuck_reason = verify_task_completion(final_screenshot, user_goal, final_analysis)
-                
-                # Record task attempt for learning
-                final_url = driver.current_url
-                ai_learner.record_task_attempt(user_goal, all_executed_actions, task_completed, final_url, final_screenshot)
-                
-                if task_completed:
-                    print(f"\n✅ AI SUCCESSFULLY completed the task: {user_goal}")
-                    print(f"📈 Total actions executed: {len(all_executed_actions)}")
-                    
-                    # Show learning improvement
-                    learning_summary = ai_learner.get_learning_summary()
-                    print(f"📚 AI Learning Progress: {learning_summary['success_rate']:.1%} success rate")
-                else:
-                    print(f"\n⚠️  Task NOT fully completed yet. AI will continue working...")
-                    print(f"🎯 Goal: {user_goal}")
-                    print(f"🔄 Attempting to complete the remaining steps...")
-                    
-                    # Continue working until task is complete
-                    max_attempts = 3
-                    attempt = 1
-                    
-                    while not task_completed and attempt <= max_attempts:
-                        print(f"\n🔄 Continuation attempt {attempt}/{max_attempts}")
-                        
-                        # 🧠 SMART PROBLEM ANALYSIS: Ask Gemini WHY we're stuck and HOW to fix it
-                        print("\n🤔 Analyzing WHY we're stuck and HOW to solve this problem...")
-                        print("="*70)
-                        problem_solution = ask_gemini_why_stuck_and_how_to_fix(final_screenshot, user_goal, stuck_reason)
-                        print("🧠 PROBLEM ANALYSIS & SOLUTION:")
-                        print("="*70)
-                        print(problem_solution)
-                        print("="*70)
-                        
-                        # AI analyzes current state and plans next actions with the solution context
-                        enhanced_prompt = f"""CONTINUE TASK: {user_goal}. 
-
-PROBLEM ANALYSIS: {problem_solution}
-
-Based on the problem analysis above, implement the suggested solution steps to get past this obstacle and continue toward the goal. Use the specific instructions provided in the SOLUTION_STEPS."""
-                        
-                        continue_actions = ask_gemini_for_autonomous_actions(
-                            final_screenshot, 
-                            enhanced_prompt, 
-                            driver.current_url, 
-                            all_executed_actions
-                        )
-                        
-                        if continue_actions:
-                            print(f"\n📋 AI continuing with {len(continue_actions)} more actions:")
-                            for i, (action_type, description) in enumerate(continue_actions, 1):
-                                print(f"  {i}. {action_type.upper()}: {description}")
-                            
-                            # Execute continuation actions
-                            print(f"\n🚀 AI continuing execution...")
-                            new_executed = execute_autonomous_actions(driver, continue_actions, ai_learner)
-                            all_executed_actions.extend(new_executed)
-                            
-                            # Check again
-                            time.sleep(3)
-                            final_screenshot = capture_screenshot(driver, f"verification_{attempt}.png")
-                            final_analysis = analyze_with_gemini_ai(final_screenshot, user_goal)
-                            task_completed, stuck_reason = verify_task_completion(final_screenshot, user_goal, final_analysis)
-                            
-                            if task_completed:
-                                print(f"\n✅ AI SUCCESSFULLY completed the task after {attempt} continuation attempts!")
-                                break
-                        else:
-                            print(f"\n❌ AI couldn't determine continuation actions for attempt {attempt}")
-                        
-                        attempt += 1
-                    
-                    if not task_completed:
-                        print(f"\n⚠️  AI could not fully complete the task after {max_attempts} attempts")
-                        print(f"📊 Total actions executed: {len(all_executed_actions)}")
-                    else:
-                        print(f"📈 Total actions executed: {len(all_executed_actions)}")
+                run_goal(driver, user_goal, ai_learner, all_executed_actions)
                 
             except KeyboardInterrupt:
                 print("\n\n⏹️  Interrupted by user")
@@ -1097,5 +1895,26 @@ Based on the problem analysis above, implement the suggested solution steps to g
         except:
             pass
 
+def main(argv=None):
+    """
+    Command line entry point:
+      miki-miki                      interactive autonomous browser
+      miki-miki report [traces...]   p50/p95 latency per phase from trace files
+      miki-miki batch goals.txt ...  parallel batch runner (see batch_runner.py)
+    """
+    args = sys.argv[1:] if argv is None else argv
+    if args and args[0] == "report":
+        parser = argparse.ArgumentParser(prog="miki-miki report", description="Aggregate span latencies from trace files")
+        parser.add_argument("traces", nargs="*", default=[TRACE_FILE] if TRACE_FILE else [], help="JSONL or OTLP/JSON trace files")
+        parser.add_argument("--by", choices=["phase", "name"], default="phase",
+                            help="group by phase (model, action, wait...) or by full span name")
+        options = parser.parse_args(args[1:])
+        report(options.traces, by=options.by)
+    elif args and args[0] == "batch":
+        from batch_runner import main as batch_main
+        batch_main(args[1:])
+    else:
+        autonomous_ai_browser()
+
 if __name__ == "__main__":
-    autonomous_ai_browser()
+    main()
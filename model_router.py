@@ -0,0 +1,170 @@
+"""
+Tiered model routing for Miki Miki
+
+Every model call used to send a full screenshot to the same model, whether
+the page was a plain search form or a CAPTCHA. ModelRouter picks a tier per
+call type and page: text-only planning from a DOM snapshot on simple pages,
+a low-resolution screenshot for verification and the full screenshot where
+the details matter. A low-confidence answer can be escalated to the next
+tier, and calls, latency and estimated cost are counted per tier.
+"""
+
+import re
+import threading
+
+# Gemini bills an image as a fixed number of input tokens
+IMAGE_TOKENS = 258
+# Rough characters per token for prompt and response text
+CHARS_PER_TOKEN = 4
+
+CAPTCHA_PATTERN = re.compile(r"captcha|not a robot|unusual traffic|verify you are human", re.IGNORECASE)
+
+
+class Tier:
+    """
+    One routing tier: the model to call and how much of the screenshot it
+    gets (image_width None = full resolution, 0 = text only). Prices are USD
+    per million input/output tokens, for the cost estimate.
+    """
+
+    def __init__(self, name, model_name, image_width=None, input_price=0.0, output_price=0.0):
+        self.name = name
+        self.model_name = model_name
+        self.image_width = image_width
+        self.input_price = input_price
+        self.output_price = output_price
+
+    @property
+    def text_only(self):
+        return self.image_width == 0
+
+    def __repr__(self):
+        return f"Tier({self.name}, {self.model_name}, image_width={self.image_width})"
+
+
+class PageProfile:
+    """How complex a page is, and a compact text view of it for text-only calls"""
+
+    def __init__(self, snapshot):
+        self.url = snapshot.url
+        self.title = snapshot.title
+        self.interactive = len(snapshot.elements) + len(snapshot.form_fields)
+        self.text_blocks = len(snapshot.text_blocks)
+        self.captcha = bool(CAPTCHA_PATTERN.search(" ".join([snapshot.title] + snapshot.text_blocks[:50])))
+        self.text = self.render(snapshot)
+
+    @staticmethod
+    def render(snapshot, max_text_blocks=40):
+        """Page title, form fields, interactive elements and the first text blocks as prompt text"""
+        lines = [f"PAGE: {snapshot.title} ({snapshot.url})", "", "FORM FIELDS:"]
+        for field in snapshot.form_field_dicts():
+            description = field["label"] or field["name"] or field["type"] or field["tag"]
+            value = f' value="{field["value"]}"' if field["value"] else ""
+            lines.append(f'- {field["tag"]} "{description}"{value} at ({field["x"]}, {field["y"]})')
+        lines += ["", "INTERACTIVE ELEMENTS:"]
+        for element in snapshot.element_dicts():
+            lines.append(f'- {element["role"] or element["tag"]} "{element["text"]}" at ({element["x"]}, {element["y"]})')
+        lines += ["", "VISIBLE TEXT:"] + snapshot.text_blocks[:max_text_blocks]
+        return "\n".join(lines)
+
+    def is_simple(self, max_interactive=30, max_text_blocks=60):
+        """Few elements, little text and no CAPTCHA: the text view is enough to plan on"""
+        return not self.captcha and self.interactive <= max_interactive and self.text_blocks <= max_text_blocks
+
+
+def estimate_tokens(parts):
+    """Approximate input tokens of prepared request parts"""
+    tokens = 0
+    for part in parts:
+        if isinstance(part, str):
+            tokens += len(part) // CHARS_PER_TOKEN
+        else:
+            tokens += IMAGE_TOKENS
+    return tokens
+
+
+class ModelRouter:
+    """
+    Chooses a Tier per call. routes maps call types to tier names; on simple
+    pages the call types in simple_routes use their tier there instead.
+    """
+
+    def __init__(self, tiers, routes, default_tier, simple_routes=None, escalation=None,
+                 simple_max_interactive=30):
+        self.tiers = {tier.name: tier for tier in tiers}
+        self.routes = routes
+        self.default_tier = default_tier
+        self.simple_routes = simple_routes or {}
+        # tier name -> tier to retry on when an answer has low confidence (None: no escalation)
+        self.escalation = escalation or {}
+        self.simple_max_interactive = simple_max_interactive
+        self.lock = threading.Lock()
+        self.stats = {}                     # tier name -> counters
+
+    def route(self, call_type, profile=None):
+        """The tier for a call of this type about a page with this profile (None if unknown)"""
+        name = self.routes.get(call_type, self.default_tier)
+        if profile is not None and call_type in self.simple_routes \
+                and profile.is_simple(max_interactive=self.simple_max_interactive):
+            name = self.simple_routes[call_type]
+        tier = self.tiers[name]
+        if tier.text_only and profile is None:
+            # Nothing to describe the page with
+            tier = self.escalate(tier) or self.tiers[self.default_tier]
+        return tier
+
+    def escalate(self, tier):
+        """The tier to retry a low-confidence answer on, or None"""
+        name = self.escalation.get(tier.name)
+        return self.tiers.get(name) if name else None
+
+    def prepare(self, parts, tier, profile=None):
+        """
+        Request parts for a tier: screenshots become full or downscaled image
+        parts, or are replaced by the page's text view on the text-only tier
+        """
+        prepared = []
+        for part in parts:
+            if not callable(getattr(part, "thumbnail", None)):
+                prepared.append(part)
+            elif tier.text_only:
+                continue
+            elif tier.image_width:
+                prepared.append(part.thumbnail(tier.image_width).part())
+            else:
+                prepared.append(part.part())
+        if tier.text_only and profile is not None:
+            prepared.append("The page (no screenshot, text view of its DOM):\n" + profile.text)
+        return prepared
+
+    def record(self, tier, seconds, parts, response, escalated=False):
+        """Count one call on a tier with its latency and estimated tokens and cost"""
+        input_tokens = estimate_tokens(parts)
+        output_tokens = len(response or "") // CHARS_PER_TOKEN
+        cost = (input_tokens * tier.input_price + output_tokens * tier.output_price) / 1e6
+        with self.lock:
+            stats = self.stats.setdefault(tier.name, {"calls": 0, "escalations": 0, "total_latency": 0.0,
+                                                      "input_tokens": 0, "output_tokens": 0, "cost": 0.0})
+            stats["calls"] += 1
+            stats["escalations"] += 1 if escalated else 0
+            stats["total_latency"] += seconds
+            stats["input_tokens"] += input_tokens
+            stats["output_tokens"] += output_tokens
+            stats["cost"] += cost
+
+    def get_stats(self):
+        """Per-tier calls, escalations (calls that were retries from a lower tier), latency, tokens and cost"""
+        with self.lock:
+            stats = {name: dict(values) for name, values in self.stats.items()}
+        for values in stats.values():
+            values["avg_latency"] = values["total_latency"] / values["calls"] if values["calls"] else 0.0
+        return stats
+
+    def format_stats(self):
+        """One line per session: calls, average latency and estimated cost of each tier"""
+        stats = self.get_stats()
+        if not stats:
+            return "no routed calls"
+        return ", ".join(f"{name} {values['calls']} calls avg {values['avg_latency']:.1f}s ~${values['cost']:.5f}"
+                         + (f" ({values['escalations']} escalated)" if values["escalations"] else "")
+                         for name, values in sorted(stats.items()))
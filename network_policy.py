@@ -0,0 +1,203 @@
+"""
+Network policy for Miki Miki browser sessions
+
+Blocks ads, trackers, web fonts, autoplay media and per-site extras through
+the DevTools protocol (Network.setBlockedURLs) so navigation finishes sooner
+and screenshots carry less clutter for the vision model. An "essential only"
+mode blocks everything except documents, scripts, stylesheets and XHR.
+
+Blocked and loaded requests are counted from Chrome's performance log, which
+also gives an estimate of the bytes each blocked request would have cost.
+"""
+
+import fnmatch
+import json
+import threading
+from urllib.parse import urlsplit
+
+# URL patterns per category, in the wildcard syntax of Network.setBlockedURLs
+CATEGORY_PATTERNS = {
+    "ads": [
+        "*doubleclick.net*", "*googlesyndication.com*", "*googleadservices.com*", "*adservice.google.*",
+        "*amazon-adsystem.com*", "*adnxs.com*", "*criteo.com*", "*criteo.net*", "*taboola.com*",
+        "*outbrain.com*", "*pubmatic.com*", "*rubiconproject.com*", "*openx.net*", "*moatads.com*",
+    ],
+    "trackers": [
+        "*google-analytics.com*", "*googletagmanager.com*", "*connect.facebook.net*", "*hotjar.com*",
+        "*scorecardresearch.com*", "*quantserve.com*", "*segment.io*", "*cdn.segment.com*", "*mixpanel.com*",
+        "*nr-data.net*", "*fullstory.com*", "*clarity.ms*", "*bat.bing.com*",
+    ],
+    "fonts": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot", "*fonts.gstatic.com*"],
+    "media": ["*.mp4", "*.webm", "*.m4s", "*.mp3", "*.ogg", "*.m3u8", "*googlevideo.com/videoplayback*"],
+    "images": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.ico"],
+}
+
+# Everything except documents, scripts, stylesheets and XHR/fetch
+ESSENTIAL_ONLY_CATEGORIES = ["ads", "trackers", "fonts", "media", "images"]
+
+# Rough transfer size of a resource when the session has not loaded one of
+# that type yet (used to estimate bytes saved by a block)
+TYPICAL_BYTES = {
+    "Image": 40000,
+    "Font": 35000,
+    "Media": 500000,
+    "Script": 30000,
+    "Stylesheet": 15000,
+    "XHR": 3000,
+    "Fetch": 3000,
+    "Other": 5000,
+}
+
+
+def site_of(url):
+    """Host name of a URL without a leading www."""
+    host = urlsplit(url or "").hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def host_matches(host, domain):
+    """Whether host is domain or one of its subdomains"""
+    return host == domain or host.endswith("." + domain)
+
+
+class NetworkPolicy:
+    def __init__(self, block_ads=True, block_trackers=True, block_fonts=False, block_media=False,
+                 block_images=False, essential_only=False, domain_blocklists=None, count_requests=True):
+        self.essential_only = essential_only
+        self.categories = [name for name, enabled in (("ads", block_ads), ("trackers", block_trackers),
+                                                      ("fonts", block_fonts), ("media", block_media),
+                                                      ("images", block_images)) if enabled]
+        if essential_only:
+            self.categories = list(ESSENTIAL_ONLY_CATEGORIES)
+        # {"youtube.com": ["*ytimg.com/an_webp*"], ...}: extra patterns only while on that site
+        self.domain_blocklists = domain_blocklists or {}
+        self.count_requests = count_requests
+        self.lock = threading.Lock()
+        self.applied = {}                   # id(driver) -> tuple of patterns currently set
+        self.stats = {"requests_blocked": 0, "bytes_saved": 0, "requests_loaded": 0, "bytes_loaded": 0,
+                      "blocked_by_category": {}}
+        self.bytes_by_type = {}             # resource type -> [total bytes, count] of loaded resources
+
+    @property
+    def block_images(self):
+        return "images" in self.categories
+
+    @property
+    def enabled(self):
+        return bool(self.categories or self.domain_blocklists)
+
+    def patterns_for(self, url=None):
+        """Patterns to block on the page at url: the global categories plus the site's own list"""
+        patterns = []
+        for category in self.categories:
+            patterns.extend(CATEGORY_PATTERNS[category])
+        host = site_of(url)
+        for domain, domain_patterns in self.domain_blocklists.items():
+            if host and host_matches(host, domain):
+                patterns.extend(domain_patterns)
+        return patterns
+
+    def apply(self, driver, url=None):
+        """
+        Set the blocked URL patterns for the page about to be loaded. Only calls
+        DevTools when the patterns differ from what is already set on the driver.
+        """
+        patterns = tuple(self.patterns_for(url))
+        with self.lock:
+            if self.applied.get(id(driver)) == patterns:
+                return True
+        try:
+            if id(driver) not in self.applied:
+                driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns)})
+        except Exception as e:
+            print(f"⚠️  Could not apply network policy: {e}")
+            return False
+        with self.lock:
+            self.applied[id(driver)] = patterns
+        return True
+
+    def forget(self, driver):
+        """Drop the state kept for a driver that was quit"""
+        with self.lock:
+            self.applied.pop(id(driver), None)
+
+    def categorize(self, url):
+        """The blocking category a URL falls in ("site" for per-domain patterns)"""
+        for category in self.categories:
+            if any(fnmatch.fnmatch(url, pattern) for pattern in CATEGORY_PATTERNS[category]):
+                return category
+        return "site"
+
+    def estimate_bytes(self, resource_type):
+        """Average transfer size of loaded resources of this type, or a typical size"""
+        total, count = self.bytes_by_type.get(resource_type, (0, 0))
+        if count:
+            return total // count
+        return TYPICAL_BYTES.get(resource_type, TYPICAL_BYTES["Other"])
+
+    def collect(self, driver):
+        """
+        Read the network events logged since the last call and add them to the
+        counters. Returns this call's counts: requests_blocked, bytes_saved,
+        requests_loaded, bytes_loaded.
+        """
+        counts = {"requests_blocked": 0, "bytes_saved": 0, "requests_loaded": 0, "bytes_loaded": 0}
+        if not self.count_requests:
+            return counts
+        try:
+            entries = driver.get_log("performance")
+        except Exception:
+            return counts
+
+        urls, types, blocked = {}, {}, []
+        with self.lock:
+            for entry in entries:
+                try:
+                    message = json.loads(entry["message"])["message"]
+                except (KeyError, TypeError, ValueError):
+                    continue
+                method, params = message.get("method"), message.get("params", {})
+                if method == "Network.requestWillBeSent":
+                    urls[params.get("requestId")] = params.get("request", {}).get("url", "")
+                    types[params.get("requestId")] = params.get("type", "Other")
+                elif method == "Network.responseReceived":
+                    types[params.get("requestId")] = params.get("type", "Other")
+                elif method == "Network.loadingFinished":
+                    size = int(params.get("encodedDataLength") or 0)
+                    resource_type = types.get(params.get("requestId"), "Other")
+                    totals = self.bytes_by_type.setdefault(resource_type, [0, 0])
+                    totals[0] += size
+                    totals[1] += 1
+                    counts["requests_loaded"] += 1
+                    counts["bytes_loaded"] += size
+                elif method == "Network.loadingFailed" and params.get("blockedReason"):
+                    blocked.append((urls.get(params.get("requestId"), ""), params.get("type", "Other")))
+
+            # Estimate after the whole batch so sizes loaded alongside the blocks count
+            for url, resource_type in blocked:
+                category = self.categorize(url)
+                by_category = self.stats["blocked_by_category"]
+                by_category[category] = by_category.get(category, 0) + 1
+                counts["requests_blocked"] += 1
+                counts["bytes_saved"] += self.estimate_bytes(resource_type)
+
+            for key, value in counts.items():
+                self.stats[key] += value
+        return counts
+
+    def get_stats(self):
+        """Session totals of blocked and loaded requests and bytes"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats["blocked_by_category"] = dict(self.stats["blocked_by_category"])
+        return stats
+
+
+def format_bytes(size):
+    """Human readable byte count"""
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
@@ -0,0 +1,121 @@
+"""
+Page change detection for Miki Miki
+
+Compares the page before and after a batch of actions: a perceptual hash per
+screenshot tile shows which region changed, and a fingerprint from one
+script call (URL, text, element count, form values, focus, scroll) catches
+changes the pixels miss. When nothing changed at all, the actions had no
+effect and the agent can re-plan at once instead of asking the model to
+analyse and verify an identical page.
+"""
+
+from response_cache import FINGERPRINT_SCRIPT, perceptual_hash
+
+# Screenshot grid (columns, rows) hashed tile by tile
+TILE_GRID = (8, 6)
+# Differing dHash bits above which a tile counts as changed (JPEG noise stays below)
+TILE_HASH_THRESHOLD = 3
+
+
+def tile_hashes(image, grid=TILE_GRID):
+    """Perceptual hash of every tile of a PIL image, row by row"""
+    columns, rows = grid
+    width, height = image.size
+    hashes = []
+    for row in range(rows):
+        for column in range(columns):
+            box = (column * width // columns, row * height // rows,
+                   (column + 1) * width // columns, (row + 1) * height // rows)
+            hashes.append(int(perceptual_hash(image.crop(box)), 16))
+    return hashes
+
+
+def region_name(columns, rows, tiles):
+    """Rough position of a set of tile indexes, e.g. "top left" or "middle" """
+    xs = [tile % columns for tile in tiles]
+    ys = [tile // columns for tile in tiles]
+    x = (min(xs) + max(xs) + 1) / 2 / columns
+    y = (min(ys) + max(ys) + 1) / 2 / rows
+    vertical = "top" if y < 1 / 3 else "bottom" if y > 2 / 3 else "middle"
+    horizontal = "left" if x < 1 / 3 else "right" if x > 2 / 3 else ""
+    return f"{vertical} {horizontal}".strip()
+
+
+class PageState:
+    """Fingerprint and screenshot tile hashes of the page at one moment"""
+
+    def __init__(self, fingerprint, tiles=None, size=None):
+        self.fingerprint = fingerprint or {}
+        self.tiles = tiles
+        self.size = size
+
+    @classmethod
+    def capture(cls, driver, screenshot=None):
+        """
+        Fingerprint the page with one script call (reusing the screenshot's
+        fingerprint when it has one) and hash the tiles of its screenshot
+        """
+        fingerprint = getattr(screenshot, "fingerprint", None) or driver.execute_script(FINGERPRINT_SCRIPT)
+        tiles = size = None
+        if screenshot is not None:
+            image = screenshot.image
+            tiles, size = tile_hashes(image), image.size
+        return cls(fingerprint, tiles, size)
+
+    def diff(self, after):
+        """PageDelta from this state to a later one"""
+        return PageDelta(self, after)
+
+
+class PageDelta:
+    """What changed between two PageStates"""
+
+    def __init__(self, before, after):
+        self.url_changed = before.fingerprint.get("url") != after.fingerprint.get("url")
+        self.dom_changes = [key for key in ("title", "elements", "text", "values", "focus", "scroll")
+                            if before.fingerprint.get(key) != after.fingerprint.get(key)]
+        # Tiles can only be compared at the same grid and image size
+        self.visual_known = before.tiles is not None and after.tiles is not None and before.size == after.size
+        self.changed_tiles = []
+        if self.visual_known:
+            self.changed_tiles = [i for i, (a, b) in enumerate(zip(before.tiles, after.tiles))
+                                  if bin(a ^ b).count("1") > TILE_HASH_THRESHOLD]
+        self.size = after.size
+
+    @property
+    def unchanged(self):
+        """True only when URL, DOM and every screenshot tile are the same"""
+        return self.visual_known and not (self.url_changed or self.dom_changes or self.changed_tiles)
+
+    @property
+    def region(self):
+        """Bounding box (x, y, width, height) of the changed tiles in screenshot pixels, or None"""
+        if not self.changed_tiles or not self.size:
+            return None
+        columns, rows = TILE_GRID
+        width, height = self.size
+        xs = [tile % columns for tile in self.changed_tiles]
+        ys = [tile // columns for tile in self.changed_tiles]
+        left, top = min(xs) * width // columns, min(ys) * height // rows
+        right, bottom = (max(xs) + 1) * width // columns, (max(ys) + 1) * height // rows
+        return left, top, right - left, bottom - top
+
+    def describe(self):
+        """One line summary, e.g. "URL changed; 12/48 tiles changed (top right)" """
+        if self.unchanged:
+            return "nothing changed (same URL, content and pixels)"
+        parts = []
+        if self.url_changed:
+            parts.append("URL changed")
+        if self.dom_changes:
+            parts.append("DOM changed (" + ", ".join(self.dom_changes) + ")")
+        if self.changed_tiles:
+            columns, rows = TILE_GRID
+            parts.append(f"{len(self.changed_tiles)}/{columns * rows} tiles changed "
+                         f"({region_name(columns, rows, self.changed_tiles)})")
+        elif not self.visual_known:
+            parts.append("screenshots not comparable")
+        return "; ".join(parts) or "no visible change"
+
+    def __repr__(self):
+        return f"PageDelta({self.describe()})"
@@ -0,0 +1,161 @@
+"""
+Bulk DOM snapshot for Miki Miki
+
+Reading a page used to cost one WebDriver call per node (is_displayed() and
+.text on every element). PageSnapshot collects everything the agent needs in
+a single execute_script call and stores it as compact arrays.
+"""
+
+SNAPSHOT_SCRIPT = r"""
+const maxTextBlocks = arguments[0];
+const maxElements = arguments[1];
+const maxTextLength = arguments[2];
+const withBodyText = arguments[3];
+
+const vw = window.innerWidth || document.documentElement.clientWidth;
+const vh = window.innerHeight || document.documentElement.clientHeight;
+const visibility = new Map();
+
+function isVisible(el) {
+    if (visibility.has(el)) return visibility.get(el);
+    let visible;
+    if (el.checkVisibility) {
+        visible = el.checkVisibility({checkOpacity: true, checkVisibilityCSS: true});
+    } else {
+        const style = window.getComputedStyle(el);
+        visible = style.display !== 'none' && style.visibility !== 'hidden' && el.getClientRects().length > 0;
+    }
+    if (visible) {
+        const rect = el.getBoundingClientRect();
+        visible = rect.width > 0 && rect.height > 0;
+    }
+    visibility.set(el, visible);
+    return visible;
+}
+
+function clip(text, length) {
+    text = (text || '').replace(/\s+/g, ' ').trim();
+    return text.length > length ? text.slice(0, length) : text;
+}
+
+function box(el) {
+    const r = el.getBoundingClientRect();
+    return [Math.round(r.left), Math.round(r.top), Math.round(r.width), Math.round(r.height)];
+}
+
+// Visible text blocks: text nodes grouped by their nearest block container
+const BLOCK = 'p, h1, h2, h3, h4, h5, h6, li, td, th, dt, dd, label, a, button, ' +
+    'figcaption, blockquote, pre, summary, caption, span, div, section, article';
+const blocks = [];
+const blockSeen = new Set();
+const walker = document.createTreeWalker(document.body || document.documentElement, NodeFilter.SHOW_TEXT, {
+    acceptNode(node) {
+        const parent = node.parentElement;
+        if (!parent || !node.nodeValue.trim()) return NodeFilter.FILTER_REJECT;
+        const tag = parent.tagName;
+        if (tag === 'SCRIPT' || tag === 'STYLE' || tag === 'NOSCRIPT' || tag === 'TEMPLATE') return NodeFilter.FILTER_REJECT;
+        return NodeFilter.FILTER_ACCEPT;
+    }
+});
+while (walker.nextNode() && (!maxTextBlocks || blocks.length < maxTextBlocks)) {
+    const container = walker.currentNode.parentElement.closest(BLOCK) || walker.currentNode.parentElement;
+    if (blockSeen.has(container)) continue;
+    blockSeen.add(container);
+    if (!isVisible(container)) continue;
+    const text = clip(container.innerText, maxTextLength);
+    if (text) blocks.push(text);
+}
+
+// Interactive elements: [tag, role, text, x, y, w, h, href]
+const INTERACTIVE = 'a[href], button, [role=button], [role=link], [role=tab], [role=menuitem], ' +
+    '[onclick], summary, input[type=submit], input[type=button]';
+const elements = [];
+for (const el of document.querySelectorAll(INTERACTIVE)) {
+    if (maxElements && elements.length >= maxElements) break;
+    if (!isVisible(el)) continue;
+    const label = el.innerText || el.getAttribute('aria-label') || el.getAttribute('title') || el.value || '';
+    elements.push([el.tagName.toLowerCase(), el.getAttribute('role') || '', clip(label, 80)]
+        .concat(box(el), [el.getAttribute('href') || '']));
+}
+
+// Form fields: [tag, type, name, label, value, x, y, w, h]
+const fields = [];
+for (const el of document.querySelectorAll('input:not([type=hidden]):not([type=submit]):not([type=button]), textarea, select, [contenteditable=true]')) {
+    if (maxElements && fields.length >= maxElements) break;
+    if (!isVisible(el)) continue;
+    let label = el.getAttribute('aria-label') || el.getAttribute('placeholder') || '';
+    if (!label && el.labels && el.labels.length) label = el.labels[0].innerText;
+    fields.push([el.tagName.toLowerCase(), (el.getAttribute('type') || '').toLowerCase(),
+        el.getAttribute('name') || el.id || '', clip(label, 80), clip(el.value || '', 80)].concat(box(el)));
+}
+
+return {
+    title: document.title,
+    url: location.href,
+    viewport: [vw, vh, window.scrollX, window.scrollY, document.documentElement.scrollHeight],
+    body_text: withBodyText ? (document.body || document.documentElement).innerText : '',
+    text_blocks: blocks,
+    elements: elements,
+    form_fields: fields
+};
+"""
+
+
+class PageSnapshot:
+    """A compact, single-round-trip view of the current page"""
+
+    # Column layouts of the compact arrays
+    ELEMENT_FIELDS = ("tag", "role", "text", "x", "y", "width", "height", "href")
+    FORM_FIELD_FIELDS = ("tag", "type", "name", "label", "value", "x", "y", "width", "height")
+
+    def __init__(self, title="", url="", viewport=None, text_blocks=None, elements=None, form_fields=None,
+                 body_text=""):
+        self.title = title
+        self.url = url
+        self.viewport = viewport or [0, 0, 0, 0, 0]
+        self.body_text = body_text  # full innerText of the body, only captured with body_text=True
+        self.text_blocks = text_blocks or []
+        self.elements = elements or []
+        self.form_fields = form_fields or []
+
+    @classmethod
+    def capture(cls, driver, max_text_blocks=200, max_elements=200, max_text_length=300, body_text=False):
+        """
+        Capture a snapshot with one execute_script call; a cap of 0 means unlimited.
+        text_blocks are capped and clipped for prompts; body_text=True also returns
+        the full, uncapped page text.
+        """
+        data = driver.execute_script(SNAPSHOT_SCRIPT, max_text_blocks, max_elements, max_text_length, body_text)
+        return cls(
+            title=data.get("title", ""),
+            url=data.get("url", ""),
+            viewport=data.get("viewport"),
+            text_blocks=data.get("text_blocks"),
+            elements=data.get("elements"),
+            form_fields=data.get("form_fields"),
+            body_text=data.get("body_text", ""),
+        )
+
+    def element_dicts(self):
+        """Interactive elements as dicts (expanded from the compact arrays)"""
+        return [dict(zip(self.ELEMENT_FIELDS, row)) for row in self.elements]
+
+    def form_field_dicts(self):
+        """Form fields as dicts (expanded from the compact arrays)"""
+        return [dict(zip(self.FORM_FIELD_FIELDS, row)) for row in self.form_fields]
+
+    def to_dict(self):
+        """Serializable representation of the snapshot"""
+        return {
+            "title": self.title,
+            "url": self.url,
+            "viewport": self.viewport,
+            "body_text": self.body_text,
+            "text_blocks": self.text_blocks,
+            "elements": self.elements,
+            "form_fields": self.form_fields,
+        }
+
+    def __repr__(self):
+        return (f"PageSnapshot(title={self.title!r}, text_blocks={len(self.text_blocks)}, "
+                f"elements={len(self.elements)}, form_fields={len(self.form_fields)})")
@@ -0,0 +1,185 @@
+"""
+Event-driven waits for Miki Miki
+
+The agent used to sleep for fixed delays (3s after navigating, 0.5s before
+each click, 1s between actions, 3s before verifying) whether or not the page
+was already ready. These waits return as soon as the page has settled:
+document loaded, no DOM mutations and no new network requests for a short
+quiet window, bounded by a maximum. Each wait logs the time it actually took
+next to the fixed delay it replaces.
+"""
+
+import re
+import threading
+import time
+
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+from tracing import tracer
+
+# Set to True to restore the old fixed delays (e.g. to compare timings)
+FIXED_DELAYS = False
+
+# Quiet window (ms) without DOM mutations or new resource loads that counts as settled
+QUIET_MS = 300
+
+# Resolves once the document is complete and neither the DOM (child nodes,
+# text) nor the resource timeline changed for quietMs, or when maxMs runs out.
+# Attribute changes are ignored so progress bars and animations don't keep
+# the page "busy" forever.
+SETTLE_SCRIPT = r"""
+const quietMs = arguments[0];
+const maxMs = arguments[1];
+const done = arguments[arguments.length - 1];
+const start = performance.now();
+let lastChange = start;
+let resources = performance.getEntriesByType('resource').length;
+
+const observer = new MutationObserver(() => { lastChange = performance.now(); });
+observer.observe(document.documentElement || document, {childList: true, subtree: true, characterData: true});
+
+function check() {
+    const now = performance.now();
+    const count = performance.getEntriesByType('resource').length;
+    if (count !== resources) { resources = count; lastChange = now; }
+    const ready = document.readyState === 'complete';
+    if (ready && now - lastChange >= quietMs) {
+        observer.disconnect();
+        done({settled: true, elapsed: now - start});
+    } else if (now - start >= maxMs) {
+        observer.disconnect();
+        done({settled: false, elapsed: now - start, readyState: document.readyState});
+    } else {
+        setTimeout(check, 50);
+    }
+}
+check();
+"""
+
+# Resolves once the element's bounding box is unchanged across two animation
+# frames (smooth scrolling, layout shifts), or when maxMs runs out.
+STABLE_SCRIPT = r"""
+const el = arguments[0];
+const maxMs = arguments[1];
+const done = arguments[arguments.length - 1];
+const start = performance.now();
+let last = null;
+function key() {
+    const r = el.getBoundingClientRect();
+    return [r.x, r.y, r.width, r.height].map(Math.round).join(',');
+}
+function check() {
+    if (!el.isConnected) { done({stable: false, detached: true}); return; }
+    const current = key();
+    if (current === last) { done({stable: true, elapsed: performance.now() - start}); return; }
+    last = current;
+    if (performance.now() - start >= maxMs) { done({stable: false, elapsed: performance.now() - start}); return; }
+    requestAnimationFrame(() => requestAnimationFrame(check));
+}
+check();
+"""
+
+wait_stats = {"waits": 0, "total_waited": 0.0, "total_old_delay": 0.0, "timeouts": 0}
+wait_stats_lock = threading.Lock()
+
+
+def record_wait(label, elapsed, old_delay, settled=True):
+    """
+    Log a finished wait next to the fixed delay it replaced and update the totals
+    """
+    with wait_stats_lock:
+        wait_stats["waits"] += 1
+        wait_stats["total_waited"] += elapsed
+        wait_stats["total_old_delay"] += old_delay or 0
+        if not settled:
+            wait_stats["timeouts"] += 1
+    name = "wait." + re.sub(r"\W+", "_", label.split(" (")[0]).strip("_")
+    tracer.record_span(name, time.time() - elapsed, elapsed, label=label, old_delay=old_delay, settled=settled)
+    status = "" if settled else " (max wait reached)"
+    print(f"⏱️  {label}: waited {elapsed:.2f}s instead of {old_delay:g}s{status}")
+
+
+def get_wait_stats():
+    """Totals of actual wait time versus the old fixed delays"""
+    with wait_stats_lock:
+        stats = dict(wait_stats)
+    stats["time_saved"] = stats["total_old_delay"] - stats["total_waited"]
+    return stats
+
+
+def wait_for_page_settle(driver, label="page settle", old_delay=0, max_wait=5.0, quiet_ms=None, _started=None):
+    """
+    Wait until the document is loaded and the DOM and network have been quiet
+    for quiet_ms, at most max_wait seconds. Returns True if the page settled.
+    """
+    if FIXED_DELAYS:
+        time.sleep(old_delay)
+        return True
+
+    started = time.time()
+    quiet_ms = QUIET_MS if quiet_ms is None else quiet_ms
+    settled = False
+    for _ in range(2):
+        remaining = max_wait - (time.time() - started)
+        if remaining <= 0:
+            break
+        try:
+            result = driver.execute_async_script(SETTLE_SCRIPT, quiet_ms, int(remaining * 1000))
+            settled = bool(result and result.get("settled"))
+            break
+        except Exception:
+            # The page navigated away mid-script: wait for the new document, then check again
+            try:
+                WebDriverWait(driver, max(0.1, max_wait - (time.time() - started))).until(
+                    lambda d: d.execute_script("return document.readyState") == "complete"
+                )
+            except Exception:
+                break
+
+    # Report from when the caller started waiting (e.g. including a navigation grace period)
+    record_wait(label, time.time() - (_started or started), old_delay, settled)
+    return settled
+
+
+def wait_for_element_stable(driver, element, label="element stable", old_delay=0, max_wait=1.0):
+    """
+    Wait until an element stops moving (e.g. after scrollIntoView), at most max_wait seconds
+    """
+    if FIXED_DELAYS:
+        time.sleep(old_delay)
+        return True
+
+    started = time.time()
+    try:
+        result = driver.execute_async_script(STABLE_SCRIPT, element, int(max_wait * 1000))
+        stable = bool(result and result.get("stable"))
+    except Exception:
+        stable = False
+    record_wait(label, time.time() - started, old_delay, stable)
+    return stable
+
+
+def wait_after_action(driver, url_before, label="after action", old_delay=0, max_wait=3.0,
+                      expect_navigation=False, navigation_grace=0.3):
+    """
+    Wait for the effects of an action. Clicks and key presses may start a
+    navigation slightly later, so for those the URL is given navigation_grace
+    seconds to change first; then the page must settle.
+    """
+    if FIXED_DELAYS:
+        time.sleep(old_delay)
+        return True
+
+    started = time.time()
+    url_changed = False
+    if expect_navigation:
+        try:
+            WebDriverWait(driver, navigation_grace, poll_frequency=0.1).until(EC.url_changes(url_before))
+            url_changed = True
+        except Exception:
+            pass
+    if url_changed:
+        label += " (navigated)"
+    remaining = max(0.5, max_wait - (time.time() - started))
+    return wait_for_page_settle(driver, label, old_delay, remaining, _started=started)
@@ -0,0 +1,147 @@
+"""
+Plan replay for Miki Miki
+
+When a sufficiently similar goal already succeeded from the same site, its
+recorded actions are replayed directly instead of asking Gemini to plan. Words
+that differ between the two goals (e.g. the search term) are substituted into
+the actions, and the outcome is verified cheaply against the recorded final
+URL, or by the deterministic goal checks when the URL cannot show it. Any
+divergence hands control back to normal model planning.
+"""
+
+import difflib
+import re
+from urllib.parse import parse_qs, quote_plus, urlsplit
+
+from goal_checks import NO, UNSURE, YES
+
+# Minimum Jaccard similarity between the new goal and a recorded goal
+REPLAY_MIN_SIMILARITY = 0.5
+
+# Recorded (executed) action names -> executable action types
+REPLAY_ACTION_TYPES = {
+    'navigate': 'ai_navigate',
+    'click': 'ai_click',
+    'type': 'ai_type',
+    'press': 'ai_press',
+    'scroll': 'ai_scroll',
+    'wait': 'ai_wait',
+    'hover': 'ai_hover',
+    'select': 'ai_select',
+}
+
+
+def goal_substitutions(recorded_goal, new_goal):
+    """
+    Word-level differences between two goals as (old phrase, new phrase) pairs.
+    Returns None when the goals differ by inserted or deleted words, which
+    cannot be mapped onto the recorded actions.
+    """
+    old_words = recorded_goal.lower().split()
+    new_words = new_goal.lower().split()
+    substitutions = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(a=old_words, b=new_words, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            continue
+        if tag != 'replace':
+            return None
+        substitutions.append((" ".join(old_words[i1:i2]), " ".join(new_words[j1:j2])))
+    return substitutions
+
+
+def apply_substitutions(text, substitutions):
+    """
+    Replace each old phrase (whole words, case-insensitive, also URL-encoded)
+    with its new phrase
+    """
+    for old, new in substitutions:
+        text = re.sub(word_pattern(old), lambda _: new, text, flags=re.IGNORECASE)
+        encoded_old, encoded_new = quote_plus(old), quote_plus(new)
+        if encoded_old != old:
+            text = re.sub(word_pattern(encoded_old), lambda _: encoded_new, text, flags=re.IGNORECASE)
+    return text
+
+
+def word_pattern(phrase):
+    """Regex matching phrase only as whole words ("cat" but not "location")"""
+    return r"(?<!\w)" + re.escape(phrase) + r"(?!\w)"
+
+
+def mentions(text, phrase):
+    """Whether text contains the phrase as whole words, plain or URL-encoded"""
+    return any(re.search(word_pattern(p), text, flags=re.IGNORECASE) for p in (phrase, quote_plus(phrase)))
+
+
+def build_replay_plan(attempt, user_goal):
+    """
+    Turn a recorded successful attempt into executable actions for user_goal.
+    Returns (actions, expected_url, substitutions), or None if the attempt
+    cannot be adapted (unknown actions, or goal differences that do not appear
+    in any recorded action).
+    """
+    recorded_actions = [tuple(a) for a in attempt.get("actions") or []]
+    if not recorded_actions or any(a[0] not in REPLAY_ACTION_TYPES for a in recorded_actions):
+        return None
+
+    substitutions = goal_substitutions(attempt["goal"], user_goal)
+    if substitutions is None:
+        return None
+    # Every changed word must show up in the actions, otherwise the difference
+    # matters in a way replay cannot reproduce
+    for old, _ in substitutions:
+        if not any(mentions(description, old) for _, description in recorded_actions):
+            return None
+
+    actions = [(REPLAY_ACTION_TYPES[action], apply_substitutions(description, substitutions))
+               for action, description in recorded_actions]
+    # Recorded waits look like "2s"; the executor expects "2 seconds"
+    actions = [(a, re.sub(r"^(\d+)s$", r"\1 seconds", d)) if a == 'ai_wait' else (a, d) for a, d in actions]
+    expected_url = apply_substitutions(attempt.get("final_url") or "", substitutions)
+    return actions, expected_url, substitutions
+
+
+def find_replay_plan(ai_learner, user_goal, website):
+    """
+    Best replayable plan from similar successful goals that started on the
+    same website (where the new goal starts now), as (attempt, actions,
+    expected_url, substitutions) or None
+    """
+    if not website or website == 'unknown':
+        return None
+    for attempt in ai_learner.find_similar_attempts(user_goal, success=True, start_website=website,
+                                                   ranking='jaccard', top_k=5):
+        old_words, new_words = set(attempt["goal"].lower().split()), set(user_goal.lower().split())
+        if len(old_words & new_words) / len(old_words | new_words) < REPLAY_MIN_SIMILARITY:
+            break  # Ranked by similarity, the rest are even less similar
+        plan = build_replay_plan(attempt, user_goal)
+        if plan is not None:
+            return (attempt,) + plan
+    return None
+
+
+def check_replay_outcome(recorded_url, expected_url, actual_url, substitutions):
+    """
+    Cheap verification of a replay without a model call, as (verdict, reason).
+    NO unless the page has the recorded final page's host and path and every
+    substituted query parameter (e.g. q=<new search term>) has its expected
+    value. YES only when the URL shows the whole outcome: a substituted
+    parameter was checked, or nothing was substituted and the URL is the
+    recorded one. Otherwise (e.g. /watch?v=... after replaying "cats" as
+    "dogs") UNSURE, and the outcome needs another check.
+    """
+    if not expected_url or not actual_url:
+        return NO, "no URL to compare"
+    expected, actual, recorded = urlsplit(expected_url), urlsplit(actual_url), urlsplit(recorded_url or "")
+    if (expected.netloc, expected.path.rstrip('/')) != (actual.netloc, actual.path.rstrip('/')):
+        return NO, f"expected {expected.netloc}{expected.path}, on {actual.netloc}{actual.path}"
+    expected_query, actual_query, recorded_query = (parse_qs(expected.query), parse_qs(actual.query),
+                                                    parse_qs(recorded.query))
+    substituted = {key: value for key, value in expected_query.items() if recorded_query.get(key) != value}
+    for key, value in substituted.items():
+        if actual_query.get(key) != value:
+            return NO, f"expected {key}={' '.join(value)} in the URL"
+    if substituted:
+        return YES, "substituted " + ", ".join(f"{key}={' '.join(value)}" for key, value in substituted.items())
+    if not substitutions and actual_query == expected_query:
+        return YES, "reached the recorded final page"
+    return UNSURE, "the URL does not show the substituted words"
@@ -0,0 +1,121 @@
+"""
+Prompt templates for Miki Miki
+
+The big prompts used to be f-strings that interleaved the goal, URL and
+history with several KB of fixed instructions, so no two requests shared a
+prefix. A PromptTemplate keeps the instructions as a static prefix that is
+byte-identical on every call (and can be served from the provider's context
+cache), appends the dynamic fields last, estimates tokens locally and holds
+each call to a hard budget by trimming history, suggestions and long text.
+"""
+
+import textwrap
+
+from gemini_client import CacheablePrefix
+from model_router import CHARS_PER_TOKEN
+
+
+def estimate_tokens(text):
+    """Approximate token count of a piece of prompt text"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class PromptField:
+    """
+    One dynamic field, rendered as "LABEL: value" (lists as one "- item" line
+    each). Required fields are never trimmed; list fields lose items from the
+    front (keep="last", e.g. history keeps the newest) or the back, text
+    fields are clipped.
+    """
+
+    def __init__(self, name, label, required=False, keep="last", min_items=0):
+        self.name = name
+        self.label = label
+        self.required = required
+        self.keep = keep
+        self.min_items = min_items
+
+    def render(self, value):
+        if value is None or value == "" or value == []:
+            return ""
+        if isinstance(value, (list, tuple)):
+            return f"{self.label}:\n" + "\n".join(f"- {item}" for item in value)
+        return f"{self.label}: {value}"
+
+
+class CompiledPrompt:
+    """A prompt ready to send: the shared prefix and this call's dynamic part"""
+
+    def __init__(self, name, prefix, dynamic, tokens, truncated=None):
+        self.name = name
+        self.prefix = prefix
+        self.dynamic = dynamic
+        self.tokens = tokens
+        self.truncated = truncated or []
+
+    def parts(self):
+        """Request parts, the cacheable prefix first"""
+        return [self.prefix, self.dynamic]
+
+    @property
+    def text(self):
+        return f"{self.prefix}\n\n{self.dynamic}"
+
+    def __repr__(self):
+        return f"CompiledPrompt({self.name}, ~{self.tokens} tokens, truncated={self.truncated})"
+
+
+class PromptTemplate:
+    """
+    Static instructions plus dynamic fields. trim_order lists the fields to
+    shorten, first to last, when a call goes over its token budget.
+    """
+
+    def __init__(self, name, prefix, fields, trim_order=None, budget=None):
+        self.name = name
+        text = textwrap.dedent(prefix).strip()
+        self.prefix = CacheablePrefix(text, estimate_tokens(text))
+        self.fields = fields
+        self.trim_order = trim_order or [field.name for field in fields if not field.required]
+        self.budget = budget
+
+    def compile(self, budget=None, **values):
+        """
+        Render the dynamic fields after the prefix, trimming optional fields
+        until the estimated total fits budget tokens (images not included)
+        """
+        budget = budget or self.budget
+        fields = {field.name: field for field in self.fields}
+        unknown = set(values) - set(fields)
+        if unknown:
+            raise ValueError(f"{self.name} prompt has no fields {sorted(unknown)}")
+        values = {name: list(value) if isinstance(value, (list, tuple)) else value for name, value in values.items()}
+        truncated = []
+
+        def total():
+            return self.prefix.tokens + estimate_tokens(self.render(values))
+
+        if budget:
+            for name in self.trim_order:
+                field = fields[name]
+                value = values.get(name)
+                if total() <= budget:
+                    break
+                if isinstance(value, list):
+                    while len(value) > field.min_items and total() > budget:
+                        value.pop(0 if field.keep == "last" else -1)
+                    truncated.append(name)
+                elif value:
+                    excess = (total() - budget) * CHARS_PER_TOKEN
+                    keep = max(0, len(value) - excess - 1)
+                    values[name] = value[:keep] + "…" if keep else ""
+                    truncated.append(name)
+            if total() > budget:
+                print(f"⚠️  {self.name} prompt is ~{total()} tokens, over its budget of {budget} after trimming")
+
+        return CompiledPrompt(self.name, self.prefix, self.render(values), total(), truncated)
+
+    def render(self, values):
+        """The dynamic part: every field with a value, in template order"""
+        rendered = (field.render(values.get(field.name)) for field in self.fields)
+        return "\n\n".join(text for text in rendered if text)
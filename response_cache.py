@@ -0,0 +1,153 @@
+"""
+Screenshot-keyed response cache for Gemini calls
+
+Model calls are often repeated on a visually identical page (for example
+after a click that changed nothing). Responses are cached under a key made
+of a perceptual hash of the screenshot, the page's URL and DOM fingerprint
+and the prompt inputs, in an in-memory LRU tier with an optional SQLite tier
+on disk, both with a TTL. The fingerprint matters because typed text,
+toggles and small badges barely change the perceptual hash.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Page fingerprint from one script call: URL, title, element count, hashes of the
+# text and form values, focused element and scroll position
+FINGERPRINT_SCRIPT = r"""
+function hash(text) {
+    let h = 5381;
+    for (let i = 0; i < text.length; i++) h = ((h << 5) + h + text.charCodeAt(i)) | 0;
+    return (h >>> 0).toString(16);
+}
+const body = document.body || document.documentElement;
+const values = [];
+for (const el of document.querySelectorAll('input, textarea, select')) {
+    if (values.length >= 200) break;
+    values.push(el.type === 'checkbox' || el.type === 'radio' ? String(el.checked) : (el.value || ''));
+}
+const active = document.activeElement;
+const focus = active && active !== body ?
+    active.tagName + '#' + (active.id || active.getAttribute('name') || active.getAttribute('aria-label') || '') : '';
+return {
+    url: location.href,
+    title: document.title,
+    elements: body.getElementsByTagName('*').length,
+    text: hash(body.innerText || ''),
+    values: hash(values.join('\u0001')),
+    focus: focus,
+    scroll: [Math.round(window.scrollX), Math.round(window.scrollY)],
+};
+"""
+
+
+def perceptual_hash(image, hash_size=8):
+    """
+    Difference hash (dHash) of a PIL image as a hex string. Visually identical
+    screenshots hash the same even if their encoded bytes differ slightly.
+    """
+    small = image.convert("L").resize((hash_size + 1, hash_size))
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+
+class ResponseCache:
+    def __init__(self, max_entries=256, ttl_seconds=600, db_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.memory = OrderedDict()  # key -> (stored_at, value)
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "stores": 0}
+        self.db = None
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self.db.execute("DELETE FROM responses WHERE stored_at < ?", (time.time() - ttl_seconds,))
+            self.db.commit()
+
+    def make_key(self, call_type, image, *parts, page=None):
+        """
+        Build a cache key from the call type, screenshot hash, page fingerprint
+        (the result of FINGERPRINT_SCRIPT) and prompt inputs
+        """
+        inputs = [json.dumps(page, sort_keys=True) if page else ""] + [str(p) for p in parts]
+        digest = hashlib.sha256(json.dumps(inputs).encode()).hexdigest()[:16]
+        return f"{call_type}:{perceptual_hash(image)}:{digest}"
+
+    def get(self, key):
+        """Return the cached value for a key, or None on miss/expiry"""
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self.memory.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self.memory[key]
+
+            if self.db is not None:
+                row = self.db.execute("SELECT value, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row and now - row[1] <= self.ttl_seconds:
+                    value = json.loads(row[0])
+                    self._store_memory(key, value, row[1])
+                    self.stats["hits"] += 1
+                    self.stats["disk_hits"] += 1
+                    return value
+
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        """Store a JSON-serializable value under a key"""
+        now = time.time()
+        with self.lock:
+            self._store_memory(key, value, now)
+            self.stats["stores"] += 1
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, stored_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), now),
+                )
+                self.db.commit()
+
+    def _store_memory(self, key, value, stored_at):
+        """Insert into the LRU tier, evicting the least recently used entries"""
+        self.memory[key] = (stored_at, value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        """Drop all cached responses"""
+        with self.lock:
+            self.memory.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM responses")
+                self.db.commit()
+
+    def get_stats(self):
+        """Hit/miss statistics; every hit is a model call saved"""
+        with self.lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0
+        stats["model_calls_saved"] = stats["hits"]
+        stats["entries"] = len(self.memory)
+        return stats
@@ -0,0 +1,155 @@
+"""
+In-memory screenshot pipeline for Miki Miki
+
+Screenshots used to be written to disk as full-resolution PNGs and read back
+and decoded by every Gemini helper. capture() keeps the image in memory,
+lets Chrome encode it directly as a downscaled JPEG/WebP through CDP
+(falling back to get_screenshot_as_png + Pillow), and only writes a file
+when a debug path is given.
+"""
+
+import base64
+import io
+import os
+
+from PIL import Image
+
+MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+
+
+class Screenshot:
+    """An encoded screenshot held in memory, ready to send to the model"""
+
+    def __init__(self, data, mime_type, size=None, original_size=None, path=None):
+        self.data = data
+        self.mime_type = mime_type
+        self.size = size
+        self.original_size = original_size
+        self.path = path
+        self._image = None
+        # PageProfile of the page it shows, for model routing (set by the caller)
+        self.profile = None
+        # URL and DOM fingerprint of the page it shows (response_cache.FINGERPRINT_SCRIPT),
+        # so cached responses are not reused after changes the pixels barely show
+        self.fingerprint = None
+
+    @property
+    def image(self):
+        """Decoded PIL image (decoded lazily, only when something needs pixels)"""
+        if self._image is None:
+            self._image = Image.open(io.BytesIO(self.data))
+            self._image.load()
+            self.size = self._image.size
+        return self._image
+
+    def part(self):
+        """Inline image part for a Gemini request, sent without re-encoding"""
+        return {"mime_type": self.mime_type, "data": self.data}
+
+    def thumbnail(self, max_width, quality=60):
+        """A smaller JPEG copy (e.g. to accompany a text view of the page)"""
+        image = self.image
+        if image.width <= max_width:
+            return self
+        image = image.resize((max_width, int(image.height * max_width / image.width)), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, format="JPEG", quality=quality)
+        shot = Screenshot(buffer.getvalue(), MIME_TYPES["jpeg"], size=image.size, original_size=self.original_size)
+        shot._image = image
+        return shot
+
+    def save(self, path):
+        """Write the encoded bytes to disk (debug mode)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(self.data)
+        self.path = path
+        return path
+
+    def __repr__(self):
+        return f"Screenshot({self.mime_type}, {len(self.data)} bytes, size={self.size})"
+
+
+def load_screenshot(screenshot):
+    """
+    Accept a Screenshot or a path to an image file and return a Screenshot
+    """
+    if screenshot is None or isinstance(screenshot, Screenshot):
+        return screenshot
+    with open(screenshot, 'rb') as f:
+        data = f.read()
+    extension = os.path.splitext(screenshot)[1].lower().lstrip('.')
+    mime_type = MIME_TYPES.get("jpeg" if extension == "jpg" else extension, "image/png")
+    return Screenshot(data, mime_type, path=screenshot)
+
+
+def capture_with_cdp(driver, max_width, image_format, quality, crop_to_viewport):
+    """Let Chrome scale and encode the screenshot itself (one CDP round trip per command)"""
+    params = {"format": image_format, "captureBeyondViewport": not crop_to_viewport}
+    if image_format != "png":
+        params["quality"] = quality
+
+    metrics = driver.execute_cdp_cmd("Page.getLayoutMetrics", {})
+    css_viewport = metrics.get("cssVisualViewport") or {}
+    device_viewport = metrics.get("visualViewport") or {}
+    viewport = css_viewport or device_viewport
+    width = viewport.get("clientWidth")
+    height = viewport.get("clientHeight")
+    # Chrome captures device pixels; next to cssVisualViewport, visualViewport is in device pixels
+    device_pixel_ratio = 1.0
+    if css_viewport.get("clientWidth") and device_viewport.get("clientWidth"):
+        device_pixel_ratio = device_viewport["clientWidth"] / css_viewport["clientWidth"]
+    original_size = None
+    if width and height:
+        original_size = (round(width * device_pixel_ratio), round(height * device_pixel_ratio))
+        scale = min(1.0, max_width / original_size[0]) if max_width else 1.0
+        params["clip"] = {"x": viewport.get("pageX", 0), "y": viewport.get("pageY", 0),
+                          "width": width, "height": height, "scale": scale}
+
+    result = driver.execute_cdp_cmd("Page.captureScreenshot", params)
+    data = base64.b64decode(result["data"])
+    # Image.open only parses the header, so this reads the encoded size without decoding pixels
+    size = Image.open(io.BytesIO(data)).size
+    return Screenshot(data, MIME_TYPES[image_format], size=size, original_size=original_size)
+
+
+def capture_with_png(driver, max_width, image_format, quality):
+    """Fallback for drivers without CDP: decode the PNG, downscale and re-encode"""
+    image = Image.open(io.BytesIO(driver.get_screenshot_as_png()))
+    original_size = image.size
+    if max_width and image.width > max_width:
+        image = image.resize((max_width, int(image.height * max_width / image.width)), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    if image_format == "png":
+        image.save(buffer, format="PNG", optimize=True)
+    else:
+        image.convert("RGB").save(buffer, format=image_format.upper(), quality=quality)
+    shot = Screenshot(buffer.getvalue(), MIME_TYPES[image_format], size=image.size, original_size=original_size)
+    shot._image = image
+    return shot
+
+
+def capture(driver, max_width=1280, image_format="jpeg", quality=70, crop_to_viewport=True, debug_path=None):
+    """
+    Capture the current page as an in-memory Screenshot.
+    max_width caps the image width in pixels (the extra device pixels of
+    HiDPI screens are not needed by the vision model); image_format is
+    'jpeg', 'webp' or 'png'. The image is written to disk only when
+    debug_path is set.
+    """
+    image_format = image_format.lower()
+    shot = None
+    if hasattr(driver, "execute_cdp_cmd"):
+        try:
+            shot = capture_with_cdp(driver, max_width, image_format, quality, crop_to_viewport)
+        except Exception:
+            shot = None
+    if shot is None:
+        shot = capture_with_png(driver, max_width, image_format, quality)
+
+    if debug_path:
+        shot.save(debug_path)
+    return shot
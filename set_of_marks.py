@@ -0,0 +1,146 @@
+"""
+Set-of-marks screenshots for Miki Miki
+
+Outlines every visible interactive element of the viewport with a numbered
+box on the screenshot the model sees, and keeps the WebElement handles
+returned by the same script. The model answers with targets like "#17" and
+execution clicks the stored handle directly, with no search of the page.
+"""
+
+import io
+
+from PIL import ImageDraw, ImageFont
+
+from screenshot_pipeline import MIME_TYPES, Screenshot
+
+MARKS_SCRIPT = r"""
+const maxMarks = arguments[0];
+const vw = window.innerWidth || document.documentElement.clientWidth;
+const vh = window.innerHeight || document.documentElement.clientHeight;
+
+const SELECTOR = 'a[href], button, input:not([type=hidden]), textarea, select, summary, ' +
+    '[role=button], [role=link], [role=tab], [role=menuitem], [role=option], ' +
+    '[role=checkbox], [role=radio], [role=textbox], [role=searchbox], [role=combobox], ' +
+    '[onclick], [contenteditable=""], [contenteditable=true]';
+
+function clip(text, length) {
+    text = (text || '').replace(/\s+/g, ' ').trim();
+    return text.length > length ? text.slice(0, length) : text;
+}
+
+const marks = [];
+const marked = [];
+for (const el of document.querySelectorAll(SELECTOR)) {
+    if (marks.length >= maxMarks) break;
+    if (el.disabled) continue;
+    const r = el.getBoundingClientRect();
+    if (r.width < 4 || r.height < 4) continue;
+    if (r.bottom <= 0 || r.right <= 0 || r.top >= vh || r.left >= vw) continue;
+    const style = window.getComputedStyle(el);
+    if (style.visibility === 'hidden' || style.display === 'none' || parseFloat(style.opacity) === 0) continue;
+    // Skip elements covered by an overlay: the centre must hit the element or its subtree
+    const cx = Math.min(Math.max(r.left + r.width / 2, 0), vw - 1);
+    const cy = Math.min(Math.max(r.top + r.height / 2, 0), vh - 1);
+    const hit = document.elementFromPoint(cx, cy);
+    if (hit && hit !== el && !el.contains(hit) && !hit.contains(el)) continue;
+    // A link wrapping a button (or the reverse) is one target
+    const outer = marked.find(m => m.contains(el) || el.contains(m));
+    if (outer) {
+        const o = outer.getBoundingClientRect();
+        if (Math.abs(o.width - r.width) < 8 && Math.abs(o.height - r.height) < 8) continue;
+    }
+    marked.push(el);
+    const label = el.getAttribute('aria-label') || el.innerText || el.getAttribute('title') ||
+        el.getAttribute('placeholder') || el.getAttribute('alt') || el.value || '';
+    marks.push([el, Math.round(r.left), Math.round(r.top), Math.round(r.width), Math.round(r.height),
+        el.tagName.toLowerCase(), clip(label, 60)]);
+}
+return {viewport: [vw, vh], marks: marks};
+"""
+
+# Box colours, cycled so neighbouring marks are easy to tell apart
+MARK_COLORS = ["#e6194b", "#3cb44b", "#4363d8", "#f58231", "#911eb4", "#008080", "#9a6324", "#800000"]
+
+TAG_NAMES = {"a": "link", "input": "field", "textarea": "field", "select": "dropdown"}
+
+
+class Mark:
+    """One numbered element: its WebElement handle and viewport box"""
+
+    def __init__(self, mark_id, element, box, tag="", text=""):
+        self.mark_id = mark_id
+        self.element = element
+        self.box = box
+        self.tag = tag
+        self.text = text
+
+    @property
+    def label(self):
+        """Free-text description of the element (for logs, learning and fallback resolution)"""
+        kind = TAG_NAMES.get(self.tag, self.tag)
+        return f"{self.text} {kind}".strip() if self.text else kind
+
+    def resolve(self, driver):
+        """The stored handle; staleness shows up when it is used"""
+        return self.element
+
+
+class PageMarks:
+    """Numbered interactive elements of the viewport"""
+
+    def __init__(self, viewport=None, marks=None):
+        self.viewport = viewport or [0, 0]
+        self.marks = marks or {}            # mark_id -> Mark
+
+    @classmethod
+    def capture(cls, driver, max_marks=80):
+        """Find, number and keep handles to the visible interactive elements with one execute_script call"""
+        data = driver.execute_script(MARKS_SCRIPT, max_marks)
+        marks = {}
+        for element, x, y, width, height, tag, text in data.get("marks", []):
+            mark = Mark(len(marks) + 1, element, (x, y, width, height), tag, text)
+            marks[mark.mark_id] = mark
+        return cls(viewport=data.get("viewport"), marks=marks)
+
+    def annotate(self, screenshot, quality=80):
+        """Draw the numbered boxes onto a copy of the screenshot"""
+        image = screenshot.image.convert("RGB")
+        scale = image.width / self.viewport[0] if self.viewport[0] else 1.0
+        draw = ImageDraw.Draw(image)
+        try:
+            font = ImageFont.load_default(size=max(10, int(14 * scale)))
+        except TypeError:
+            font = ImageFont.load_default()
+        for mark in self.marks.values():
+            color = MARK_COLORS[mark.mark_id % len(MARK_COLORS)]
+            x, y, width, height = (int(v * scale) for v in mark.box)
+            draw.rectangle([x, y, x + width, y + height], outline=color, width=2)
+            text = str(mark.mark_id)
+            left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+            tag_x, tag_y = max(0, x), max(0, y - (bottom - top) - 4)
+            draw.rectangle([tag_x, tag_y, tag_x + right - left + 4, tag_y + bottom - top + 4], fill=color)
+            draw.text((tag_x + 2 - left, tag_y + 2 - top), text, fill="white", font=font)
+
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality)
+        shot = Screenshot(buffer.getvalue(), MIME_TYPES["jpeg"], size=image.size,
+                          original_size=screenshot.original_size)
+        shot._image = image
+        shot.profile = screenshot.profile
+        shot.fingerprint = screenshot.fingerprint
+        return shot
+
+    @property
+    def legend(self):
+        """Short text list of the marks, one per line, to back up the image"""
+        return "\n".join(f"[{mark.mark_id}] {mark.label}" for mark in self.marks.values())
+
+    def node(self, target):
+        """The mark referenced by a target like "#17", or None"""
+        target = str(target).strip()
+        if not target.startswith("#") or not target[1:].isdigit():
+            return None
+        return self.marks.get(int(target[1:]))
+
+    def __repr__(self):
+        return f"PageMarks({len(self.marks)} marks)"
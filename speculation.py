@@ -0,0 +1,84 @@
+"""
+Speculative step pipelining for Miki Miki
+
+The step loop used to be strictly serial: finish the actions, wait for the
+page to settle, capture it, then wait for the model. A Speculation captures
+the page as soon as the actions are done and sends the next step request
+from a worker thread, so the model works while the page finishes settling.
+Once it has settled, the page is compared with the speculative capture: if
+nothing changed the answer is used, otherwise it is discarded and the step
+is asked again on the settled page.
+"""
+
+import threading
+import time
+
+speculation_stats = {"started": 0, "used": 0, "discarded": 0, "failed": 0, "time_overlapped": 0.0}
+speculation_stats_lock = threading.Lock()
+
+
+def record_speculation(key, amount=1):
+    with speculation_stats_lock:
+        speculation_stats[key] += amount
+
+
+def get_speculation_stats():
+    """Speculative requests started, used, discarded and the model time they overlapped"""
+    with speculation_stats_lock:
+        return dict(speculation_stats)
+
+
+class Speculation:
+    """
+    A model request started on a page that may still change. state is the
+    PageState the request was made from; screenshot and element_ids are what
+    the model was shown.
+    """
+
+    def __init__(self, pool, state, screenshot, element_ids, func, *args, **kwargs):
+        self.state = state
+        self.screenshot = screenshot
+        self.element_ids = element_ids
+        self.future = pool.submit(self._run, func, args, kwargs)
+        self.finished = False
+        record_speculation("started")
+
+    @staticmethod
+    def _run(func, args, kwargs):
+        started = time.perf_counter()
+        return func(*args, **kwargs), time.perf_counter() - started
+
+    def matches(self, state):
+        """Whether the page at state (fingerprint and screenshot tiles) is still the one speculated on"""
+        if self.state is None or state is None:
+            return False
+        return self.state.diff(state).unchanged
+
+    def result(self):
+        """
+        The speculative answer, waiting for it if necessary, or None if the
+        request failed. Returns (value, seconds of model time that overlapped
+        with settling).
+        """
+        self.finished = True
+        waiting = time.perf_counter()
+        try:
+            value, elapsed = self.future.result()
+        except Exception as e:
+            print(f"⚠️  Speculative step failed: {e}")
+            value = None
+        if value is None:
+            record_speculation("failed")
+            return None, 0.0
+        overlapped = max(0.0, elapsed - (time.perf_counter() - waiting))
+        record_speculation("used")
+        record_speculation("time_overlapped", overlapped)
+        return value, overlapped
+
+    def discard(self):
+        """Drop the answer; a request that has not started yet is cancelled"""
+        if self.finished:
+            return
+        self.finished = True
+        self.future.cancel()
+        record_speculation("discarded")
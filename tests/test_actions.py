@@ -0,0 +1,139 @@
+import json
+
+import pytest
+
+from actions import Action, ActionParseError, ActionStream, parse_plan, parse_step
+
+STEP_RESPONSE = {
+    "page_summary": "YouTube search results for cats",
+    "task_completed": False,
+    "completion_reason": "no video is playing yet",
+    "thought": "open the first result",
+    "actions": [
+        {"type": "CLICK", "target": "first video thumbnail"},
+        {"type": "TYPE", "target": "say \"hi\" {with braces}"},
+        {"type": "NAVIGATE", "target": "https://www.youtube.com/watch?v=abc"},
+    ],
+}
+
+
+def test_parse_plan_json():
+    plan = parse_plan(json.dumps({"thought": "search", "actions": [
+        {"type": "click", "target": "search box"},
+        {"type": "TYPE", "target": "python tutorials"},
+        {"type": "PRESS", "target": "ENTER"},
+    ]}))
+    assert plan["thought"] == "search"
+    assert plan["actions"] == [("ai_click", "search box"), ("ai_type", "python tutorials"), ("ai_press", "ENTER")]
+
+
+def test_parse_plan_json_in_code_fence_with_trailing_comma():
+    plan = parse_plan('Here you go:\n```json\n{"thought": "t", "actions": [{"type": "WAIT", "target": ""},]}\n```')
+    assert plan["actions"] == [("ai_wait", "2 seconds")]
+
+
+def test_parse_plan_legacy_lines():
+    plan = parse_plan("THOUGHT: go to youtube\n"
+                      "ACTION_1: NAVIGATE:youtube.com\n"
+                      "ACTION_2: SCROLL:scroll down a bit\n")
+    assert plan["thought"] == "go to youtube"
+    assert plan["actions"] == [("ai_navigate", "https://youtube.com"), ("ai_scroll", "down")]
+
+
+def test_parse_plan_legacy_url_target_keeps_colons():
+    plan = parse_plan("ACTION_1: NAVIGATE:https://www.google.com:443/search?q=a:b")
+    assert plan["actions"] == [("ai_navigate", "https://www.google.com:443/search?q=a:b")]
+
+
+def test_parse_plan_json_url_target_keeps_colons():
+    plan = parse_plan('{"thought": "", "actions": [{"type": "NAVIGATE", "target": "http://localhost:8000/a"}]}')
+    assert plan["actions"] == [("ai_navigate", "http://localhost:8000/a")]
+
+
+def test_parse_plan_partial_errors_keep_valid_actions():
+    with pytest.raises(ActionParseError) as info:
+        parse_plan(json.dumps({"thought": "t", "actions": [
+            {"type": "CLICK", "target": "ok button"},
+            {"type": "JUMP", "target": "somewhere"},
+            {"type": "NAVIGATE", "target": "not a url"},
+            {"type": "CLICK", "target": ""},
+        ]}))
+    error = info.value
+    assert "action 2" in str(error) and "action 3" in str(error) and "action 4" in str(error)
+    assert error.partial["actions"] == [("ai_click", "ok button")]
+
+
+def test_parse_plan_legacy_partial_errors():
+    with pytest.raises(ActionParseError) as info:
+        parse_plan("ACTION_1: CLICK:Sign in\nACTION_2: FLY:away\nACTION_3 nonsense")
+    assert info.value.partial["actions"] == [("ai_click", "Sign in")]
+
+
+def test_parse_plan_without_actions_raises():
+    with pytest.raises(ActionParseError):
+        parse_plan("I am not sure what to do here.")
+
+
+def test_parse_step():
+    step = parse_step(json.dumps(STEP_RESPONSE))
+    assert step["task_completed"] is False
+    assert step["completion_reason"] == "no video is playing yet"
+    assert [a.name for a in step["actions"]] == ["CLICK", "TYPE", "NAVIGATE"]
+
+
+@pytest.mark.parametrize("change, message", [
+    ({"task_completed": "no"}, "true or false"),
+    ({"actions": "click it"}, "must be a list"),
+])
+def test_parse_step_invalid_fields(change, message):
+    with pytest.raises(ActionParseError, match=message):
+        parse_step(json.dumps(dict(STEP_RESPONSE, **change)))
+
+
+def test_parse_step_missing_key():
+    response = dict(STEP_RESPONSE)
+    del response["task_completed"]
+    with pytest.raises(ActionParseError, match="task_completed"):
+        parse_step(json.dumps(response))
+
+
+def test_action_behaves_like_tuple():
+    action = Action.create("click", " Sign in ")
+    action_type, target = action
+    assert (action_type, target) == ("ai_click", "Sign in")
+    assert action == ("ai_click", "Sign in") and action[1] == "Sign in" and len(action) == 2
+    assert action.to_dict() == {"type": "CLICK", "target": "Sign in"}
+
+
+def test_action_stream_one_character_chunks():
+    text = json.dumps(STEP_RESPONSE, indent=2)
+    stream = ActionStream()
+    completed_at = []
+    for index, char in enumerate(text):
+        for action in stream.feed(char):
+            completed_at.append((index, action))
+    assert [action for _, action in completed_at] == parse_step(text)["actions"]
+    # Each action is handed out as soon as its object closes, before the response ends
+    assert all(text[index] == "}" for index, _ in completed_at)
+    assert completed_at[-1][0] < len(text) - 1
+    assert stream.errors == []
+    assert stream.field("task_completed") is False
+    assert stream.partial_result()["completion_reason"] == "no video is playing yet"
+
+
+def test_action_stream_collects_invalid_actions():
+    stream = ActionStream()
+    text = '{"actions": [{"type": "CLICK", "target": "a"}, {"type": "FLY", "target": "b"}], "thought": "x"}'
+    actions = [action for char in text for action in stream.feed(char)]
+    assert actions == [("ai_click", "a")]
+    assert stream.errors == ["action 2: unknown action type 'FLY'"]
+    assert stream.done
+
+
+def test_action_stream_cut_off_response():
+    stream = ActionStream()
+    stream.feed('{"thought": "go", "actions": [{"type": "PRESS", "target": "ENTER"}, {"type": "CLI')
+    result = stream.partial_result()
+    assert result["thought"] == "go"
+    assert result["actions"] == [("ai_press", "ENTER")]
+    assert result["task_completed"] is False
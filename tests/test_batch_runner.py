@@ -0,0 +1,46 @@
+import pytest
+
+pytest.importorskip("selenium")
+pytest.importorskip("google.generativeai")
+
+import batch_runner  # noqa: E402
+
+
+@pytest.fixture
+def runners(monkeypatch):
+    created = []
+
+    class RecordingRunner:
+        def __init__(self, **options):
+            self.options = options
+            created.append(self)
+
+        def run(self, goals):
+            self.goals = goals
+
+    monkeypatch.setattr(batch_runner, "BatchRunner", RecordingRunner)
+    monkeypatch.setattr(batch_runner, "load_goals", lambda path: [{"id": 1, "goal": "open google"}])
+    return created
+
+
+def test_browsers_are_headless_by_default(runners):
+    batch_runner.main(["goals.txt"])
+
+    runner, = runners
+    assert runner.options["headless"] is True
+    assert runner.options["browser_config"].headless is True
+
+
+def test_headed_shows_the_browsers(runners):
+    batch_runner.main(["goals.txt", "--headed"])
+
+    assert runners[0].options["headless"] is False
+    assert runners[0].options["browser_config"].headless is False
+
+
+def test_load_goals_reads_text_and_jsonl(tmp_path):
+    path = tmp_path / "goals.txt"
+    path.write_text('# comment\nopen google\n\n{"id": "cats", "goal": "search youtube for cats"}\n')
+
+    assert batch_runner.load_goals(str(path)) == [{"id": 2, "goal": "open google"},
+                                                  {"id": "cats", "goal": "search youtube for cats"}]
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("selenium")
+
+from browser_pool import BrowserPool  # noqa: E402
+
+
+class FakeDriver:
+    def __init__(self, name):
+        self.name = name
+        self.alive = True
+        self.window_handles = ["main"]
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise RuntimeError("chrome not reachable")
+        return 1
+
+    def get(self, url):
+        pass
+
+    def quit(self):
+        self.alive = False
+
+
+class Launcher:
+    """launcher= hook: hands out FakeDrivers, failing the launches listed in fail_on"""
+
+    def __init__(self, fail_on=(), delay=0.0):
+        self.fail_on = set(fail_on)
+        self.delay = delay
+        self.launches = 0
+
+    def __call__(self, config, profile_dir):
+        time.sleep(self.delay)
+        self.launches += 1
+        if self.launches in self.fail_on:
+            raise RuntimeError("chromedriver crashed on start")
+        return FakeDriver(f"chrome-{self.launches}")
+
+
+def acquire_in_thread(pool, **kwargs):
+    result = {}
+
+    def run():
+        try:
+            result["driver"] = pool.acquire(**kwargs)
+        except Exception as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, result
+
+
+def test_warm_browsers_are_reused():
+    launcher = Launcher()
+    pool = BrowserPool(size=1, launcher=launcher)
+    pool.warm(wait=True)
+
+    driver = pool.acquire(timeout=1)
+    pool.release(driver)
+    assert pool.acquire(timeout=1) is driver
+    stats = pool.get_stats()
+    assert (stats["launches"], stats["acquires"], stats["warm_acquires"]) == (1, 2, 2)
+
+
+def test_waiter_wakes_when_a_replacement_launch_fails():
+    # Launch 2 is the background replacement for the crashed first browser
+    launcher = Launcher(fail_on={2}, delay=0.05)
+    pool = BrowserPool(size=1, launcher=launcher)
+    crashed = pool.acquire()
+
+    thread, result = acquire_in_thread(pool)  # no timeout, like BatchRunner
+    time.sleep(0.05)
+    crashed.alive = False
+    pool.release(crashed)  # unhealthy: replaced in the background, and that launch fails
+    thread.join(timeout=2)
+
+    assert not thread.is_alive(), "acquire() never woke up after the replacement launch failed"
+    assert result["driver"].name == "chrome-3"
+    assert launcher.launches == 3
+
+
+def test_waiter_wakes_when_a_browser_is_discarded():
+    pool = BrowserPool(size=1, launcher=Launcher())
+    driver = pool.acquire()
+
+    thread, result = acquire_in_thread(pool)
+    time.sleep(0.05)
+    pool.discard(driver, replace=False)
+    thread.join(timeout=2)
+
+    assert not thread.is_alive()
+    assert result["driver"] is not driver
+
+
+def test_unhealthy_idle_browser_is_replaced_on_acquire():
+    launcher = Launcher()
+    pool = BrowserPool(size=1, launcher=launcher)
+    pool.warm(wait=True)
+    pool.idle.queue[0].alive = False
+
+    driver = pool.acquire(timeout=1)
+    assert driver.alive and driver.name == "chrome-2"
+    assert pool.get_stats()["health_failures"] == 1
+
+
+def test_browsers_are_recycled_after_max_uses():
+    launcher = Launcher()
+    pool = BrowserPool(size=1, max_uses=2, launcher=launcher)
+    first = pool.acquire()
+    pool.release(first)
+    assert pool.acquire() is first
+    pool.release(first)
+
+    assert pool.acquire(timeout=2) is not first
+    assert not first.alive
+    assert pool.get_stats()["recycled"] == 1
+
+
+def test_acquire_times_out_when_every_browser_is_out():
+    pool = BrowserPool(size=1, launcher=Launcher())
+    pool.acquire()
+
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.1)
@@ -0,0 +1,237 @@
+import asyncio
+import threading
+import time
+import types
+
+import pytest
+
+import gemini_client
+from gemini_client import CacheablePrefix, FakeBackend, GeminiClient, GeminiTimeout, GenAIBackend, is_retryable_error
+
+
+class ResourceExhausted(Exception):
+    """Named like the google.api_core quota error"""
+
+
+class PermissionDenied(Exception):
+    pass
+
+
+def make_client(backend, **options):
+    options.setdefault("backoff_base", 0.001)
+    options.setdefault("timeout", 5)
+    return GeminiClient(backend, model_name="fake-model", **options)
+
+
+def test_generate_returns_backend_answer():
+    backend = FakeBackend(["hello"])
+    client = make_client(backend)
+
+    assert client.generate(["prompt"], generation_config={"temperature": 0}) == "hello"
+    assert backend.calls == [{"model": "fake-model", "parts": ["prompt"], "generation_config": {"temperature": 0}}]
+    assert client.get_stats()["calls"] == 1
+
+
+def test_retries_rate_limit_errors():
+    backend = FakeBackend([ResourceExhausted("quota"), ResourceExhausted("quota"), "ok"])
+    client = make_client(backend)
+
+    assert client.generate(["prompt"]) == "ok"
+    stats = client.get_stats()
+    assert (stats["attempts"], stats["retries"], stats["errors"]) == (3, 2, 0)
+
+
+def test_backoff_is_exponential_and_capped(monkeypatch):
+    bounds = []
+
+    def uniform(low, high):
+        bounds.append(high)
+        return 0.0
+
+    monkeypatch.setattr(gemini_client.random, "uniform", uniform)
+    backend = FakeBackend([ResourceExhausted("quota")] * 4 + ["ok"])
+    client = make_client(backend, backoff_base=1.0, backoff_max=3.0)
+
+    assert client.generate(["prompt"]) == "ok"
+    assert bounds == [1.0, 2.0, 3.0, 3.0]
+
+
+def test_gives_up_after_max_retries():
+    backend = FakeBackend([ResourceExhausted("quota")])
+    client = make_client(backend, max_retries=2)
+
+    with pytest.raises(ResourceExhausted):
+        client.generate(["prompt"])
+    stats = client.get_stats()
+    assert (stats["attempts"], stats["retries"], stats["errors"]) == (3, 2, 1)
+
+
+def test_does_not_retry_other_errors():
+    backend = FakeBackend([PermissionDenied("bad key"), "ok"])
+    client = make_client(backend)
+
+    with pytest.raises(PermissionDenied):
+        client.generate(["prompt"])
+    assert client.get_stats()["attempts"] == 1
+
+
+def test_deadline_covers_slow_calls():
+    client = make_client(FakeBackend(["late"], latency=2.0))
+
+    started = time.perf_counter()
+    with pytest.raises(GeminiTimeout):
+        client.generate(["prompt"], timeout=0.2)
+    assert time.perf_counter() - started < 1.0
+    assert client.get_stats()["timeouts"] == 1
+
+
+def test_deadline_covers_retries():
+    client = make_client(FakeBackend([ResourceExhausted("quota")], latency=0.05), backoff_base=0.1,
+                         max_retries=100)
+
+    started = time.perf_counter()
+    with pytest.raises(GeminiTimeout):
+        client.generate(["prompt"], timeout=0.5)
+    assert time.perf_counter() - started < 1.5
+
+
+def test_hedged_request_wins_when_first_is_slow():
+    latencies = iter([1.0, 0.01])
+    backend = FakeBackend(["answer"], latency=lambda: next(latencies))
+    client = make_client(backend, hedge_after=0.1)
+
+    started = time.perf_counter()
+    assert client.generate(["prompt"]) == "answer"
+    assert time.perf_counter() - started < 0.6
+    stats = client.get_stats()
+    assert (stats["hedges"], stats["hedge_wins"], stats["attempts"]) == (1, 1, 2)
+
+
+def test_no_hedge_for_fast_answers():
+    client = make_client(FakeBackend(["answer"], latency=0.01), hedge_after=0.5)
+
+    assert client.generate(["prompt"]) == "answer"
+    assert client.get_stats()["hedges"] == 0
+
+
+def test_concurrency_is_bounded():
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    class CountingBackend(FakeBackend):
+        async def generate(self, model_name, parts, generation_config=None):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            await asyncio.sleep(0.05)
+            with lock:
+                active.pop()
+            return "done"
+
+    client = make_client(CountingBackend(), max_concurrency=2)
+    threads = [threading.Thread(target=client.generate, args=(["prompt"],)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) == 2
+    assert client.get_stats()["attempts"] == 6
+
+
+def test_stream_yields_chunks():
+    client = make_client(FakeBackend(["abcdefgh"], chunk_size=3))
+
+    assert list(client.generate_stream(["prompt"])) == ["abc", "def", "gh"]
+
+
+def test_stream_retries_before_the_first_chunk():
+    client = make_client(FakeBackend([ResourceExhausted("quota"), "streamed"], chunk_size=4))
+
+    assert "".join(client.generate_stream(["prompt"])) == "streamed"
+    assert client.get_stats()["retries"] == 1
+
+
+def test_closing_a_stream_cancels_it():
+    client = make_client(FakeBackend(["x" * 100], chunk_size=1, chunk_latency=0.01))
+
+    started = time.perf_counter()
+    chunks = client.generate_stream(["prompt"])
+    assert next(chunks) == "x"
+    chunks.close()
+    assert time.perf_counter() - started < 0.5
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (ResourceExhausted("quota"), True),
+    (Exception("429 Too Many Requests"), True),
+    (Exception("You exceeded your current quota"), True),
+    (asyncio.TimeoutError(), True),
+    (PermissionDenied("API key not valid"), False),
+    (ValueError("bad request"), False),
+])
+def test_is_retryable_error(error, retryable):
+    assert is_retryable_error(error) is retryable
+
+
+def test_avg_latency_includes_failed_calls():
+    client = make_client(FakeBackend([PermissionDenied("bad key")], latency=0.2))
+
+    with pytest.raises(PermissionDenied):
+        client.generate(["prompt"])
+    stats = client.get_stats()
+    assert stats["errors"] == 1
+    assert stats["avg_latency"] >= 0.2
+
+
+class FakeModel:
+    def __init__(self, name):
+        self.name = name
+
+    async def generate_content_async(self, parts, generation_config=None, stream=False):
+        return types.SimpleNamespace(text=f"{self.name}:{len(parts)}")
+
+
+def fake_genai(create_latency):
+    """The parts of the google.generativeai module GenAIBackend uses"""
+    uploads = []
+
+    def create(model, system_instruction, ttl):
+        uploads.append(system_instruction)
+        time.sleep(create_latency)
+        return "cached-content"
+
+    return types.SimpleNamespace(
+        uploads=uploads,
+        caching=types.SimpleNamespace(CachedContent=types.SimpleNamespace(create=create)),
+        GenerativeModel=type("GenerativeModel", (FakeModel,), {
+            "from_cached_content": staticmethod(lambda cached_content: FakeModel("cached")),
+        }),
+    )
+
+
+def test_context_cache_upload_does_not_block_other_calls():
+    genai = fake_genai(create_latency=0.5)
+    client = make_client(GenAIBackend(genai=genai, context_cache_min_tokens=10), max_concurrency=8)
+    prefix = CacheablePrefix("static instructions", tokens=100)
+    answers = {}
+
+    def ask(name, parts):
+        answers[name] = (client.generate(parts), time.perf_counter() - started)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=ask, args=(f"cached{i}", [prefix, "question"])) for i in range(3)]
+    threads.append(threading.Thread(target=ask, args=("plain", ["question"])))
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+
+    assert answers["plain"][0] == "fake-model:1"
+    assert answers["plain"][1] < 0.3  # answered while the upload was still running
+    assert {answers[f"cached{i}"][0] for i in range(3)} == {"cached:1"}
+    assert genai.uploads == ["static instructions"]
+    assert client.get_stats()["calls"] == 4
+    assert client.backend.cache_stats == {"created": 1, "hits": 0, "unavailable": 0}
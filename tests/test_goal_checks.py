@@ -0,0 +1,102 @@
+import pytest
+
+from goal_checks import NO, UNSURE, YES, GoalChecker, goal_clauses, on_site, particular_choice
+
+VIEWPORT = 1280 * 720
+PLAYER = ["video", False, False, 12.0, 4, 600.0, 854 * 480]
+PREVIEW = ["video", False, False, 3.0, 4, 30.0, 320 * 180]
+
+
+class FactsDriver:
+    """Answers the facts script with whatever the test sets"""
+
+    def __init__(self, **facts):
+        self.facts = page(**facts)
+
+    def execute_script(self, script, *args):
+        return dict(self.facts)
+
+
+def page(url="https://www.google.com/", title="", media=(), cart_count=None, password_field=False):
+    return {"url": url, "title": title, "media": [list(m) for m in media], "cart_count": cart_count,
+            "password_field": password_field, "viewport": VIEWPORT}
+
+
+def verdict(goal, **facts):
+    return GoalChecker(FactsDriver(**facts), goal).check()[0]
+
+
+@pytest.mark.parametrize("goal, url, expected", [
+    ("search for cats", "https://www.google.com/search?q=cats", YES),
+    ("search for cute cats", "https://www.google.com/search?q=cats+cute", YES),
+    ("search for cats on youtube", "https://www.youtube.com/results?search_query=cats", YES),
+    ("search amazon for usb cables", "https://www.amazon.com/s?k=usb+cables", YES),
+    ("search for cats", "https://www.google.com/search?q=cats+dogs", UNSURE),
+    ("search for cats on youtube", "https://www.google.com/search?q=cats", UNSURE),
+    ("search for cats", "https://www.google.com/", NO),
+    ("search for cats", "https://www.google.com/imghp", UNSURE),
+])
+def test_search(goal, url, expected):
+    assert verdict(goal, url=url) == expected
+
+
+def test_find_is_not_a_search():
+    assert verdict("find the cheapest laptop", url="https://www.amazon.com/s?k=cheapest+laptop") == UNSURE
+
+
+@pytest.mark.parametrize("goal, title, expected", [
+    ("play a video on youtube", "Anything at all - YouTube", YES),
+    ("watch a video about dogs", "Funny Dogs Compilation - YouTube", YES),
+    ("watch a dog video", "Funny Dogs Compilation - YouTube", YES),
+    ("watch a video about dogs", "Cats being cats - YouTube", UNSURE),
+    ("watch the second video about dogs", "Funny Dogs Compilation - YouTube", UNSURE),
+    ("play the latest mkbhd video", "MKBHD reviews a phone - YouTube", UNSURE),
+])
+def test_media_checks_the_topic_and_choice(goal, title, expected):
+    assert verdict(goal, url="https://www.youtube.com/watch?v=abc", title=title, media=[PLAYER]) == expected
+
+
+def test_media_previews_and_listings_are_not_playback():
+    assert verdict("play a video on youtube", url="https://www.youtube.com/watch?v=abc", media=[PREVIEW]) == UNSURE
+    assert verdict("play a video on youtube", url="https://www.youtube.com/", media=[PLAYER]) == UNSURE
+    assert verdict("play a video on youtube", url="https://www.youtube.com/results?search_query=x") == NO
+
+
+def test_cart_count_compared_with_the_baseline():
+    driver = FactsDriver(url="https://www.amazon.com/dp/B0", cart_count=0)
+    checker = GoalChecker(driver, "add a usb cable to the cart")
+    assert checker.check()[0] == UNSURE
+
+    driver.facts["cart_count"] = 1
+    assert checker.check()[0] == YES
+    assert GoalChecker(FactsDriver(cart_count=0), "add the cheapest usb cable to the cart").check()[0] == UNSURE
+
+
+def test_website_and_sign_in():
+    assert verdict("go to youtube", url="https://m.youtube.com/") == YES
+    assert verdict("go to youtube", url="https://notyoutube.com/") == UNSURE
+    assert verdict("sign in", url="https://accounts.example.com/login", password_field=True) == NO
+
+
+def test_every_clause_must_pass():
+    goal = "go to youtube and search for cats"
+    assert verdict(goal, url="https://www.youtube.com/results?search_query=cats") == YES
+    assert verdict(goal, url="https://www.youtube.com/") == NO
+    assert verdict("go to youtube and open the first result",
+                   url="https://www.youtube.com/results?search_query=cats") == UNSURE
+
+
+def test_unreadable_page_is_unsure():
+    class BrokenDriver:
+        def execute_script(self, script, *args):
+            raise RuntimeError("no such window")
+
+    assert GoalChecker(BrokenDriver(), "search for cats").check()[0] == UNSURE
+
+
+def test_helpers():
+    assert goal_clauses("Please go to youtube, then play a video.") == ["go to youtube", "play a video"]
+    assert particular_choice("watch the 3rd video") == "3rd"
+    assert particular_choice("watch a video about cats") is None
+    assert on_site("https://www.amazon.co.uk/", "amazon")
+    assert not on_site("https://www.amazon.co.uk/", "amazon.com")
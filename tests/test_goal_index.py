@@ -0,0 +1,105 @@
+import random
+
+import pytest
+
+from ai_learning import AILearningSystem, GoalIndex
+from learning_store import JSONLearningStore, website_from_url
+
+VERBS = ["search for", "find", "play", "buy", "open", "watch", "look up"]
+WORDS = ["cheap", "best", "funny", "live", "laptops", "videos", "tutorials", "python", "cats", "guitars", "on", "for"]
+SITES = ["google", "youtube", "amazon", "ebay"]
+
+
+def synthetic_goal(rng):
+    words = rng.sample(WORDS, rng.randint(1, 4))
+    return f"{rng.choice(VERBS)} {' '.join(words)} on {rng.choice(SITES)}"
+
+
+@pytest.fixture(scope="module")
+def learner():
+    rng = random.Random(7)
+    learner = AILearningSystem(store=JSONLearningStore(learning_file=None))
+    for _ in range(400):
+        start_url = f"https://www.{rng.choice(SITES)}.com/" if rng.random() < 0.75 else None
+        learner.record_task_attempt(synthetic_goal(rng), [("click", "search box")], rng.random() < 0.6,
+                                    f"https://www.{rng.choice(SITES)}.com/results", start_url=start_url)
+    return learner
+
+
+@pytest.fixture(scope="module")
+def queries():
+    rng = random.Random(11)
+    return [synthetic_goal(rng) for _ in range(60)] + ["PLAY Funny Videos", "nothing in common", ""]
+
+
+def linear_scan(learner, goal, success=None, website=None):
+    """The lookup the index replaced: every attempt through similar_goals, in id order"""
+    return sorted((attempt for attempt in learner.store.task_attempts(success=success, website=website)
+                   if learner.similar_goals(goal, attempt["goal"])), key=lambda attempt: attempt["id"])
+
+
+def ids(attempts):
+    return [attempt["id"] for attempt in attempts]
+
+
+def test_same_matches_as_linear_scan(learner, queries):
+    for goal in queries:
+        assert ids(learner.find_similar_attempts(goal)) == ids(linear_scan(learner, goal))
+
+
+@pytest.mark.parametrize("success, website", [(True, None), (False, None), (True, "www.youtube.com"), (None, "amazon.com")])
+def test_filters_match_linear_scan(learner, queries, success, website):
+    for goal in queries:
+        assert ids(learner.find_similar_attempts(goal, success=success, website=website)) == \
+            ids(linear_scan(learner, goal, success=success, website=website))
+
+
+def test_start_website_filter(learner, queries):
+    for goal in queries:
+        # Attempts recorded without a start URL count as starting where they ended
+        expected = [attempt for attempt in linear_scan(learner, goal)
+                    if website_from_url(attempt["start_url"] or attempt["final_url"]) == "www.google.com"]
+        assert ids(learner.find_similar_attempts(goal, start_website="www.google.com")) == ids(expected)
+
+
+@pytest.mark.parametrize("min_common", [1, 2, 3])
+def test_min_common_matches_brute_force(learner, queries, min_common):
+    index = learner.goal_index
+    for goal in queries:
+        query = GoalIndex.tokenize(goal)
+        expected = sorted(attempt["id"] for attempt in learner.store.task_attempts()
+                          if len(query & GoalIndex.tokenize(attempt["goal"])) >= min_common)
+        assert [attempt["id"] for _, attempt in index.search(goal, min_common=min_common)] == expected
+
+
+def test_jaccard_ranking(learner, queries):
+    for goal in queries:
+        query = GoalIndex.tokenize(goal)
+        ranked = learner.goal_index.search(goal, ranking="jaccard")
+        for score, attempt in ranked:
+            tokens = GoalIndex.tokenize(attempt["goal"])
+            assert score == pytest.approx(len(query & tokens) / len(query | tokens))
+        keys = [(-score, attempt["id"]) for score, attempt in ranked]
+        assert keys == sorted(keys)
+        assert sorted(ids(a for _, a in ranked)) == ids(linear_scan(learner, goal))
+
+
+def test_top_k_is_a_prefix_of_the_full_ranking(learner, queries):
+    for goal in queries:
+        for ranking in ("jaccard", "tfidf"):
+            full = learner.goal_index.search(goal, ranking=ranking)
+            assert learner.goal_index.search(goal, ranking=ranking, top_k=5) == full[:5]
+
+
+def test_incremental_updates_match_a_rebuilt_index(learner, queries):
+    store = JSONLearningStore(learning_file=None)
+    incremental = AILearningSystem(store=store)
+    incremental.goal_index  # built while the store is still empty
+    rng = random.Random(3)
+    for _ in range(100):
+        incremental.record_task_attempt(synthetic_goal(rng), [], rng.random() < 0.5, "https://www.google.com/")
+
+    rebuilt = AILearningSystem(store=store)
+    for goal in queries:
+        assert ids(incremental.find_similar_attempts(goal)) == ids(rebuilt.find_similar_attempts(goal))
+        assert ids(incremental.find_similar_attempts(goal)) == ids(linear_scan(rebuilt, goal))
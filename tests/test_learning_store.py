@@ -0,0 +1,161 @@
+import json
+
+import pytest
+
+from ai_learning import AILearningSystem
+from learning_store import JSONLearningStore, SQLiteLearningStore, migrate_json_to_sqlite
+
+
+def record_history(learner):
+    learner.record_task_attempt("search youtube for cats", [("navigate", "https://www.youtube.com"),
+                                                            ("type", "cats")],
+                                True, "https://www.youtube.com/results?search_query=cats",
+                                start_url="https://www.google.com/")
+    learner.record_task_attempt("search youtube for cats", [("click", "search box")], False,
+                                "https://www.youtube.com/")
+    learner.record_task_attempt("add a laptop to the cart", [("click", "first laptop"), ("click", "Add to Cart")],
+                                True, "https://www.amazon.com/cart", "shot.png")
+    for _ in range(3):
+        learner.record_element_failure("search box", "www.youtube.com", "click", "element not found")
+    learner.record_element_failure("Add to Cart button", "www.amazon.com", "click", "not interactable")
+    learner.record_action_success("click", "search box", True, "www.google.com")
+    learner.record_action_success("click", "search box", False, "www.google.com")
+    learner.record_action_success("type", "query", True, "www.google.com")
+    learner.record_selector_success("www.google.com", "Search box", "textarea[name=q]")
+    learner.record_selector_success("www.google.com", "Search box", "textarea[name=q]")
+    learner.record_selector_failure("www.google.com", "Search box", "#search")
+    learner.store.set_common_mistakes(["clicked before the page loaded"])
+
+
+def without_suggestions(failures):
+    # SQLite derives suggestions on read instead of storing them
+    return sorted((dict(f, suggestions=None) for f in failures), key=lambda f: f["failure_key"])
+
+
+@pytest.fixture
+def legacy_file(tmp_path):
+    path = tmp_path / "ai_learning_data.json"
+    record_history(AILearningSystem(store=JSONLearningStore(str(path))))
+    return path
+
+
+def test_migration_matches_json_store(legacy_file, tmp_path):
+    legacy = JSONLearningStore(str(legacy_file))
+    store = SQLiteLearningStore(str(tmp_path / "ai_learning_data.db"))
+
+    assert migrate_json_to_sqlite(str(legacy_file), store) == 3 + 4 + 3
+
+    assert store.task_attempts() == legacy.task_attempts()
+    assert store.task_attempts(success=True, website="www.youtube.com") == \
+        legacy.task_attempts(success=True, website="www.youtube.com")
+    assert store.task_counts() == legacy.task_counts() == (3, 2)
+    assert store.task_success_rates() == legacy.task_success_rates()
+    assert without_suggestions(store.element_failures()) == without_suggestions(legacy.element_failures())
+    assert without_suggestions(store.element_failures(min_count=3)) == \
+        without_suggestions(legacy.element_failures(min_count=3))
+    assert sorted(store.action_stats(), key=str) == sorted(legacy.action_stats(), key=str)
+    assert store.selector_stats("www.google.com", "search box") == legacy.selector_stats("www.google.com", "search box")
+    assert store.selector_count() == legacy.selector_count()
+    assert store.common_mistakes() == legacy.common_mistakes()
+
+
+@pytest.mark.parametrize("website", ["www.youtube.com", "youtube.com", "WWW.YouTube.com", "amazon.com",
+                                     "tube.com", "www.google.com"])
+def test_backends_filter_websites_the_same_way(legacy_file, tmp_path, website):
+    legacy = JSONLearningStore(str(legacy_file))
+    store = SQLiteLearningStore(str(tmp_path / "ai_learning_data.db"))
+    migrate_json_to_sqlite(str(legacy_file), store)
+
+    assert store.task_attempts(website=website) == legacy.task_attempts(website=website)
+    assert without_suggestions(store.element_failures(website=website)) == \
+        without_suggestions(legacy.element_failures(website=website))
+    learners = [AILearningSystem(store=legacy), AILearningSystem(store=store)]
+    json_attempts, sqlite_attempts = [learner.find_similar_attempts("search youtube for dogs", website=website)
+                                      for learner in learners]
+    assert sqlite_attempts == json_attempts
+    assert learners[0].get_improvement_suggestions("search youtube for dogs", website) == \
+        learners[1].get_improvement_suggestions("search youtube for dogs", website)
+
+
+def test_website_filter_compares_hosts():
+    store = JSONLearningStore(learning_file=None)
+    learner = AILearningSystem(store=store)
+    learner.record_task_attempt("search youtube for cats", [], True, "https://www.youtube.com/results")
+    learner.record_task_attempt("search youtube for cats", [], True, "https://m.youtube.com/results")
+    learner.record_task_attempt("search youtube for cats", [], True, "https://www.google.com/search?q=youtube.com")
+
+    assert [a["final_url"] for a in store.task_attempts(website="youtube.com")] == ["https://www.youtube.com/results"]
+    assert len(learner.find_similar_attempts("search youtube for dogs", website="www.youtube.com")) == 1
+
+
+def test_export_is_rebuilt_only_after_writes(tmp_path):
+    learner = AILearningSystem(store=SQLiteLearningStore(str(tmp_path / "ai_learning_data.db")))
+    record_history(learner)
+
+    data = learner.learning_data
+    assert learner.learning_data is data
+    learner.record_action_success("click", "search box", True, "www.google.com")
+    assert learner.learning_data is not data
+    assert learner.learning_data["action_success_rates"]["click_www.google.com"]["total"] == 3
+
+
+def test_learner_answers_the_same_after_migration(legacy_file, tmp_path):
+    json_learner = AILearningSystem(store=JSONLearningStore(str(legacy_file)))
+    sqlite_learner = AILearningSystem(learning_file=str(legacy_file))
+
+    for learner in (json_learner, sqlite_learner):
+        assert learner.store.task_counts() == (3, 2)
+    assert sqlite_learner.get_improvement_suggestions("search youtube for dogs", "www.youtube.com") == \
+        json_learner.get_improvement_suggestions("search youtube for dogs", "www.youtube.com")
+    assert sqlite_learner.get_learned_strategies("search youtube for dogs", "youtube") == \
+        json_learner.get_learned_strategies("search youtube for dogs", "youtube")
+    assert sqlite_learner.get_cached_selectors("www.google.com", "search box") == \
+        json_learner.get_cached_selectors("www.google.com", "search box")
+    summary, expected = sqlite_learner.get_learning_summary(), json_learner.get_learning_summary()
+    summary["websites_learned"].sort()
+    expected["websites_learned"].sort()
+    assert dict(summary, last_updated=None) == dict(expected, last_updated=None)
+
+
+def test_second_open_does_not_import_again(legacy_file, tmp_path):
+    db_path = str(tmp_path / "ai_learning_data.db")
+    store = SQLiteLearningStore(db_path)
+    assert migrate_json_to_sqlite(str(legacy_file), store) > 0
+    store.close()
+
+    store = SQLiteLearningStore(db_path)
+    assert migrate_json_to_sqlite(str(legacy_file), store) == 0
+    assert store.task_counts() == (3, 2)
+    assert len(store.element_failures()) == 2
+
+
+def test_learner_migrates_once(legacy_file, capsys):
+    AILearningSystem(learning_file=str(legacy_file)).store.close()
+    assert "Migrated 10 learning events" in capsys.readouterr().out
+
+    learner = AILearningSystem(learning_file=str(legacy_file))
+    assert "Migrated" not in capsys.readouterr().out
+    assert learner.store.task_counts() == (3, 2)
+
+
+def test_migrates_old_files_without_ids_or_error_lists(tmp_path):
+    path = tmp_path / "old.json"
+    path.write_text(json.dumps({
+        "task_patterns": {"abc": [{"goal": "open google", "actions": [["navigate", "https://google.com"]],
+                                   "success": True, "final_url": "https://www.google.com/",
+                                   "timestamp": "2024-01-01T00:00:00"}]},
+        "element_failures": {"www.google.com_search box_click": {"count": 2, "errors": [], "suggestions": []}},
+        "action_success_rates": {},
+        "website_patterns": {"www.google.com": {"common_elements": ["search box"]}},
+        "common_mistakes": [],
+    }))
+    store = SQLiteLearningStore(str(tmp_path / "old.db"))
+
+    assert migrate_json_to_sqlite(str(path), store) == 3
+    attempt, = store.task_attempts()
+    assert attempt["goal"] == "open google" and attempt["actions"] == [("navigate", "https://google.com")]
+    assert attempt["start_url"] is None
+    failure, = store.element_failures()
+    assert (failure["website"], failure["description"], failure["action_type"], failure["count"]) == \
+        ("www.google.com", "search box", "click", 2)
+    assert store.website_patterns("www.google.com") == {"common_elements": ["search box"]}
@@ -0,0 +1,94 @@
+from model_router import IMAGE_TOKENS, ModelRouter, PageProfile, Tier, estimate_tokens
+from page_snapshot import PageSnapshot
+
+TIERS = [
+    Tier("text", "flash-lite", image_width=0, input_price=0.0375, output_price=0.15),
+    Tier("low", "flash", image_width=512, input_price=0.075, output_price=0.30),
+    Tier("full", "flash", image_width=None, input_price=0.075, output_price=0.30),
+]
+ROUTES = {"analyze": "low", "verify": "low", "why_stuck": "full", "plan": "full", "step": "full"}
+
+
+def make_router():
+    return ModelRouter(TIERS, ROUTES, default_tier="full", simple_routes={"plan": "text", "step": "text"},
+                       escalation={"text": "full", "low": "full"}, simple_max_interactive=30)
+
+
+def profile(elements=3, text_blocks=5, title="Google"):
+    return PageProfile(PageSnapshot(
+        title=title, url="https://www.google.com/",
+        text_blocks=[f"block {i}" for i in range(text_blocks)],
+        elements=[["a", "", f"link {i}", 10, 20 * i, 50, 10, "/"] for i in range(elements)],
+        form_fields=[["textarea", "", "q", "Search", "", 400, 300, 500, 40]],
+    ))
+
+
+class Screenshot:
+    """Stands in for screenshot_pipeline.Screenshot: thumbnail(width) and part()"""
+
+    def __init__(self, width=1280):
+        self.width = width
+
+    def thumbnail(self, width):
+        return Screenshot(width)
+
+    def part(self):
+        return ("image", self.width)
+
+
+def test_routes_by_call_type_and_page():
+    router = make_router()
+    simple, busy = profile(), profile(elements=80)
+
+    assert router.route("plan", simple).name == "text"
+    assert router.route("plan", busy).name == "full"
+    assert router.route("verify", simple).name == "low"
+    assert router.route("why_stuck", simple).name == "full"
+    assert router.route("unknown", simple).name == "full"
+    assert router.route("step", profile(title="Please solve this CAPTCHA")).name == "full"
+
+
+def test_text_tier_needs_a_page_profile():
+    router = ModelRouter(TIERS, {"plan": "text"}, default_tier="full", escalation={"text": "low"})
+
+    assert router.route("plan", profile()).name == "text"
+    assert router.route("plan").name == "low"
+    assert ModelRouter(TIERS, {"plan": "text"}, default_tier="full").route("plan").name == "full"
+
+
+def test_escalation_goes_up_one_tier():
+    router = make_router()
+
+    assert router.escalate(router.tiers["text"]).name == "full"
+    assert router.escalate(router.tiers["low"]).name == "full"
+    assert router.escalate(router.tiers["full"]) is None
+
+
+def test_prepare_sends_screenshots_as_the_tier_needs():
+    router = make_router()
+    page = profile()
+    parts = ["Is the goal done?", Screenshot()]
+
+    assert router.prepare(parts, router.tiers["full"], page) == ["Is the goal done?", ("image", 1280)]
+    assert router.prepare(parts, router.tiers["low"], page) == ["Is the goal done?", ("image", 512)]
+    text_parts = router.prepare(parts, router.tiers["text"], page)
+    assert text_parts[0] == "Is the goal done?" and len(text_parts) == 2
+    assert 'textarea "Search"' in text_parts[1] and 'a "link 2" at (10, 40)' in text_parts[1]
+
+
+def test_record_counts_latency_tokens_and_cost_per_tier():
+    router = make_router()
+    parts = ["x" * 400, Screenshot()]
+    router.record(router.tiers["low"], 1.0, parts, "y" * 40)
+    router.record(router.tiers["full"], 3.0, parts, "y" * 40, escalated=True)
+    router.record(router.tiers["full"], 1.0, parts, None)
+
+    stats = router.get_stats()
+    assert estimate_tokens(parts) == 100 + IMAGE_TOKENS
+    assert stats["low"]["calls"] == 1 and stats["low"]["output_tokens"] == 10
+    assert stats["full"]["calls"] == 2 and stats["full"]["escalations"] == 1
+    assert stats["full"]["avg_latency"] == 2.0
+    assert stats["low"]["cost"] == (358 * 0.075 + 10 * 0.30) / 1e6
+    assert "full 2 calls avg 2.0s" in router.format_stats()
+    assert "(1 escalated)" in router.format_stats()
+    assert make_router().format_stats() == "no routed calls"
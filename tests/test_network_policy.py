@@ -0,0 +1,119 @@
+import json
+
+import pytest
+
+from network_policy import CATEGORY_PATTERNS, NetworkPolicy, format_bytes, host_matches, site_of
+
+
+class CDPDriver:
+    """Records CDP commands and replays a canned performance log once"""
+
+    def __init__(self, log=()):
+        self.commands = []
+        self.log = list(log)
+
+    def execute_cdp_cmd(self, command, params):
+        self.commands.append((command, params))
+        return {}
+
+    def get_log(self, name):
+        assert name == "performance"
+        entries, self.log = self.log, []
+        return entries
+
+
+def event(method, **params):
+    return {"message": json.dumps({"message": {"method": method, "params": params}})}
+
+
+def request(request_id, url, resource_type):
+    return event("Network.requestWillBeSent", requestId=request_id, request={"url": url}, type=resource_type)
+
+
+PERFORMANCE_LOG = [
+    request("1", "https://www.youtube.com/", "Document"),
+    event("Network.responseReceived", requestId="1", type="Document"),
+    event("Network.loadingFinished", requestId="1", encodedDataLength=120000),
+    request("2", "https://i.ytimg.com/vi/abc/hq.jpg", "Image"),
+    event("Network.loadingFinished", requestId="2", encodedDataLength=20000),
+    request("3", "https://i.ytimg.com/vi/def/hq.jpg", "Image"),
+    event("Network.loadingFinished", requestId="3", encodedDataLength=40000),
+    request("4", "https://securepubads.g.doubleclick.net/tag/js/gpt.js", "Script"),
+    event("Network.loadingFailed", requestId="4", type="Script", blockedReason="inspector"),
+    request("5", "https://www.google-analytics.com/analytics.js", "Script"),
+    event("Network.loadingFailed", requestId="5", type="Script", blockedReason="inspector"),
+    request("6", "https://www.youtube.com/ads/banner.png", "Image"),
+    event("Network.loadingFailed", requestId="6", type="Image", blockedReason="inspector"),
+    request("7", "https://www.youtube.com/api/stats", "XHR"),
+    event("Network.loadingFailed", requestId="7", type="XHR", errorText="net::ERR_ABORTED"),
+    {"message": "not json"},
+]
+
+
+def test_collect_counts_a_performance_log():
+    policy = NetworkPolicy(domain_blocklists={"youtube.com": ["*/ads/*"]})
+    driver = CDPDriver(PERFORMANCE_LOG)
+
+    counts = policy.collect(driver)
+    assert counts == {"requests_loaded": 3, "bytes_loaded": 180000, "requests_blocked": 3,
+                      # Scripts at the typical size; the image at the average of the images loaded
+                      "bytes_saved": 30000 + 30000 + 30000}
+    assert policy.get_stats()["blocked_by_category"] == {"ads": 1, "trackers": 1, "site": 1}
+
+    # Only new events are counted on the next call
+    assert policy.collect(driver)["requests_blocked"] == 0
+    assert policy.get_stats()["requests_blocked"] == 3
+
+
+def test_collect_without_counting_or_log():
+    assert NetworkPolicy(count_requests=False).collect(CDPDriver(PERFORMANCE_LOG))["requests_loaded"] == 0
+    assert NetworkPolicy().collect(object())["requests_loaded"] == 0
+
+
+def test_patterns_per_category_and_site():
+    policy = NetworkPolicy(block_ads=False, block_trackers=False, block_fonts=True,
+                           domain_blocklists={"youtube.com": ["*/ads/*"]})
+
+    assert policy.patterns_for("https://www.google.com/") == CATEGORY_PATTERNS["fonts"]
+    assert policy.patterns_for("https://m.youtube.com/watch?v=1") == CATEGORY_PATTERNS["fonts"] + ["*/ads/*"]
+    assert policy.patterns_for("https://notyoutube.com/") == CATEGORY_PATTERNS["fonts"]
+    assert NetworkPolicy(essential_only=True).block_images
+    assert not NetworkPolicy(block_ads=False, block_trackers=False).enabled
+
+
+def test_video_streams_load_by_default():
+    patterns = NetworkPolicy().patterns_for("https://www.youtube.com/watch?v=abc")
+    assert not any("googlevideo" in pattern for pattern in patterns)
+
+
+def test_apply_only_calls_devtools_when_patterns_change():
+    policy = NetworkPolicy(domain_blocklists={"youtube.com": ["*/ads/*"]})
+    driver = CDPDriver()
+
+    assert policy.apply(driver, "https://www.google.com/")
+    assert policy.apply(driver, "https://www.google.com/search?q=cats")
+    assert policy.apply(driver, "https://www.youtube.com/")
+    assert [command for command, _ in driver.commands] == ["Network.enable", "Network.setBlockedURLs",
+                                                           "Network.setBlockedURLs"]
+    assert "*/ads/*" in driver.commands[-1][1]["urls"]
+
+    policy.forget(driver)
+    policy.apply(driver, "https://www.youtube.com/")
+    assert driver.commands[-2][0] == "Network.enable"
+
+
+@pytest.mark.parametrize("url, site", [("https://www.youtube.com/watch", "youtube.com"),
+                                       ("https://m.youtube.com/", "m.youtube.com"), ("", "")])
+def test_site_of(url, site):
+    assert site_of(url) == site
+
+
+def test_host_matches_subdomains_only():
+    assert host_matches("m.youtube.com", "youtube.com")
+    assert host_matches("youtube.com", "youtube.com")
+    assert not host_matches("notyoutube.com", "youtube.com")
+
+
+def test_format_bytes():
+    assert [format_bytes(n) for n in (512, 2048, 5 * 1024 * 1024, 3 * 1024 ** 3)] == ["512B", "2.0KB", "5.0MB",
+                                                                                      "3.0GB"]
@@ -0,0 +1,119 @@
+from page_delta import TILE_GRID, PageDelta, PageState, region_name, tile_hashes
+
+
+class GrayImage:
+    """Just enough of a PIL image for tile_hashes: crop, convert, resize (nearest) and getdata"""
+
+    def __init__(self, width, height, pixel):
+        self.size = (width, height)
+        self.pixel = pixel
+
+    def crop(self, box):
+        left, top, right, bottom = box
+        return GrayImage(right - left, bottom - top, lambda x, y: self.pixel(x + left, y + top))
+
+    def convert(self, mode):
+        return self
+
+    def resize(self, size):
+        width, height = size
+        scale_x, scale_y = self.size[0] / width, self.size[1] / height
+        return GrayImage(width, height, lambda x, y: self.pixel(int(x * scale_x), int(y * scale_y)))
+
+    def getdata(self):
+        return [self.pixel(x, y) for y in range(self.size[1]) for x in range(self.size[0])]
+
+
+def gradient(x, y):
+    return (x * 3 + y * 2) % 256
+
+
+def with_box(x, y):
+    """The gradient with a checkered box drawn in the top right corner"""
+    if x >= 700 and y < 100:
+        return 255 if (x // 8 + y // 8) % 2 else 0
+    return gradient(x, y)
+
+
+class Screenshot:
+    def __init__(self, image, fingerprint=None):
+        self.image = image
+        self.fingerprint = fingerprint
+
+
+class FingerprintDriver:
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.calls = 0
+
+    def execute_script(self, script, *args):
+        self.calls += 1
+        return dict(self.fingerprint)
+
+
+PAGE = {"url": "https://www.google.com/", "title": "Google", "elements": 412, "text": "1a2b", "values": "5381",
+        "focus": "TEXTAREA#APjFqb", "scroll": [0, 0]}
+BEFORE = GrayImage(800, 600, gradient)
+AFTER = GrayImage(800, 600, with_box)
+
+
+def test_tile_hashes_cover_the_grid():
+    columns, rows = TILE_GRID
+    assert len(tile_hashes(BEFORE)) == columns * rows
+    assert tile_hashes(BEFORE) == tile_hashes(GrayImage(800, 600, gradient))
+
+
+def test_identical_pages_are_unchanged():
+    delta = PageState(PAGE, tile_hashes(BEFORE), BEFORE.size).diff(PageState(dict(PAGE), tile_hashes(BEFORE),
+                                                                              BEFORE.size))
+    assert delta.unchanged
+    assert delta.region is None
+    assert delta.describe() == "nothing changed (same URL, content and pixels)"
+
+
+def test_changed_tiles_and_region():
+    delta = PageState(PAGE, tile_hashes(BEFORE), BEFORE.size).diff(PageState(PAGE, tile_hashes(AFTER), AFTER.size))
+
+    # The box covers the last column of the first row
+    assert delta.changed_tiles == [7]
+    assert delta.region == (700, 0, 100, 100)
+    assert not delta.unchanged
+    assert delta.describe() == "1/48 tiles changed (top right)"
+
+
+def test_dom_and_url_changes_without_pixels():
+    after = dict(PAGE, url="https://www.google.com/search?q=cats", values="9f3c")
+    delta = PageState(PAGE, tile_hashes(BEFORE), BEFORE.size).diff(PageState(after, tile_hashes(BEFORE),
+                                                                             BEFORE.size))
+    assert delta.url_changed
+    assert delta.dom_changes == ["values"]
+    assert not delta.unchanged
+    assert delta.describe() == "URL changed; DOM changed (values)"
+
+
+def test_screenshots_of_different_sizes_are_not_comparable():
+    small = GrayImage(400, 300, gradient)
+    delta = PageState(PAGE, tile_hashes(BEFORE), BEFORE.size).diff(PageState(PAGE, tile_hashes(small), small.size))
+
+    assert not delta.visual_known
+    assert not delta.unchanged
+    assert delta.describe() == "screenshots not comparable"
+    assert not PageDelta(PageState(PAGE), PageState(PAGE)).unchanged
+
+
+def test_capture_reuses_the_screenshot_fingerprint():
+    driver = FingerprintDriver(PAGE)
+
+    state = PageState.capture(driver, Screenshot(BEFORE, fingerprint=PAGE))
+    assert driver.calls == 0
+    assert (state.size, len(state.tiles)) == ((800, 600), 48)
+
+    state = PageState.capture(driver)
+    assert driver.calls == 1
+    assert (state.fingerprint, state.tiles) == (PAGE, None)
+
+
+def test_region_name():
+    assert region_name(8, 6, [0, 1]) == "top left"
+    assert region_name(8, 6, [27, 28]) == "middle"
+    assert region_name(8, 6, [47]) == "bottom right"
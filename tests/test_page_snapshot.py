@@ -0,0 +1,42 @@
+from page_snapshot import PageSnapshot
+
+
+class ScriptDriver:
+    """Answers execute_script with a canned snapshot and records the arguments"""
+
+    def __init__(self, data):
+        self.data = data
+        self.args = None
+
+    def execute_script(self, script, *args):
+        self.args = args
+        return self.data
+
+
+PAGE = {
+    "title": "Results",
+    "url": "https://example.com/search?q=cats",
+    "viewport": [1280, 800, 0, 0, 4000],
+    "body_text": "\n".join(f"line {i}" for i in range(500)),
+    "text_blocks": ["line 0", "line 1"],
+    "elements": [["a", "", "Next page", 10, 20, 80, 16, "/search?q=cats&page=2"]],
+    "form_fields": [["input", "search", "q", "Search", "cats", 0, 0, 300, 30]],
+}
+
+
+def test_capture_reads_one_script_result():
+    driver = ScriptDriver(PAGE)
+    snapshot = PageSnapshot.capture(driver, max_text_blocks=2, max_elements=10)
+
+    assert driver.args == (2, 10, 300, False)
+    assert snapshot.element_dicts() == [{"tag": "a", "role": "", "text": "Next page", "x": 10, "y": 20,
+                                         "width": 80, "height": 16, "href": "/search?q=cats&page=2"}]
+    assert snapshot.form_field_dicts()[0]["value"] == "cats"
+
+
+def test_body_text_is_not_capped_by_text_blocks():
+    snapshot = PageSnapshot.capture(ScriptDriver(PAGE), max_text_blocks=2, body_text=True)
+
+    assert snapshot.text_blocks == ["line 0", "line 1"]
+    assert snapshot.body_text.count("\n") == 499
+    assert snapshot.to_dict()["body_text"] == PAGE["body_text"]
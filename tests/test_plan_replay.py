@@ -0,0 +1,67 @@
+import pytest
+
+from goal_checks import NO, UNSURE, YES
+from plan_replay import apply_substitutions, build_replay_plan, check_replay_outcome, goal_substitutions
+
+
+@pytest.mark.parametrize("recorded, new, expected", [
+    ("search youtube for cats", "search youtube for dogs", [("cats", "dogs")]),
+    ("search Google for cheap laptops", "search google for gaming mice", [("cheap laptops", "gaming mice")]),
+    ("open google", "open google", []),
+    ("search youtube for cats", "search youtube for funny cats", None),
+    ("search youtube for cats", "search youtube", None),
+])
+def test_goal_substitutions(recorded, new, expected):
+    assert goal_substitutions(recorded, new) == expected
+
+
+def test_apply_substitutions_replaces_whole_words_only():
+    substitutions = [("dog", "cat")]
+    assert apply_substitutions("Dog videos for dog lovers", substitutions) == "cat videos for cat lovers"
+    assert apply_substitutions("dogs and hotdog", substitutions) == "dogs and hotdog"
+
+
+def test_apply_substitutions_in_urls():
+    substitutions = [("cheap laptops", "gaming mice")]
+    url = "https://www.google.com/search?q=cheap+laptops&hl=en"
+    assert apply_substitutions(url, substitutions) == "https://www.google.com/search?q=gaming+mice&hl=en"
+
+
+def test_build_replay_plan():
+    attempt = {"goal": "search youtube for cats", "final_url": "https://www.youtube.com/results?search_query=cats",
+               "actions": [("navigate", "https://www.youtube.com"), ("type", "cats"), ("press", "ENTER"),
+                           ("wait", "2s")]}
+    actions, expected_url, substitutions = build_replay_plan(attempt, "search youtube for dogs")
+
+    assert actions == [("ai_navigate", "https://www.youtube.com"), ("ai_type", "dogs"), ("ai_press", "ENTER"),
+                       ("ai_wait", "2 seconds")]
+    assert expected_url == "https://www.youtube.com/results?search_query=dogs"
+    assert substitutions == [("cats", "dogs")]
+    # The changed word must appear in the actions
+    assert build_replay_plan(attempt, "browse youtube for cats") is None
+
+
+SEARCH = "https://www.google.com/search?q=cats"
+
+
+@pytest.mark.parametrize("expected_url, actual_url, substitutions, verdict", [
+    # A substituted query parameter shows the outcome
+    ("https://www.google.com/search?q=dogs", "https://www.google.com/search?q=dogs&sca=1", [("cats", "dogs")], YES),
+    ("https://www.google.com/search?q=dogs", "https://www.google.com/search?q=cats", [("cats", "dogs")], NO),
+    ("https://www.google.com/search?q=dogs", "https://www.google.com/webhp?q=dogs", [("cats", "dogs")], NO),
+    ("https://www.google.com/search?q=dogs", "", [("cats", "dogs")], NO),
+    # Same goal again: only the recorded page itself counts
+    (SEARCH, SEARCH, [], YES),
+    (SEARCH, "https://www.google.com/search?q=cats&page=2", [], UNSURE),
+])
+def test_check_replay_outcome(expected_url, actual_url, substitutions, verdict):
+    assert check_replay_outcome(SEARCH, expected_url, actual_url, substitutions)[0] == verdict
+
+
+def test_unsubstituted_url_is_not_proof():
+    # "play a cats video" replayed as "play a dogs video": the URL cannot say which video plays
+    watch = "https://www.youtube.com/watch?v=abc123"
+    assert check_replay_outcome(watch, watch, watch, [("cats", "dogs")])[0] == UNSURE
+    assert check_replay_outcome(watch, watch, "https://www.youtube.com/watch?v=xyz789", [("cats", "dogs")])[0] == UNSURE
+    assert check_replay_outcome(watch, watch, "https://www.youtube.com/results?search_query=dogs",
+                                [("cats", "dogs")])[0] == NO
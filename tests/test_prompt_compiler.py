@@ -0,0 +1,92 @@
+import pytest
+
+from gemini_client import CacheablePrefix
+from prompt_compiler import PromptField, PromptTemplate, estimate_tokens
+from prompts import PROMPT_TOKEN_BUDGET, STEP_PROMPT
+
+TEMPLATE = PromptTemplate("test", """
+    Static instructions.
+    """, [
+    PromptField("goal", "USER GOAL", required=True),
+    PromptField("history", "PREVIOUS ACTIONS", keep="last", min_items=1),
+    PromptField("suggestions", "SUGGESTIONS", keep="first"),
+    PromptField("analysis", "ANALYSIS"),
+])
+
+
+def test_fields_render_after_the_prefix_in_template_order():
+    prompt = TEMPLATE.compile(analysis="a login wall", goal="open google", history=["CLICK: #1", "TYPE: cats"])
+
+    assert isinstance(prompt.prefix, CacheablePrefix)
+    assert prompt.parts() == ["Static instructions.", prompt.dynamic]
+    assert prompt.dynamic == "USER GOAL: open google\n\nPREVIOUS ACTIONS:\n- CLICK: #1\n- TYPE: cats\n\n" \
+                             "ANALYSIS: a login wall"
+    assert prompt.tokens == estimate_tokens("Static instructions.") + estimate_tokens(prompt.dynamic)
+    assert prompt.truncated == []
+
+
+def test_empty_fields_are_left_out():
+    assert TEMPLATE.compile(goal="open google", history=[], analysis="").dynamic == "USER GOAL: open google"
+
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(ValueError):
+        TEMPLATE.compile(goal="open google", url="https://www.google.com/")
+
+
+def test_budget_trims_fields_in_order():
+    history = [f"CLICK: result {i}" for i in range(40)]
+    suggestions = [f"suggestion {i}" for i in range(40)]
+    untrimmed = TEMPLATE.compile(goal="open google", history=history, suggestions=suggestions)
+
+    prompt = TEMPLATE.compile(budget=untrimmed.tokens - 50, goal="open google", history=history,
+                              suggestions=suggestions)
+    assert prompt.tokens <= untrimmed.tokens - 50
+    assert prompt.truncated == ["history"]
+    # History keeps the newest actions and the caller's list is not modified
+    assert "- CLICK: result 39" in prompt.dynamic and "- CLICK: result 0\n" not in prompt.dynamic
+    assert len(history) == 40
+
+    prompt = TEMPLATE.compile(budget=30, goal="open google", history=history, suggestions=suggestions,
+                              analysis="x" * 400)
+    assert prompt.truncated == ["history", "suggestions", "analysis"]
+    # min_items=1 keeps the last action, suggestions keep the first items
+    assert prompt.dynamic.count("- CLICK") == 1 and "- CLICK: result 39" in prompt.dynamic
+    assert "suggestion 39" not in prompt.dynamic
+    assert "USER GOAL: open google" in prompt.dynamic
+
+
+def test_long_text_is_clipped_to_the_budget():
+    prompt = TEMPLATE.compile(budget=60, goal="open google", analysis="x" * 1000)
+
+    assert prompt.truncated == ["analysis"]
+    assert prompt.tokens <= 60
+    assert prompt.dynamic.endswith("…")
+
+
+def test_required_fields_are_never_trimmed(capsys):
+    prompt = TEMPLATE.compile(budget=5, goal="g" * 200)
+
+    assert "g" * 200 in prompt.dynamic
+    assert "over its budget" in capsys.readouterr().out
+
+
+def test_step_prompt_prefix_is_identical_on_every_call():
+    first = STEP_PROMPT.compile(goal="search for cats", url="https://www.google.com/", stage="planning")
+    second = STEP_PROMPT.compile(goal="play a video", url="https://www.youtube.com/", stage="after actions",
+                                 history=["CLICK: search box"])
+
+    assert first.prefix is second.prefix
+    assert first.prefix.tokens == estimate_tokens(first.prefix)
+    assert "youtube" not in first.prefix
+
+
+def test_step_prompt_keeps_twenty_elements_within_the_budget():
+    elements = [f'[{i}] link "result number {i} with a rather long accessible name"' for i in range(300)]
+    prompt = STEP_PROMPT.compile(goal="search for cats", url="https://www.google.com/", stage="planning",
+                                 history=[f"CLICK: #{i}" for i in range(50)], elements=elements)
+
+    assert prompt.tokens <= PROMPT_TOKEN_BUDGET
+    assert prompt.truncated == ["history", "elements"]
+    assert prompt.dynamic.count("\n- CLICK") == 2
+    assert '[0] link "result number 0' in prompt.dynamic
@@ -0,0 +1,106 @@
+import pytest
+
+import response_cache
+from response_cache import ResponseCache, perceptual_hash
+
+
+class GrayImage:
+    """Just enough of a PIL image for perceptual_hash: convert, resize (nearest) and getdata"""
+
+    def __init__(self, width, height, pixel):
+        self.size = (width, height)
+        self.pixel = pixel
+
+    def convert(self, mode):
+        return self
+
+    def resize(self, size):
+        width, height = size
+        scale_x, scale_y = self.size[0] / width, self.size[1] / height
+        return GrayImage(width, height, lambda x, y: self.pixel(int(x * scale_x), int(y * scale_y)))
+
+    def getdata(self):
+        return [self.pixel(x, y) for y in range(self.size[1]) for x in range(self.size[0])]
+
+
+GRADIENT = GrayImage(90, 80, lambda x, y: (x * 3 + y) % 256)
+STRIPES = GrayImage(90, 80, lambda x, y: 255 if (x // 10) % 2 else 0)
+PAGE = {"url": "https://www.google.com/", "title": "Google", "elements": 412, "text": "1a2b", "values": "5381",
+        "focus": "TEXTAREA#APjFqb", "scroll": [0, 0]}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_perceptual_hash_ignores_small_pixel_noise():
+    noisy = GrayImage(90, 80, lambda x, y: GRADIENT.pixel(x, y) + (1 if (x + y) % 7 == 0 else 0))
+
+    assert len(perceptual_hash(GRADIENT)) == 16
+    assert perceptual_hash(noisy) == perceptual_hash(GRADIENT)
+    assert perceptual_hash(STRIPES) != perceptual_hash(GRADIENT)
+
+
+def test_key_covers_screenshot_page_and_inputs():
+    cache = ResponseCache()
+    key = cache.make_key("verify", GRADIENT, "flash", "search for cats", page=PAGE)
+
+    assert key == cache.make_key("verify", GRADIENT, "flash", "search for cats", page=dict(PAGE))
+    assert key != cache.make_key("verify", STRIPES, "flash", "search for cats", page=PAGE)
+    assert key != cache.make_key("verify", GRADIENT, "flash", "search for dogs", page=PAGE)
+    assert key != cache.make_key("why_stuck", GRADIENT, "flash", "search for cats", page=PAGE)
+    # Typing into a field changes the form values but hardly a pixel
+    assert key != cache.make_key("verify", GRADIENT, "flash", "search for cats", page=dict(PAGE, values="9f3c"))
+    assert key != cache.make_key("verify", GRADIENT, "flash", "search for cats",
+                                 page=dict(PAGE, url="https://www.google.com/search?q=cats"))
+    assert key != cache.make_key("verify", GRADIENT, "flash", "search for cats")
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = ResponseCache(ttl_seconds=60)
+    cache.set("k", "YES")
+
+    clock[0] += 60
+    assert cache.get("k") == "YES"
+    clock[0] += 1
+    assert cache.get("k") is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    stats = cache.get_stats()
+    assert (stats["evictions"], stats["hits"], stats["misses"], stats["entries"]) == (1, 3, 1, 2)
+    assert stats["hit_rate"] == 0.75
+
+
+def test_disk_tier_outlives_the_process_cache(tmp_path, clock):
+    path = str(tmp_path / "cache.db")
+    ResponseCache(db_path=path, ttl_seconds=60).set("k", {"answer": "NO"})
+
+    cache = ResponseCache(db_path=path, ttl_seconds=60)
+    assert cache.get("k") == {"answer": "NO"}
+    assert cache.get("k") == {"answer": "NO"}
+    stats = cache.get_stats()
+    assert (stats["disk_hits"], stats["memory_hits"]) == (1, 1)
+
+    clock[0] += 61
+    assert ResponseCache(db_path=path, ttl_seconds=60).get("k") is None
+
+
+def test_clear_drops_both_tiers(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "cache.db"))
+    cache.set("k", "v")
+    cache.clear()
+
+    assert cache.get("k") is None
@@ -0,0 +1,49 @@
+import base64
+import io
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from screenshot_pipeline import capture  # noqa: E402
+
+
+class CDPDriver:
+    """Answers the two CDP commands like Chrome on a screen with the given devicePixelRatio"""
+
+    def __init__(self, css_width=1280, css_height=800, device_pixel_ratio=2.0):
+        self.css_size = (css_width, css_height)
+        self.device_pixel_ratio = device_pixel_ratio
+        self.commands = []
+
+    def execute_cdp_cmd(self, command, params):
+        self.commands.append((command, params))
+        width, height = self.css_size
+        if command == "Page.getLayoutMetrics":
+            return {
+                "cssVisualViewport": {"clientWidth": width, "clientHeight": height, "pageX": 0, "pageY": 0},
+                "visualViewport": {"clientWidth": width * self.device_pixel_ratio,
+                                   "clientHeight": height * self.device_pixel_ratio, "pageX": 0, "pageY": 0},
+            }
+        clip = params["clip"]
+        factor = clip["scale"] * self.device_pixel_ratio
+        image = Image.new("RGB", (round(clip["width"] * factor), round(clip["height"] * factor)), "white")
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG")
+        return {"data": base64.b64encode(buffer.getvalue()).decode()}
+
+
+@pytest.mark.parametrize("device_pixel_ratio", [1.0, 1.5, 2.0])
+def test_hidpi_capture_respects_max_width(device_pixel_ratio):
+    driver = CDPDriver(device_pixel_ratio=device_pixel_ratio)
+    shot = capture(driver, max_width=1280)
+
+    assert shot.size == shot.image.size
+    assert shot.size == (1280, 800)
+    assert shot.original_size == (round(1280 * device_pixel_ratio), round(800 * device_pixel_ratio))
+
+
+def test_small_viewport_is_not_upscaled():
+    shot = capture(CDPDriver(css_width=600, css_height=400, device_pixel_ratio=2.0), max_width=1280)
+
+    assert shot.size == shot.image.size == (1200, 800)
@@ -0,0 +1,104 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+
+from page_delta import PageState
+from speculation import Speculation, get_speculation_stats
+
+PAGE = {"url": "https://www.google.com/search?q=cats", "title": "cats - Google Search", "elements": 900,
+        "text": "7c1d", "values": "5381", "focus": "", "scroll": [0, 0]}
+TILES = [0x0f0f0f0f0f0f0f0f] * 48
+
+
+class ImmediatePool:
+    """Runs submitted work at once, like a pool with a free worker"""
+
+    def submit(self, func, *args):
+        future = Future()
+        future.set_result(func(*args))
+        return future
+
+
+@pytest.fixture
+def pool():
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        yield executor
+
+
+def stats_delta(before):
+    after = get_speculation_stats()
+    return {key: after[key] - before[key] for key in before}
+
+
+def state(tiles=TILES, **changes):
+    return PageState(dict(PAGE, **changes), list(tiles), (1280, 720))
+
+
+def test_matches_only_the_same_page():
+    speculation = Speculation(ImmediatePool(), state(), None, {}, lambda: "step")
+
+    assert speculation.matches(state())
+    assert not speculation.matches(state(values="9f3c"))
+    assert not speculation.matches(state(tiles=[0] + TILES[1:]))
+    assert not speculation.matches(None)
+    assert not Speculation(ImmediatePool(), None, None, {}, lambda: "step").matches(state())
+
+
+def test_result_returns_the_answer_and_overlapped_time(pool):
+    before = get_speculation_stats()
+    speculation = Speculation(pool, state(), "screenshot", {1: "element"}, lambda goal: {"goal": goal},
+                              "search for cats")
+    time.sleep(0.05)
+
+    value, overlapped = speculation.result()
+    assert value == {"goal": "search for cats"}
+    assert overlapped >= 0.0
+    delta = stats_delta(before)
+    assert (delta["started"], delta["used"], delta["failed"], delta["discarded"]) == (1, 1, 0, 0)
+    # Discarding after the result was taken does nothing
+    speculation.discard()
+    assert stats_delta(before)["discarded"] == 0
+
+
+def test_overlapped_time_is_the_model_time_before_waiting(pool):
+    def slow_step():
+        time.sleep(0.2)
+        return "step"
+
+    speculation = Speculation(pool, state(), None, {}, slow_step)
+    time.sleep(0.15)
+    value, overlapped = speculation.result()
+
+    assert value == "step"
+    assert 0.05 <= overlapped < 0.3
+
+
+def test_failed_requests_return_none(pool, capsys):
+    def broken_step():
+        raise RuntimeError("quota exceeded")
+
+    before = get_speculation_stats()
+    assert Speculation(pool, state(), None, {}, broken_step).result() == (None, 0.0)
+    assert Speculation(pool, state(), None, {}, lambda: None).result() == (None, 0.0)
+    assert stats_delta(before)["failed"] == 2
+    assert "quota exceeded" in capsys.readouterr().out
+
+
+def test_discard_cancels_a_request_that_has_not_started():
+    release = threading.Event()
+    calls = []
+    with ThreadPoolExecutor(max_workers=1) as single:
+        single.submit(release.wait)
+        before = get_speculation_stats()
+        speculation = Speculation(single, state(), None, {}, lambda: calls.append("step"))
+
+        speculation.discard()
+        speculation.discard()
+        release.set()
+
+    assert speculation.future.cancelled()
+    assert calls == []
+    assert stats_delta(before)["discarded"] == 1
+
@@ -0,0 +1,99 @@
+import json
+import threading
+
+import pytest
+
+from tracing import Tracer, load_spans, percentile, summarize
+
+
+@pytest.fixture(params=["jsonl", "otlp"])
+def tracer(request, tmp_path):
+    return Tracer(str(tmp_path / f"trace.{request.param}"), trace_format=request.param)
+
+
+def test_disabled_tracer_writes_nothing(tmp_path):
+    tracer = Tracer()
+    with tracer.span("capture") as attributes:
+        attributes["bytes"] = 10
+
+    assert not tracer.enabled
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_nested_spans_share_a_trace(tracer):
+    with tracer.span("goal", goal="open google"):
+        with tracer.span("model.step", tier="flash") as attributes:
+            attributes["tokens"] = 1200
+        with tracer.span("action.click"):
+            pass
+
+    step, click, goal = load_spans([tracer.path])
+    assert (goal["name"], step["phase"], click["phase"]) == ("goal", "model", "action")
+    assert step["trace_id"] == click["trace_id"] == goal["trace_id"]
+    assert step["parent_id"] == click["parent_id"] == goal["span_id"]
+    assert not goal["parent_id"]
+    assert step["attributes"]["tier"] == "flash"
+    assert int(step["attributes"]["tokens"]) == 1200
+    assert goal["duration_ms"] >= step["duration_ms"]
+
+
+def test_errors_are_recorded_and_raised(tracer):
+    with pytest.raises(ValueError):
+        with tracer.span("parse"):
+            raise ValueError("bad json")
+
+    record, = load_spans([tracer.path])
+    assert record["status"] == "error"
+
+
+def test_threads_start_their_own_traces(tracer):
+    def work():
+        with tracer.span("goal"):
+            pass
+
+    with tracer.span("goal"):
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+
+    first, second = load_spans([tracer.path])
+    assert first["trace_id"] != second["trace_id"]
+    assert not first["parent_id"] and not second["parent_id"]
+
+
+def test_otlp_lines_are_export_requests(tmp_path):
+    tracer = Tracer(str(tmp_path / "trace.otlp"), trace_format="otlp")
+    tracer.record_span("wait.settle", start=1700000000.0, duration=0.25, status="error", waited_for="load")
+
+    request = json.loads(open(tracer.path).read())
+    span, = request["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert span["status"]["code"] == 2
+    assert int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"]) == pytest.approx(250000000, abs=1000)
+    assert {"key": "waited_for", "value": {"stringValue": "load"}} in span["attributes"]
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        Tracer().configure("trace.out", trace_format="xml")
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert (percentile(values, 0.5), percentile(values, 0.95), percentile([], 0.5)) == (50, 95, 0.0)
+
+
+def test_summarize_per_phase_and_name():
+    records = [{"name": "model.step", "phase": "model", "duration_ms": d, "status": "ok"} for d in (100, 300, 200)]
+    records.append({"name": "model.verify", "phase": "model", "duration_ms": 50, "status": "error"})
+
+    by_phase = summarize(records)
+    assert by_phase["model"] == {"count": 4, "errors": 1, "total_ms": 650, "p50_ms": 100, "p95_ms": 300,
+                                 "max_ms": 300}
+    assert summarize(records, by="name")["model.step"]["p50_ms"] == 200
+
+
+def test_load_spans_skips_bad_lines_and_missing_files(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    path.write_text('{"name": "capture", "phase": "capture", "duration_ms": 5}\nnot json\n\n')
+
+    assert [r["name"] for r in load_spans([str(path), str(tmp_path / "missing.jsonl")])] == ["capture"]
@@ -0,0 +1,286 @@
+"""
+Structured tracing for the Miki Miki agent loop
+
+Every phase of a goal (screenshot capture, model calls, response parsing,
+actions, element resolution, waits and learning writes) runs inside a span.
+Finished spans are appended to a trace file, either as one JSON object per
+line or as OTLP/JSON (one ExportTraceServiceRequest per line, the format read
+by the OpenTelemetry collector's otlpjsonfile receiver). report() aggregates
+p50/p95 durations per phase across one or more trace files.
+"""
+
+import functools
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+SERVICE_NAME = "miki-miki"
+
+
+def new_id(length=16):
+    """Random hex id (16 chars for span ids, 32 for trace ids as in OpenTelemetry)"""
+    return uuid.uuid4().hex[:length]
+
+
+class Tracer:
+    def __init__(self, path=None, trace_format="jsonl"):
+        self.path = path
+        self.trace_format = trace_format
+        self.write_lock = threading.Lock()
+        self.local = threading.local()
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def configure(self, path=None, trace_format="jsonl"):
+        """Set the trace file (None disables tracing) and its format: 'jsonl' or 'otlp'"""
+        if trace_format not in ("jsonl", "otlp"):
+            raise ValueError(f"Unknown trace format: {trace_format}")
+        self.path = path
+        self.trace_format = trace_format
+
+    def _stack(self):
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def start_span(self, name, **attributes):
+        """
+        Open a span and make it the current one on this thread. A span opened
+        while another is active becomes its child; a top-level span starts a
+        new trace. Returns None when tracing is disabled.
+        """
+        if not self.enabled:
+            return None
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        record = {
+            "trace_id": parent["trace_id"] if parent else new_id(32),
+            "span_id": new_id(16),
+            "parent_id": parent["span_id"] if parent else None,
+            "name": name,
+            "phase": name.split(".")[0],
+            "start": time.time(),
+            "attributes": attributes,
+            "status": "ok",
+            "_started": time.perf_counter(),
+        }
+        stack.append(record)
+        return record
+
+    def end_span(self, record, error=None):
+        """Close a span opened with start_span and write it out"""
+        if record is None:
+            return
+        stack = self._stack()
+        if record in stack:
+            stack.remove(record)
+        if error is not None:
+            record["status"] = "error"
+            record["error"] = f"{type(error).__name__}: {error}"
+        record["duration_ms"] = round((time.perf_counter() - record.pop("_started")) * 1000, 3)
+        record["end"] = record["start"] + record["duration_ms"] / 1000
+        record["thread"] = threading.current_thread().name
+        self.write(record)
+
+    def record_span(self, name, start, duration, status="ok", **attributes):
+        """Write an already finished span (start as a timestamp, duration in seconds)"""
+        record = self.start_span(name, **attributes)
+        if record is None:
+            return
+        self._stack().remove(record)
+        record.pop("_started")
+        record.update({"start": start, "status": status, "duration_ms": round(duration * 1000, 3),
+                       "end": start + duration, "thread": threading.current_thread().name})
+        self.write(record)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Time a block as a span. Yields the attributes dict so the block can add
+        results to it.
+        """
+        record = self.start_span(name, **attributes)
+        if record is not None:
+            # The record holds its own copy of the keyword arguments
+            attributes = record["attributes"]
+        try:
+            yield attributes
+        except BaseException as e:
+            self.end_span(record, e)
+            raise
+        self.end_span(record)
+
+    def write(self, record):
+        """Append one finished span to the trace file"""
+        line = json.dumps(to_otlp(record) if self.trace_format == "otlp" else record, default=str)
+        try:
+            with self.write_lock:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except Exception as e:
+            print(f"⚠️  Could not write trace span: {e}")
+
+
+def otlp_value(value):
+    """Convert a Python value to an OTLP AnyValue"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(record):
+    """Wrap a span record as an OTLP/JSON ExportTraceServiceRequest"""
+    attributes = [{"key": k, "value": otlp_value(v)} for k, v in record["attributes"].items() if v is not None]
+    attributes.append({"key": "miki.phase", "value": {"stringValue": record["phase"]}})
+    attributes.append({"key": "thread.name", "value": {"stringValue": record["thread"]}})
+    span = {
+        "traceId": record["trace_id"],
+        "spanId": record["span_id"],
+        "name": record["name"],
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(int(record["start"] * 1e9)),
+        "endTimeUnixNano": str(int(record["end"] * 1e9)),
+        "attributes": attributes,
+        "status": {"code": 2, "message": record.get("error", "")} if record["status"] == "error" else {"code": 1},
+    }
+    if record["parent_id"]:
+        span["parentSpanId"] = record["parent_id"]
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "miki-miki.tracing"}, "spans": [span]}],
+    }]}
+
+
+def from_otlp(request):
+    """Turn an OTLP/JSON ExportTraceServiceRequest back into span records"""
+    records = []
+    for resource_spans in request.get("resourceSpans", []):
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for span in scope_spans.get("spans", []):
+                attributes = {}
+                for attribute in span.get("attributes", []):
+                    value = attribute.get("value", {})
+                    attributes[attribute["key"]] = next(iter(value.values()), None)
+                start = int(span["startTimeUnixNano"]) / 1e9
+                end = int(span["endTimeUnixNano"]) / 1e9
+                records.append({
+                    "trace_id": span.get("traceId"),
+                    "span_id": span.get("spanId"),
+                    "parent_id": span.get("parentSpanId"),
+                    "name": span["name"],
+                    "phase": attributes.pop("miki.phase", span["name"].split(".")[0]),
+                    "start": start,
+                    "end": end,
+                    "duration_ms": (end - start) * 1000,
+                    "attributes": attributes,
+                    "status": "error" if span.get("status", {}).get("code") == 2 else "ok",
+                })
+    return records
+
+
+# Shared tracer used by the agent; configured from main.py
+tracer = Tracer()
+
+
+def span(name, **attributes):
+    """Span on the shared tracer"""
+    return tracer.span(name, **attributes)
+
+
+def traced(name):
+    """Decorator running the whole function inside a span on the shared tracer"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def load_spans(paths):
+    """
+    Read span records from JSONL or OTLP/JSON trace files, skipping bad lines
+    """
+    records = []
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"⚠️  Trace file not found: {path}")
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    continue
+                if "resourceSpans" in data:
+                    records.extend(from_otlp(data))
+                else:
+                    records.append(data)
+    return records
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(records, by="phase"):
+    """
+    Aggregate span durations per phase (or per span name):
+    count, errors, total, p50, p95 and max in milliseconds
+    """
+    groups = {}
+    for record in records:
+        groups.setdefault(record.get(by) or record["name"], []).append(record)
+
+    summary = {}
+    for key, group in groups.items():
+        durations = sorted(r["duration_ms"] for r in group)
+        summary[key] = {
+            "count": len(group),
+            "errors": sum(1 for r in group if r.get("status") == "error"),
+            "total_ms": round(sum(durations), 3),
+            "p50_ms": round(percentile(durations, 0.50), 3),
+            "p95_ms": round(percentile(durations, 0.95), 3),
+            "max_ms": round(durations[-1], 3),
+        }
+    return summary
+
+
+def format_report(summary, title="phase"):
+    """Render a summary as a text table sorted by total time"""
+    lines = [f"{title:<28} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10} {'total s':>9} {'errors':>7}"]
+    for key, row in sorted(summary.items(), key=lambda item: -item[1]["total_ms"]):
+        lines.append(f"{key:<28} {row['count']:>7} {row['p50_ms']:>10.1f} {row['p95_ms']:>10.1f} "
+                     f"{row['max_ms']:>10.1f} {row['total_ms'] / 1000:>9.2f} {row['errors']:>7}")
+    return "\n".join(lines)
+
+
+def report(paths, by="phase"):
+    """Print p50/p95 per phase across the given trace files"""
+    records = load_spans(paths)
+    if not records:
+        print("No spans found.")
+        return {}
+    summary = summarize(records, by=by)
+    goals = len({r["trace_id"] for r in records})
+    print(f"📈 {len(records)} spans from {goals} traces in {len(paths)} file(s)\n")
+    print(format_report(summary, title=by))
+    return summary